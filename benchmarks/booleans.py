@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Memory use and parse time of a flag-heavy Questionnaire.
+
+Compares the shared boolean instances (boolean.TRUE/FALSE) with a new
+boolean instance for every flag.
+
+Usage: python benchmarks/booleans.py [number of items] [number]
+"""
+from __future__ import print_function
+import os, os.path
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import fhir.model
+from fhir.model.questionnaire import Item
+
+
+def questionnaire(items):
+    q = fhir.model.Questionnaire(status='active', experimental=False)
+
+    for i in range(items):
+        q.item.append(Item(
+            linkId=str(i),
+            text='Question {}'.format(i),
+            type='boolean',
+            required=bool(i % 2),
+            repeats=False,
+            readOnly=bool(i % 3 == 0),
+        ))
+
+    return q
+
+
+def measure(format_, document, number):
+    tracemalloc.start()
+    resource = fhir.model.Questionnaire.loads(document, format_)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    t = timeit.timeit(lambda: fhir.model.Questionnaire.loads(document, format_), number=number)
+    return size, t / number
+
+
+def bench(items, number):
+    q = questionnaire(items)
+    documents = {'json': q.toJSON(), 'xml': q.toXML()}
+    shared = fhir.model.boolean.__dict__['of']
+
+    print('{} items, {} flags'.format(items, 3 * items + 1))
+    print('{:<8} {:<10} {:>12} {:>10}'.format('format', 'booleans', 'memory (kB)', 'parse (ms)'))
+
+    for format_, document in documents.items():
+        for name in ['new', 'shared']:
+            if name == 'new':
+                fhir.model.boolean.of = classmethod(lambda cls, value: cls(value))
+            else:
+                fhir.model.boolean.of = shared
+
+            size, t = measure(format_, document, number)
+            print('{:<8} {:<10} {:>12.0f} {:>10.1f}'.format(format_, name, size / 1024, 1000 * t))
+
+    fhir.model.boolean.of = shared
+
+
+if __name__ == '__main__':
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    number = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    bench(items, number)
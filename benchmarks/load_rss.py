@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compare peak RSS of Resource.load() with reading the file into a str.
+
+A Bundle of (roughly) the requested size is generated from the examples.
+Every method runs in a fresh process, which reports its peak RSS.
+
+Usage: python benchmarks/load_rss.py [size in MB] [format]
+"""
+from __future__ import print_function
+import os, os.path
+import sys
+import json
+import subprocess
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import fhir
+import fhir.model
+
+METHODS = {
+    'read+loads': "fhir.model.Resource.loads(open(path).read(), format_)",
+    'load': "fhir.model.Resource.load(path)",
+    'load (no narrative)': "fhir.model.Resource.load(path, narrative=False)",
+}
+
+CHILD = """
+import sys, time, resource
+sys.path.insert(0, {root!r})
+import fhir.model
+path, format_ = {path!r}, {format_!r}
+start = time.perf_counter()
+r = {statement}
+elapsed = time.perf_counter() - start
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, elapsed)
+"""
+
+
+def generate(size, format_):
+    """Write a Bundle of approximately 'size' bytes to a temporary file."""
+    data = json.loads(fhir.get_example_data('bundle-references', 'json'))
+    entries = data['entry']
+    entry_size = len(json.dumps(entries))
+
+    data['entry'] = entries * max(1, size // entry_size)
+
+    fd, path = tempfile.mkstemp(suffix='.' + format_)
+    with os.fdopen(fd, 'w') as fp:
+        if format_ == 'xml':
+            fp.write(fhir.model.native_to_xml(data))
+        else:
+            json.dump(data, fp, indent=2)
+
+    return path
+
+
+def bench(size_mb, format_):
+    path = generate(size_mb * 1024 * 1024, format_)
+
+    try:
+        print('{}: {:.1f} MB'.format(format_, os.path.getsize(path) / 1024 / 1024))
+        print('{:<22} {:>14} {:>10}'.format('method', 'peak RSS (MB)', 'time (s)'))
+
+        for name, statement in METHODS.items():
+            code = CHILD.format(root=ROOT, path=path, format_=format_, statement=statement)
+            output = subprocess.check_output([sys.executable, '-c', code])
+            rss, elapsed = output.split()[-2:]
+
+            print('{:<22} {:>14.1f} {:>10.2f}'.format(
+                name, int(rss) / 1024, float(elapsed)))
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    format_ = sys.argv[2] if len(sys.argv) > 2 else 'xml'
+    bench(size_mb, format_)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compare the cost of deep pages with OFFSET and with search_page() tokens.
+
+Both page through all Patients of a (temporary, on disk) SQLite database;
+the time per page is reported for the first and the last pages.
+
+Usage: python benchmarks/pagination.py [number of resources] [page size]
+"""
+from __future__ import print_function
+import os, os.path
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import fhir.model
+from fhir.persistance import FHIRStore, Session, Resource
+
+
+def offset_pages(store, count):
+    """Yield pages using LIMIT/OFFSET."""
+    session = Session()
+    offset = 0
+
+    while True:
+        query = session.query(Resource).filter(Resource.type == 'Patient')
+        rows = query.order_by(Resource.id).offset(offset).limit(count).all()
+
+        if not rows:
+            return
+
+        yield [store._decode(row) for row in rows]
+        offset += count
+
+
+def keyset_pages(store, count):
+    """Yield pages using search_page() tokens."""
+    token = None
+
+    while True:
+        page, token = store.search_page('Patient', count=count, token=token)
+        yield page
+
+        if token is None:
+            return
+
+
+def bench(n, count):
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+
+    try:
+        store = FHIRStore('sqlite:///' + path, drop_all=True, codec='pickle',
+                          allow_pickle=True)
+        store.post_many(fhir.model.Patient(id='patient-{:08d}'.format(i)) for i in range(n))
+
+        print('{} resources, {} per page'.format(n, count))
+        print('{:<10} {:>18} {:>18}'.format('method', 'first page (ms)', 'last page (ms)'))
+
+        for name, pages in [('offset', offset_pages), ('keyset', keyset_pages)]:
+            timings = []
+            start = time.perf_counter()
+
+            for page in pages(store, count):
+                now = time.perf_counter()
+                timings.append(now - start)
+                start = now
+
+            first, last = timings[0] * 1000, timings[-1] * 1000
+            print('{:<10} {:>18.2f} {:>18.2f}'.format(name, first, last))
+    finally:
+        Session.remove()
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    bench(n, count)
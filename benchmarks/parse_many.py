@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Measure how parse_many() scales with the number of worker processes.
+
+Usage: python benchmarks/parse_many.py [number of documents] [format]
+"""
+from __future__ import print_function
+import os, os.path
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import fhir
+import fhir.model
+
+EXAMPLES = [
+    'patient-example',
+    'patient-glossy',
+    'patient-mom',
+    'bundle-example',
+    'bundle-references',
+]
+
+
+def bench(n, format_):
+    examples = [fhir.get_example_data(name, format_) for name in EXAMPLES]
+    documents = [examples[i % len(examples)] for i in range(n)]
+
+    cpus = os.cpu_count() or 1
+    counts = [w for w in [1, 2, 4, 8, 16] if w <= cpus] or [1]
+
+    start = time.perf_counter()
+    for resource in fhir.model.parse_many(documents, format_, workers=0):
+        pass
+    baseline = time.perf_counter() - start
+
+    print('{} {} documents, {} CPUs'.format(n, format_, cpus))
+    print('{:<10} {:>10} {:>10} {:>8}'.format('workers', 'time (s)', 'docs/s', 'speedup'))
+    print('{:<10} {:>10.2f} {:>10.0f} {:>7.2f}x'.format('serial', baseline, n / baseline, 1))
+
+    for workers in counts:
+        start = time.perf_counter()
+        for resource in fhir.model.parse_many(documents, format_, workers=workers, chunksize=32):
+            pass
+        elapsed = time.perf_counter() - start
+
+        print('{:<10} {:>10.2f} {:>10.0f} {:>7.2f}x'.format(
+            workers, elapsed, n / elapsed, baseline / elapsed))
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    format_ = sys.argv[2] if len(sys.argv) > 2 else 'xml'
+    bench(n, format_)
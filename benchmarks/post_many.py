@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compare FHIRStore.post() in a loop with FHIRStore.post_many().
+
+A fresh SQLite database (on disk, so commits are fsynced) is used for every
+method.
+
+Usage: python benchmarks/post_many.py [number of resources]
+"""
+from __future__ import print_function
+import os, os.path
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import fhir
+import fhir.model
+from fhir.persistance import FHIRStore
+
+
+def patients(n):
+    """Yield n copies of the example Patient, each with its own id."""
+    patient = fhir.model.Patient.fromXML(fhir.get_example_data('patient-example'))
+
+    for i in range(n):
+        patient.id = 'patient-{}'.format(i)
+        yield patient
+
+
+def post(store, n):
+    for patient in patients(n):
+        store.post(patient)
+
+
+def bench(n):
+    methods = [('post', lambda store: post(store, n))]
+
+    for batch_size in [100, 1000, 10000]:
+        methods.append((
+            'post_many({})'.format(batch_size),
+            lambda store, b=batch_size: store.post_many(patients(n), batch_size=b),
+        ))
+
+    print('{} resources'.format(n))
+    print('{:<20} {:>10} {:>12}'.format('method', 'time (s)', 'resources/s'))
+
+    for name, method in methods:
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+
+        try:
+            store = FHIRStore('sqlite:///' + path, drop_all=True)
+
+            start = time.perf_counter()
+            method(store)
+            elapsed = time.perf_counter() - start
+
+            print('{:<20} {:>10.2f} {:>12.0f}'.format(name, elapsed, n / elapsed))
+        finally:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    bench(n)
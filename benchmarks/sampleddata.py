@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compare SampledData.to_array()/from_array() with plain Python.
+
+Usage: python benchmarks/sampleddata.py [number of samples] [number]
+"""
+from __future__ import print_function
+import os, os.path
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+import fhir.model
+
+
+def to_list(sd):
+    """Decode the samples by hand, as one would without to_array()."""
+    origin, factor = float(sd.origin.value), float(sd.factor)
+    dimensions = int(sd.dimensions)
+    values = [
+        float('nan') if x in ('E', 'U', 'L') else origin + factor * float(x)
+        for x in str(sd.data).split()
+    ]
+    return [values[i:i + dimensions] for i in range(0, len(values), dimensions)]
+
+
+def bench(samples, number):
+    rng = np.random.default_rng(0)
+    values = rng.integers(-2048, 2048, samples)
+    data = ' '.join(map(str, values.tolist()))
+
+    sd = fhir.model.SampledData(
+        origin=fhir.model.Quantity(value=0),
+        period=2,
+        factor=0.01,
+        dimensions=1,
+        data=data,
+    )
+
+    # The same payload with an error marker every 1000 samples.
+    marked = data.split()
+    marked[::1000] = ['E'] * len(marked[::1000])
+    sd_marked = fhir.model.SampledData(
+        origin=fhir.model.Quantity(value=0),
+        period=2,
+        factor=0.01,
+        dimensions=1,
+        data=' '.join(marked),
+    )
+
+    array = sd.to_array()
+    cases = [
+        ('python', lambda: to_list(sd)),
+        ('to_array', lambda: sd.to_array()),
+        ('python (markers)', lambda: to_list(sd_marked)),
+        ('to_array (markers)', lambda: sd_marked.to_array()),
+        ('to_array (masked)', lambda: sd_marked.to_array(masked=True)),
+        ('from_array', lambda: fhir.model.SampledData.from_array(
+            array, period=2, factor=0.01)),
+    ]
+
+    print('{:,} samples'.format(samples))
+    print('{:<20} {:>10}'.format('method', 'time (ms)'))
+
+    for name, func in cases:
+        t = timeit.timeit(func, number=number)
+        print('{:<20} {:>10.1f}'.format(name, 1000 * t / number))
+
+
+if __name__ == '__main__':
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    number = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    bench(samples, number)
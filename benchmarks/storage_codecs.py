@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compare the storage codecs of FHIRStore: database size and latency.
+
+Every codec stores the same resources in a fresh SQLite database (on disk).
+post is the time per resource for post_many(), get the time per get().
+
+Usage: python benchmarks/storage_codecs.py [number of resources]
+"""
+from __future__ import print_function
+import copy
+import os, os.path
+import sys
+import time
+import random
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import fhir
+import fhir.model
+from fhir.persistance import FHIRStore, codecs
+
+EXAMPLES = ['patient-example', 'patient-glossy', 'bundle-references']
+
+
+def resources(n):
+    """Yield n copies of the examples, each with its own id."""
+    examples = [
+        fhir.model.Resource.fromXML(fhir.get_example_data(name))
+        for name in EXAMPLES
+    ]
+
+    for i in range(n):
+        resource = copy.deepcopy(examples[i % len(examples)])
+        resource.id = 'resource-{}'.format(i)
+        yield resource
+
+
+def bench(n):
+    print('{} resources'.format(n))
+    print('{:<12} {:>10} {:>12} {:>12}'.format('codec', 'size (MB)', 'post (ms)', 'get (ms)'))
+
+    ids = random.sample(range(n), min(n, 500))
+
+    for name in codecs.available_codecs():
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+
+        try:
+            store = FHIRStore('sqlite:///' + path, drop_all=True, codec=name,
+                              allow_pickle=True)
+
+            start = time.perf_counter()
+            store.post_many(resources(n))
+            post = (time.perf_counter() - start) / n
+
+            start = time.perf_counter()
+            for i in ids:
+                store.get('resource-{}'.format(i))
+            get = (time.perf_counter() - start) / len(ids)
+
+            size = os.path.getsize(path) / 1024 / 1024
+            print('{:<12} {:>10.2f} {:>12.3f} {:>12.3f}'.format(name, size, post * 1000, get * 1000))
+        finally:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    bench(n)
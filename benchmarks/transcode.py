@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compare direct XML<->JSON transcoding with the round trip via the model.
+
+Usage: python benchmarks/transcode.py [number]
+"""
+from __future__ import print_function
+import os, os.path
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import fhir
+import fhir.model
+
+EXAMPLES = [
+    ('patient-example', fhir.model.Patient),
+    ('patient-glossy', fhir.model.Patient),
+    ('patient-mom', fhir.model.Patient),
+    ('bundle-example', fhir.model.Bundle),
+    ('bundle-references', fhir.model.Bundle),
+]
+
+
+def bench(number):
+    print('{:<20} {:<10} {:>12} {:>14} {:>8}'.format(
+        'example', 'direction', 'model (ms)', 'transcode (ms)', 'speedup'))
+
+    for name, cls in EXAMPLES:
+        xmlstring = fhir.get_example_data(name, 'xml')
+        jsonstring = fhir.get_example_data(name, 'json')
+
+        runs = [
+            ('xml->json',
+                lambda: cls.fromXML(xmlstring).toJSON(),
+                lambda: fhir.model.xml_to_json(xmlstring)),
+            ('json->xml',
+                lambda: cls.fromJSON(jsonstring).toXML(),
+                lambda: fhir.model.json_to_xml(jsonstring)),
+        ]
+
+        for direction, model, transcode in runs:
+            t_model = timeit.timeit(model, number=number)
+            t_transcode = timeit.timeit(transcode, number=number)
+
+            print('{:<20} {:<10} {:>12.3f} {:>14.3f} {:>7.1f}x'.format(
+                name,
+                direction,
+                1000 * t_model / number,
+                1000 * t_transcode / number,
+                t_model / t_transcode,
+            ))
+
+
+if __name__ == '__main__':
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    bench(number)
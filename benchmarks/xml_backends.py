@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compare the available XML backends on the example XML files.
+
+Usage: python benchmarks/xml_backends.py [number]
+"""
+from __future__ import print_function
+import os, os.path
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import fhir
+import fhir.model
+from fhir.model import xmlbackend
+
+EXAMPLES = [
+    ('patient-example', fhir.model.Patient),
+    ('patient-glossy', fhir.model.Patient),
+    ('patient-mom', fhir.model.Patient),
+    ('bundle-example', fhir.model.Bundle),
+    ('bundle-references', fhir.model.Bundle),
+]
+
+
+def bench(number):
+    print('{:<20} {:<8} {:>12} {:>12} {:>12}'.format(
+        'example', 'backend', 'parse (ms)', 'fromXML (ms)', 'toXML (ms)'))
+
+    for name, cls in EXAMPLES:
+        xmlstring = fhir.get_example_data(name, 'xml')
+
+        for backend_name in xmlbackend.available_backends():
+            backend = xmlbackend.set_backend(backend_name)
+            resource = cls.fromXML(xmlstring)
+
+            t_parse = timeit.timeit(lambda: backend.fromstring(xmlstring), number=number)
+            t_from = timeit.timeit(lambda: cls.fromXML(xmlstring), number=number)
+            t_to = timeit.timeit(lambda: resource.toXML(), number=number)
+
+            print('{:<20} {:<8} {:>12.3f} {:>12.3f} {:>12.3f}'.format(
+                name,
+                backend_name,
+                1000 * t_parse / number,
+                1000 * t_from / number,
+                1000 * t_to / number,
+            ))
+
+    xmlbackend.set_backend()
+
+
+if __name__ == '__main__':
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    bench(number)
@@ -12,10 +12,12 @@ STU3 = '3.0.1'
 R4 = '4.0.0'
 
 
-def get_example_data(name, format='xml'):
+def get_example_path(name, format='xml'):
     current_dir = os.path.dirname(__file__)
     file_location = os.path.join(current_dir, f"examples/{name}.{format}")
-    file_location = os.path.abspath(file_location)
+    return os.path.abspath(file_location)
 
-    return open(file_location, 'r').read()
 
+def get_example_data(name, format='xml'):
+    with open(get_example_path(name, format), 'r') as fp:
+        return fp.read()
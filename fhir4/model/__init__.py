@@ -1,12 +1,14 @@
 # -*- coding: utf-8 -*-
 """FHIR Resources & Elements in Python."""
 import sys
+import os
+import mmap
 import inspect
 import copy
 import packaging.version
-from collections import OrderedDict
+from collections import OrderedDict, namedtuple
+import datetime as dt
 from datetime import datetime
-import dateutil.parser
 import inspect
 import re
 import logging
@@ -17,6 +19,8 @@ import xml.etree.ElementTree as ET
 import xml.dom.minidom
 import json
 
+from . import xmlbackend
+
 __author__ = "Melle Sieswerda"
 __copyright__  = "Copyright 2017, Melle Sieswerda"
 __license__ = "GPL"
@@ -29,6 +33,11 @@ __all__ = [
     'PropertyDefinition',
     'Property',
     'PropertyList',
+    'DateTimeParts',
+    'PRECISIONS',
+    'parse_datetime',
+    'datetime_key',
+    'to_datetime64',
     'markdown',
     'integer',
     'dateTime',
@@ -90,6 +99,11 @@ __all__ = [
     'Timing',
     'UsageContext',
     'ValueSet',
+    'xml_to_json',
+    'xml_to_native',
+    'json_to_xml',
+    'native_to_xml',
+    'parse_many',
 ]
 
 # Module global
@@ -101,6 +115,11 @@ VERSION_STR = '4.0.0'
 
 SUPPORTED_FORMATS = ['xml', 'json']
 
+XHTML_NAMESPACE = 'http://www.w3.org/1999/xhtml'
+
+# Files of at least this size (in bytes) are memory mapped by FHIRBase.load()
+MMAP_THRESHOLD = 16 * 1024 * 1024
+
 inf = float('inf')
 
 PRIMITIVE_TYPES = OrderedDict([
@@ -137,16 +156,39 @@ def lower_first_letter(attr):
     return attr[0].lower() + attr[1:]
 
 def split_namespace(element_or_tag):
-    if isinstance(element_or_tag, ET.Element):
-        tag = element_or_tag.tag
-    else:
+    if isinstance(element_or_tag, str):
         tag = element_or_tag
+    else:
+        tag = element_or_tag.tag
 
     m = re.match('\{(.*)\}', tag)
     ns_with_accolades = m.group(0) if m else ''
     ns_without_accolades = m.group(1) if m else ''
     return ns_without_accolades, tag.replace(ns_with_accolades, '')
 
+def _spill(value, **options):
+    """Spill a base64Binary, or a list of them, if larger than options['spill']."""
+    values = value if isinstance(value, (list, PropertyList)) else [value]
+
+    for v in values:
+        if v is not None:
+            v._spill(**options)
+
+def detect_format(fp):
+    """Return 'xml' or 'json' by peeking at the start of a binary file."""
+    position = fp.tell()
+    head = fp.read(1024)
+    fp.seek(position)
+
+    head = head.lstrip(b'\xef\xbb\xbf \t\r\n')
+
+    if head.startswith(b'<'):
+        return 'xml'
+    elif head.startswith(b'{'):
+        return 'json'
+
+    return None
+
 def eval_type_string(type_, module=None):
     """Evaluate PropertyDefinition.type."""
     if isinstance(type_, str):
@@ -295,6 +337,11 @@ class PropertyMixin(object):
         if inspect.isclass(type_) and isinstance(value, type_):
             return value
 
+        # References are typed by an instance, e.g. Reference(<profiles>).
+        # Calling it would create a new (empty) Reference.
+        if isinstance(type_, Reference) and isinstance(value, Reference):
+            return value
+
         # If we're still here, try to coerce/cast.
         # This has a side effect: any current value will be replaced by a new instance!
         try:
@@ -304,6 +351,10 @@ class PropertyMixin(object):
                 print('type_, value: ', type_, value)
                 stars()
 
+            # Native booleans map onto the shared instances.
+            if type_ is boolean:
+                return boolean.of(value)
+
             return type_(value)
         except Exception as e:
             raise PropertyTypeError(value.__class__.__name__, self.definition)
@@ -418,10 +469,11 @@ class Property(PropertyMixin):
 # class Property
 
 class DateTimeProperty(Property):
-    def __set__(self, instance, value):
-        if value is not None:
-            instance._checkRegEx(value)
+    """Property that validates (and parses) the value of a dateTimeBase."""
 
+    def __set__(self, instance, value):
+        # Also called for None, to clear the cached parts.
+        instance._checkRegEx(value)
         super().__set__(instance, value)
 # class DateTimeProperty
 
@@ -491,6 +543,42 @@ class FHIRBase(object):
         super().__setattr__(attr, value)
     # def __setattr__
 
+    def __getstate__(self):
+        """Return the state used for pickling (and deepcopy).
+
+        The logger is left out and PropertyLists are stored as plain lists
+        (empty ones are dropped) to keep pickles small.
+        """
+        state = dict(self.__dict__)
+        del state['log']
+
+        values = dict()
+        for name, value in self._property_values.items():
+            if isinstance(value, PropertyList):
+                if not value:
+                    continue
+                value = list(value)
+
+            values[name] = value
+
+        state['_property_values'] = values
+        return state
+    # def __getstate__
+
+    def __setstate__(self, state):
+        """Restore the state without coercing/validating the values again."""
+        values = state.pop('_property_values')
+
+        for name, value in values.items():
+            if isinstance(value, list):
+                definition = getattr(type(self), name).definition
+                values[name] = PropertyList(definition, value)
+
+        self.__dict__.update(state)
+        self.__dict__['_property_values'] = values
+        self.__dict__['log'] = logging.getLogger(self.__class__.__name__)
+    # def __setstate__
+
     def _set(self, **kwargs):
         for attr, value in kwargs.items():
             setattr(self, attr, value)
@@ -578,64 +666,138 @@ class FHIRBase(object):
         return cls.__name__
 
     @classmethod
-    def loads(self, string, format_='xml'):
+    def loads(self, string, format_='xml', **options):
         if format_ in SUPPORTED_FORMATS:
             format_ = format_.upper()
             func = getattr(self, 'from' + format_)
-            return func(string)
+            return func(string, **options)
 
         raise UnsupportedFormatError(format_)
     # def loads
 
     @classmethod
-    def fromXML(cls, xmlstring):
-        """Marshall a Resource from its XML representation."""
-        log = logging.getLogger(cls.__name__)
-        # Remove the default namespace definition, makes life a bit easier
-        # when using ElementTree.
-        xmlstring = re.sub('\\sxmlns="[^"]+"', '', xmlstring, count=1)
+    def load(cls, path_or_fp, format=None, narrative=True, spill=None):
+        """Marshall a Resource from a file.
+
+        :param path_or_fp: path or file object opened in binary mode.
+        :param str format: 'xml' or 'json'. Detected from the file's
+            extension or contents if not provided.
+        :param bool narrative: if False, Narratives are skipped.
+        :param int spill: if provided, base64Binary values of at least this
+            many characters are moved to temporary files while parsing.
+
+        The file is fed to the parser as bytes; XML is parsed incrementally.
+        Files of at least MMAP_THRESHOLD bytes are memory mapped. Files that
+        are opened by this method are also closed by it.
+        """
+        if isinstance(path_or_fp, (str, os.PathLike)):
+            if format is None:
+                extension = os.path.splitext(path_or_fp)[1][1:].lower()
+                format = extension if extension in SUPPORTED_FORMATS else None
+
+            with open(path_or_fp, 'rb') as fp:
+                return cls.load(fp, format, narrative, spill)
+
+        fp = path_or_fp
+
+        if format is None:
+            format = detect_format(fp)
+
+        if format not in SUPPORTED_FORMATS:
+            raise UnsupportedFormatError(format)
+
+        try:
+            size = os.fstat(fp.fileno()).st_size - fp.tell()
+        except (AttributeError, OSError, ValueError):
+            size = 0
+
+        if size >= MMAP_THRESHOLD:
+            offset = fp.tell()
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as source:
+                source.seek(offset)
+                return cls._load(source, format, narrative=narrative, spill=spill)
+
+        return cls._load(fp, format, narrative=narrative, spill=spill)
+    # def load
+
+    @classmethod
+    def _load(cls, source, format, **options):
+        if format == 'xml':
+            root = xmlbackend.get_backend().parse(source)
+            return cls._fromXMLRoot(root, **options)
 
-        # Parse the string using ElementTree
-        root = ET.fromstring(xmlstring)
+        # The json module has no incremental parser; passing bytes at least
+        # avoids a separate decoding step.
+        return cls._fromNative(json_loads(source.read()), **options)
+    # def _load
+
+    @classmethod
+    def fromXML(cls, xmlstring, narrative=True, spill=None):
+        """Marshall a Resource from its XML representation.
+
+        :param xmlstring: str or bytes.
+        :param bool narrative: if False, Narratives (``DomainResource.text``)
+            are skipped entirely while parsing.
+        :param int spill: if provided, base64Binary values of at least this
+            many characters are moved to temporary files while parsing.
+        """
+        # Parse the string using the active backend (lxml or ElementTree)
+        root = xmlbackend.get_backend().fromstring(xmlstring)
+        return cls._fromXMLRoot(root, narrative=narrative, spill=spill)
+    # def fromXML
+
+    @classmethod
+    def _fromXMLRoot(cls, root, **options):
+        """Marshall a Resource from a parsed XML (root) element."""
+        ns, tag = split_namespace(root)
 
         # Sanity check
-        if root.tag != cls.__name__:
-            # log.warn('*** WARNING: trying to marshall a {} in a {} ***'.format(root.tag, cls.__name__))
-            class_ = eval_type_string(root.tag)
+        if tag != cls.__name__:
+            class_ = eval_type_string(tag)
 
             if not issubclass(class_, cls):
-                raise Exception('Cannot marshall a {} from a {}: not a subclass!'.format(root.tag, cls.__name__))
+                raise Exception('Cannot marshall a {} from a {}: not a subclass!'.format(tag, cls.__name__))
 
-            return class_()._fromXML(root)
+            return class_()._fromXML(root, **options)
 
-        return cls()._fromXML(root)
-    # def fromXML_
+        return cls()._fromXML(root, **options)
+    # def _fromXMLRoot
 
-    def _fromXML(self, xml):
+    def _fromXML(self, xml, **options):
         # Iterate over *my* properties.
         for tag in xml:
             ns, tag_name = split_namespace(tag)
             prop, prop_def, prop_type = self._getPropertyDetailsForName(tag_name)
 
             # If the namespace is xhtml, we shouldn't parse the tree any
-            # further and just try to assign the xhtml to the property.
-            if ns == 'http://www.w3.org/1999/xhtml':
-                value = ET.tostring(tag, 'unicode')
-                value = value.replace('html:', '')
-                value = value.replace(':html', '')
+            # further and just hand the subtree to the property. It is only
+            # converted to a string when the value is actually accessed.
+            if ns == XHTML_NAMESPACE:
+                value = xhtml(tag)
+
+            # Narratives can be skipped altogether (e.g. for analytics loads)
+            elif prop_type is Narrative and not options.get('narrative', True):
+                continue
+
+            # Plain booleans (without id/extensions) share their instances
+            elif prop_type is boolean and len(tag) == 0 and tag.keys() == ['value']:
+                value = boolean.of(tag.get('value'))
 
             # Inline resources are handled a little differently
             elif inspect.isclass(prop_type) and issubclass(prop_type, Resource):
                 children = list(tag)
                 resource_element = children[0]
-                resource_type = eval_type_string(resource_element.tag)
+                resource_type = eval_type_string(split_namespace(resource_element)[1])
                 value = resource_type()
-                value._fromXML(resource_element)
+                value._fromXML(resource_element, **options)
 
             # Then it must be a simple or complex type
             else:
                 value = prop_type(**tag.attrib)
-                value._fromXML(tag)
+                value._fromXML(tag, **options)
+
+                if prop_type is base64Binary:
+                    _spill(value, **options)
 
             if prop_def.cmax == 1:
                 setattr(self, prop.name, value)
@@ -646,10 +808,16 @@ class FHIRBase(object):
     # def _fromXML
 
     @classmethod
-    def fromJSON(cls, jsonstring):
-        """Marshall a Resource from its JSON representation."""
-        jsondict = json.loads(jsonstring)
-        return cls.fromNative(jsondict)
+    def fromJSON(cls, jsonstring, narrative=True, spill=None):
+        """Marshall a Resource from its JSON representation.
+
+        :param bool narrative: if False, Narratives (``DomainResource.text``)
+            are skipped entirely while parsing.
+        :param int spill: if provided, base64Binary values of at least this
+            many characters are moved to temporary files while parsing.
+        """
+        jsondict = json_loads(jsonstring)
+        return cls._fromNative(jsondict, narrative=narrative, spill=spill)
         # resourceType = jsondict.pop('resourceType')
         #
         # if resourceType != cls.__name__:
@@ -664,27 +832,30 @@ class FHIRBase(object):
     # def fromJSON
 
     @classmethod
-    def fromNative(cls, dictionary):
+    def fromNative(cls, dictionary, narrative=True, spill=None):
         """..."""
         dictionary = copy.deepcopy(dictionary)
+        return cls._fromNative(dictionary, narrative=narrative, spill=spill)
+
+    @classmethod
+    def _fromNative(cls, dictionary, **options):
+        """Like fromNative, but consumes (modifies) 'dictionary'."""
         resourceType = dictionary.pop('resourceType')
 
         if resourceType != cls.__name__:
             class_ = eval_type_string(resourceType)
 
             if not issubclass(class_, cls):
-                raise Exception('Cannot marshall a {} from a {}: not a subclass!'.format(root.tag, cls.__name__))
-
-            # print(f'calling class._fromJSON ... ')
+                raise Exception('Cannot marshall a {} from a {}: not a subclass!'.format(resourceType, cls.__name__))
 
-            return class_()._fromJSON(dictionary)
+            return class_()._fromJSON(dictionary, **options)
 
-        return cls()._fromJSON(dictionary)
+        return cls()._fromJSON(dictionary, **options)
 
-    def _fromJSON(self, obj):
+    def _fromJSON(self, obj, **options):
         if isinstance(obj, dict):
             # Complex type defining *my* attributes
-            return self._fromDict(obj)
+            return self._fromDict(obj, **options)
 
         if isinstance(obj, list):
             # List with values for self.attr_name
@@ -693,7 +864,7 @@ class FHIRBase(object):
         # Simple type!
         return obj
 
-    def _fromDict(self, jsondict):
+    def _fromDict(self, jsondict, **options):
         # Iterate over *my* attributes
         processed = []
 
@@ -712,20 +883,22 @@ class FHIRBase(object):
             if isinstance(obj, dict):
                 # Complex type
                 value = prop_type(regular_value)
-                value._fromDict(obj)
+                value._fromDict(obj, **options)
 
             elif isinstance(obj, list):
-                # Should be a list of dicts
+                # Should be a list of dicts (or None for items without)
+                regular_value = regular_value or [None] * len(obj)
                 value = [prop_type(v) for v in regular_value]
                 for v, extended_info in zip(value, obj):
-                    v._fromDict(extended_info)
-
-            value = prop_type(regular_value)
-            value._fromDict(obj)
+                    if extended_info is not None:
+                        v._fromDict(extended_info, **options)
 
             setattr(self, prop.name, value)
             processed.append(attr)
 
+            if prop_type is base64Binary:
+                _spill(getattr(self, prop.name), **options)
+
         # Then the regular keys/attributes
         for attr, obj in jsondict.items():
             # obj can be dict, list or simple type
@@ -734,25 +907,34 @@ class FHIRBase(object):
 
             prop, prop_def, prop_type = self._getPropertyDetailsForName(attr)
 
-            if inspect.isclass(prop_type) and issubclass(prop_type, Resource):
+            if prop_type is Narrative and not options.get('narrative', True):
+                continue
+
+            elif inspect.isclass(prop_type) and issubclass(prop_type, Resource):
                 resourceType = obj.pop('resourceType')
                 class_ = eval_type_string(resourceType)
-                value = class_()._fromJSON(obj)
+                value = class_()._fromJSON(obj, **options)
 
             elif isinstance(obj, dict):
                 # Complex type
                 value = prop_type()
-                value._fromDict(obj)
+                value._fromDict(obj, **options)
 
             elif isinstance(obj, list):
                 # Could be a list of dicts or simple values;
-                value = [prop_type()._fromJSON(i) for i in obj]
+                value = [prop_type()._fromJSON(i, **options) for i in obj]
+
+            elif prop_type is boolean:
+                value = boolean.of(obj)
 
             else:
                 value = prop_type(obj)
 
             setattr(self, prop.name, value)
 
+            if prop_type is base64Binary:
+                _spill(getattr(self, prop.name), **options)
+
         return self
     # def _fromDict
 
@@ -767,6 +949,8 @@ class FHIRBase(object):
 
     def toXML(self, parent, path):
         """Return an XML representation of this object."""
+        backend = xmlbackend.get_backend()
+
         # Iterate over *my* attributes.
         for attr in self._getProperties():
             value = getattr(self, attr)
@@ -779,17 +963,17 @@ class FHIRBase(object):
 
                 # elif issubclass(desc.type, xhtml):
                 elif desc.repr == 'text':
-                    parent.append( ET.fromstring(str(value)) )
+                    parent.append(value.toElement())
 
                 elif isinstance(value, PropertyList):
                     for p in value:
-                        p.toXML(ET.SubElement(parent, attr), path + [attr, ])
+                        p.toXML(backend.SubElement(parent, attr), path + [attr, ])
 
                 elif isinstance(value, FHIRBase):
                     if isinstance(desc.type, list):
                         class_name = upper_first_letter(value.__class__.__name__)
                         attr = attr + class_name
-                    value.toXML(ET.SubElement(parent, attr), path + [attr, ])
+                    value.toXML(backend.SubElement(parent, attr), path + [attr, ])
 
                 else:
                     print(value, type(value))
@@ -797,11 +981,10 @@ class FHIRBase(object):
 
         # Only the root element needs to generate the actual XML.
         if len(path) == 1:
-            x = xml.dom.minidom.parseString(ET.tostring(parent))
-            pretty_xml = x.toprettyxml(indent='  ')
+            pretty_xml = backend.prettify(parent)
 
             if isinstance(self, Element):
-                pretty_xml = pretty_xml.replace('<?xml version="1.0" ?>\n', '')
+                pretty_xml = pretty_xml.replace(xmlbackend.XML_DECLARATION, '')
 
             # return ET.tostring(parent)
             return pretty_xml
@@ -809,7 +992,7 @@ class FHIRBase(object):
 
     def toJSON(self):
         """Return a JSON representation of this object."""
-        return json.dumps(self.toDict(), indent=2)
+        return json_dumps(self.toDict())
     # def toJSON
 
     def toNative(self):
@@ -894,7 +1077,7 @@ class Element(FHIRBase):
         if parent is None:
             tag = self.__class__.__name__
             path = [tag, ]
-            parent = ET.Element(tag)
+            parent = xmlbackend.get_backend().Element(tag)
 
         return super().toXML(parent, path)
 # class Element
@@ -954,6 +1137,42 @@ class BaseType(Element):
         """repr(x) <==> x.__repr__()"""
         return repr(self.value)
 
+    # Comparison and hashing use the wrapped value, so a primitive compares
+    # (and hashes) equal to its value and to any primitive with an equal
+    # value: code('a') == 'a' == string('a').
+    def __eq__(self, other):
+        if isinstance(other, BaseType):
+            other = other.value
+        return self.value == other
+
+    def __ne__(self, other):
+        if isinstance(other, BaseType):
+            other = other.value
+        return self.value != other
+
+    def __lt__(self, other):
+        if isinstance(other, BaseType):
+            other = other.value
+        return self.value < other
+
+    def __le__(self, other):
+        if isinstance(other, BaseType):
+            other = other.value
+        return self.value <= other
+
+    def __gt__(self, other):
+        if isinstance(other, BaseType):
+            other = other.value
+        return self.value > other
+
+    def __ge__(self, other):
+        if isinstance(other, BaseType):
+            other = other.value
+        return self.value >= other
+
+    def __hash__(self):
+        return hash(self.value)
+
     def toNative(self):
         if self.value is None:
             return None
@@ -984,53 +1203,322 @@ class BaseType(Element):
 # instant: {xs:dateTime}
 #  - timezone *required*
 #  - regex: <none>?
+DateTimeParts = namedtuple('DateTimeParts', [
+    'year', 'month', 'day', 'hour', 'minute', 'second', 'microsecond',
+    'tzoffset', 'precision', 'digits'
+])
+DateTimeParts.__doc__ = """Components of a date, dateTime, instant or time.
+
+Components beyond the precision of the value are None. 'tzoffset' is the
+timezone offset in minutes (None if absent), 'precision' is one of
+PRECISIONS and 'digits' is the number of fractional digits of the seconds.
+"""
+
+PRECISIONS = ('year', 'month', 'day', 'second')
+
+
+def _parse_tzoffset(string):
+    """Return the offset in minutes for a string like '+01:00'."""
+    offset = int(string[1:3]) * 60 + int(string[4:6])
+    return -offset if string[0] == '-' else offset
+
+
+def parse_datetime(value):
+    """Split a FHIR date, dateTime, instant or time into DateTimeParts.
+
+    The value is assumed to match the type's regex, i.e. all components are
+    at their fixed positions. Raises ValueError for days that do not exist,
+    such as February 30th.
+    """
+    if value[2:3] == ':':
+        # time: hh:mm:ss(.f+)?
+        year = month = day = tzoffset = None
+        time, precision = value, 'second'
+
+    else:
+        year = int(value[0:4])
+        month = day = None
+        time = tzoffset = None
+
+        if len(value) == 4:
+            precision = 'year'
+        elif len(value) == 7:
+            precision = 'month'
+            month = int(value[5:7])
+        else:
+            precision = 'day'
+            month, day = int(value[5:7]), int(value[8:10])
+
+            if day > 28:
+                # Raises ValueError if the day is out of range.
+                datetime(year, month, day)
+
+            if len(value) > 10:
+                precision = 'second'
+                time = value[11:]
+
+                if time[-1] == 'Z':
+                    time, tzoffset = time[:-1], 0
+                elif time[-6] in '+-':
+                    time, tzoffset = time[:-6], _parse_tzoffset(time[-6:])
+
+    if time is None:
+        return DateTimeParts(year, month, day, None, None, None, None,
+                             tzoffset, precision, 0)
+
+    fraction = time[9:]
+    microsecond = int((fraction + '000000')[:6]) if fraction else 0
+
+    return DateTimeParts(year, month, day,
+                         int(time[0:2]), int(time[3:5]), int(time[6:8]),
+                         microsecond, tzoffset, precision, len(fraction))
+
+
+_EPOCH_ORDINAL = dt.date(1970, 1, 1).toordinal()
+_US_PER_DAY = 86400 * 10**6
+
+
+def _days(year, month=1, day=1):
+    """Return the number of days between the epoch and the given date."""
+    if year > dt.MAXYEAR:
+        # The end of the interval for '9999' or '9999-12'.
+        return dt.date.max.toordinal() + 1 - _EPOCH_ORDINAL
+
+    return dt.date(year, month, day).toordinal() - _EPOCH_ORDINAL
+
+
+def datetime_key(parts):
+    """Return the interval (start, end) covered by DateTimeParts.
+
+    start and end are microseconds since the epoch (UTC); end is exclusive.
+    The interval spans the precision of the value: '2015' covers all of 2015,
+    '2015-02-01T10:00:00.5Z' covers 100ms. Values without a timezone are
+    taken to be in UTC. For a time, the microseconds since midnight are used.
+    """
+    if parts.precision == 'year':
+        return (_days(parts.year) * _US_PER_DAY,
+                _days(parts.year + 1) * _US_PER_DAY)
+
+    if parts.precision == 'month':
+        year, month = divmod(parts.year * 12 + parts.month, 12)
+        return (_days(parts.year, parts.month) * _US_PER_DAY,
+                _days(year, month + 1) * _US_PER_DAY)
+
+    if parts.precision == 'day':
+        days = _days(parts.year, parts.month, parts.day)
+        return days * _US_PER_DAY, (days + 1) * _US_PER_DAY
+
+    minutes = parts.hour * 60 + parts.minute - (parts.tzoffset or 0)
+    start = (minutes * 60 + parts.second) * 10**6 + parts.microsecond
+
+    if parts.year is not None:
+        start += _days(parts.year, parts.month, parts.day) * _US_PER_DAY
+
+    return start, start + 10 ** max(0, 6 - parts.digits)
+
+
+def to_datetime64(values):
+    """Convert dates/dateTimes/instants to NumPy datetime64[us] arrays.
+
+    Return two arrays (start, end) that hold the interval covered by each
+    value (see datetime_key). Values can be dateTimeBase instances or
+    strings, which are parsed as dateTime. None becomes NaT.
+
+    Requires NumPy.
+    """
+    import numpy as np
+
+    nat = np.iinfo(np.int64).min
+    starts, ends = [], []
+
+    for value in values:
+        if isinstance(value, dateTimeBase):
+            key = value.key
+        elif value is None:
+            key = None
+        else:
+            key = datetime_key(dateTime._parse(value))
+
+        start, end = key or (nat, nat)
+        starts.append(start)
+        ends.append(end)
+
+    starts = np.array(starts, dtype=np.int64).view('datetime64[us]')
+    ends = np.array(ends, dtype=np.int64).view('datetime64[us]')
+    return starts, ends
+
+
 class dateTimeBase(BaseType):
     """Base class for date/time classes.
 
-    The currently available modules are not capable of storing None values for
-    months, days, hours, etc. As a side effect, parsing a string with only a
-    year e.g. strptime('2015', '%Y') automatically sets the month to january!?
-    """
-    _allowed_attributes = list(FHIRBase._allowed_attributes)
-    _allowed_attributes.extend([
-        '_value'
-    ])
+    The value is validated (once) when it is set: it should match _regex in
+    its entirety. The components of the value are kept as DateTimeParts,
+    which retain the precision of the value: '2015' is not the same as
+    '2015-01-01'.
 
+    Equality (and hash) is that of the value, as for other primitives, but
+    ordering is chronological (see key). So values for the same moment in
+    different timezones are <= and >= each other, but not ==; compare
+    their key to test whether they cover the same interval.
+    """
     _regex = None
 
+    # Compiled version of _regex; set for every subclass.
+    _pattern = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        if cls._regex:
+            cls._pattern = re.compile(cls._regex)
+
     def __init__(self, value):
-        if value is None or self._checkRegEx(value):
-            self._value = value
+        # Validation happens in DateTimeProperty.__set__
         super().__init__(value)
 
+    @classmethod
+    def _parse(cls, value):
+        """Validate value and return its DateTimeParts. Raise ValueError if invalid."""
+        if cls._pattern is None or value is None:
+            return None
+
+        if cls._pattern.fullmatch(value) is not None:
+            try:
+                return parse_datetime(value)
+            except ValueError:
+                pass
+
+        args = [value, cls.__name__]
+        raise ValueError('"{}" is not a valid {}'.format(*args))
+
     def _checkRegEx(self, value):
-        if self._regex and re.match(self._regex, value):
-            # The logic below would ideally be implemented by the subclass in
-            # question, but this makes generating the subclasses much easier.
-            if isinstance(self, dateTime) or isinstance(self, instant):
-                p = dateutil.parser.parse(value)
+        """Validate value and cache its parts. Raise ValueError if invalid."""
+        self.__dict__['_parts'] = self._parse(value)
+        self.__dict__['_datetime'] = None
+        self.__dict__['_key'] = None
+        return True
 
-                if isinstance(self, dateTime) and (p.hour or p.minute or p.second) and (p.tzinfo is None):
-                    args = [value, self.__class__.__name__]
-                    raise ValueError('"{}" is not a valid {}'.format(*args))
+    @property
+    def parts(self):
+        """Return the value as DateTimeParts (or None)."""
+        return self.__dict__.get('_parts')
 
-                elif isinstance(self, instant) and (p.tzinfo is None):
-                    args = [value, self.__class__.__name__]
-                    raise ValueError('"{}" is not a valid {}'.format(*args))
+    @property
+    def precision(self):
+        """Return the precision of the value (one of PRECISIONS) or None."""
+        parts = self.parts
+        return parts.precision if parts else None
 
-            return True
-        elif self._regex is None:
+    def toDatetime(self):
+        """Return the value as datetime.date, datetime.datetime or datetime.time.
 
-            return True
-        else:
-            args = [value, self.__class__.__name__]
-            raise ValueError('"{}" is not a valid {}'.format(*args))
+        A date (i.e. a value with a precision of a year, month or day) is
+        returned as datetime.date and missing components default to 1. A
+        dateTime with timezone is returned as an aware datetime.datetime. A
+        leap second is clipped to 59, as Python cannot represent it.
+        """
+        parts = self.parts
+
+        if parts is None:
+            return None
+
+        if self.__dict__.get('_datetime') is None:
+            if parts.year is None:
+                value = dt.time(parts.hour, parts.minute,
+                                min(parts.second, 59), parts.microsecond)
+
+            elif parts.hour is None:
+                value = dt.date(parts.year, parts.month or 1, parts.day or 1)
+
+            else:
+                tzinfo = None
+
+                if parts.tzoffset is not None:
+                    tzinfo = dt.timezone(dt.timedelta(minutes=parts.tzoffset))
+
+                value = datetime(parts.year, parts.month, parts.day,
+                                 parts.hour, parts.minute, min(parts.second, 59),
+                                 parts.microsecond, tzinfo)
+
+            self.__dict__['_datetime'] = value
+
+        return self.__dict__['_datetime']
+
+    @property
+    def key(self):
+        """Return the interval (start, end) covered by the value or None.
+
+        See datetime_key(). Sorting on key sorts values chronologically; values
+        that start at the same moment are ordered by their end, i.e. the finest
+        precision comes first: '2015-01-01' < '2015-01' < '2015'. The
+        comparison operators use the same order.
+        """
+        parts = self.parts
+
+        if parts is None:
+            return None
+
+        if self.__dict__.get('_key') is None:
+            self.__dict__['_key'] = datetime_key(parts)
+
+        return self.__dict__['_key']
+
+    def _otherKey(self, other):
+        """Return the key of other, which is either a dateTimeBase or a str.
+
+        Raises TypeError if self or other has no value, or if one is a time
+        and the other is not.
+        """
+        if isinstance(other, str):
+            other = self.__class__(other)
+
+        if self.parts is None or other.parts is None:
+            args = [self.__class__.__name__, other.__class__.__name__]
+            raise TypeError('Cannot compare {} and {} without a value'.format(*args))
+
+        if (self.parts.year is None) != (other.parts.year is None):
+            args = [self.__class__.__name__, other.__class__.__name__]
+            raise TypeError('Cannot compare {} and {}'.format(*args))
+
+        return other.key
+
+    def overlaps(self, other):
+        """Return True if the intervals of self and other overlap."""
+        other_start, other_end = self._otherKey(other)
+        start, end = self.key
+        return start < other_end and other_start < end
+
+    def contains(self, other):
+        """Return True if the interval of other lies within that of self."""
+        other_start, other_end = self._otherKey(other)
+        start, end = self.key
+        return start <= other_start and other_end <= end
+
+    def __lt__(self, other):
+        if not isinstance(other, (dateTimeBase, str)):
+            return NotImplemented
+        return self.key < self._otherKey(other)
+
+    def __le__(self, other):
+        if not isinstance(other, (dateTimeBase, str)):
+            return NotImplemented
+        return self.key <= self._otherKey(other)
+
+    def __gt__(self, other):
+        if not isinstance(other, (dateTimeBase, str)):
+            return NotImplemented
+        return self.key > self._otherKey(other)
+
+    def __ge__(self, other):
+        if not isinstance(other, (dateTimeBase, str)):
+            return NotImplemented
+        return self.key >= self._otherKey(other)
 
     def __repr__(self):
-        return repr(self._value)
+        return repr(self.value)
 
     def __str__(self):
-        return str(self._value)
+        return str(self.value)
 # class dateTimeBase
 
 
@@ -1041,7 +1529,7 @@ from ._datetime import dateTime
 from ._unsignedint import unsignedInt
 from ._code import code
 from ._date import date
-from ._decimal import decimal
+from ._decimal import decimal, json_loads, json_dumps
 from ._uri import uri
 from ._canonical import canonical
 from ._url import url
@@ -1096,4 +1584,9 @@ from .timing import Timing
 from .usagecontext import UsageContext
 from .valueset import ValueSet
 
+from .transcode import xml_to_json, xml_to_native, json_to_xml, native_to_xml
+from .parallel import parse_many
+from .intervals import IntervalIndex
+from . import ucum
+
 # __all__ = []
\ No newline at end of file
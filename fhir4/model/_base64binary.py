@@ -2,15 +2,64 @@
 from __future__ import print_function
 import datetime as dt
 import logging
+import os
+import binascii
+import tempfile
+import weakref
 
 from . import Property, DateTimeProperty, BaseType, dateTimeBase
 
 __all__ = ['base64Binary', ]
 
+# Number of characters decoded at once by base64Binary.save().
+CHUNKSIZE = 1024 * 1024
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+class Base64Property(Property):
+    """Property that reads a spilled value back from its file on access."""
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+
+        path = instance.__dict__.get('_path')
+        if path is not None and instance._property_values.get(self.name) is None:
+            # Not cached: the point of spilling is to not keep it in memory.
+            with open(path, encoding='ascii') as fp:
+                return fp.read()
+
+        return super().__get__(instance, owner)
+
+    def __set__(self, instance, value):
+        # A new value replaces the spilled one.
+        finalizer = instance.__dict__.get('_finalizer')
+        if finalizer is not None:
+            finalizer()
+
+        instance.__dict__['_path'] = None
+        instance.__dict__['_finalizer'] = None
+        instance.__dict__['_decoded'] = None
+        super().__set__(instance, value)
+# class Base64Property
+
 class base64Binary(BaseType):
-    """Autogenerated base64Binary type."""
+    """Autogenerated base64Binary type.
+
+    The value is the encoded text, exactly as it was parsed: serialization
+    passes it through as is. The content is only decoded when asked for,
+    using decode(), view() or save().
+
+    Large values can be moved to a temporary file using spill(); Resources
+    do this while parsing if the option ``spill`` (a size in characters) is
+    provided.
+    """
     
-    value = Property('value', str, '1', '1', 'xmlAttr')
+    value = Base64Property('value', str, '1', '1', 'xmlAttr')
     
     def __init__(self, value=None):
         """Initialize a new base64Binary instance."""
@@ -18,62 +67,120 @@ class base64Binary(BaseType):
             value = str(value)
 
         super(base64Binary, self).__init__(value)
+
+    @classmethod
+    def fromBytes(cls, data):
+        """Create a new instance by encoding bytes (or a bytes-like object)."""
+        return cls(binascii.b2a_base64(data, newline=False).decode('ascii'))
+
+    def __getstate__(self):
+        """Spilled values are pickled (and deepcopied) as text."""
+        state = super().__getstate__()
+
+        if state.get('_path') is not None:
+            state['_property_values']['value'] = self.value
+
+        state['_path'] = None
+        state['_finalizer'] = None
+        state['_decoded'] = None
+        return state
+
+    @property
+    def spilled(self):
+        """True if the value is kept in a temporary file."""
+        return self.__dict__.get('_path') is not None
+
+    def spill(self, dir=None):
+        """Move the encoded text to a temporary file.
+
+        The file is removed when this instance is garbage collected or when
+        a new value is set.
+        """
+        value = self._property_values.get('value')
+
+        if value is None:
+            return
+
+        with tempfile.NamedTemporaryFile('w', encoding='ascii', suffix='.b64',
+                                         dir=dir, delete=False) as fp:
+            fp.write(value)
+
+        self._property_values['value'] = None
+        self.__dict__['_decoded'] = None
+        self.__dict__['_path'] = fp.name
+        self.__dict__['_finalizer'] = weakref.finalize(self, _remove, fp.name)
+
+    def _spill(self, **options):
+        """Spill the value if it is larger than options['spill']."""
+        threshold = options.get('spill')
+        value = self._property_values.get('value')
+
+        if threshold is not None and value is not None and len(value) >= threshold:
+            self.spill()
+
+    def _chunks(self, chunksize=CHUNKSIZE):
+        """Yield the encoded text in chunks (without reading it all at once)."""
+        path = self.__dict__.get('_path')
+
+        if path is not None:
+            with open(path, encoding='ascii') as fp:
+                yield from iter(lambda: fp.read(chunksize), '')
+
+        elif self.value is not None:
+            for i in range(0, len(self.value), chunksize):
+                yield self.value[i:i + chunksize]
+
+    def decode(self):
+        """Return the decoded content as bytes (or None)."""
+        if self.value is None:
+            return None
+
+        return binascii.a2b_base64(self.value)
+
+    def view(self):
+        """Return the decoded content as (read-only) memoryview, or None.
+
+        The content is decoded on the first call and kept: later calls, and
+        slices of the view, do not copy it. Setting a new value or spilling
+        releases it.
+        """
+        data = self.__dict__.get('_decoded')
+
+        if data is None:
+            data = self.decode()
+
+            if data is None:
+                return None
+
+            self.__dict__['_decoded'] = data
+
+        return memoryview(data)
+
+    def save(self, path_or_fp, chunksize=CHUNKSIZE):
+        """Decode the content to a file, one chunk at a time.
+
+        :param path_or_fp: path or file object opened in binary mode.
+        """
+        if isinstance(path_or_fp, (str, os.PathLike)):
+            with open(path_or_fp, 'wb') as fp:
+                return self.save(fp, chunksize)
+
+        remainder = ''
+
+        for chunk in self._chunks(chunksize):
+            # Whitespace (e.g. line breaks) is allowed in the encoded text,
+            # but base64 can only be decoded per 4 characters.
+            chunk = remainder + ''.join(chunk.split())
+            n = len(chunk) - len(chunk) % 4
+            path_or_fp.write(binascii.a2b_base64(chunk[:n]))
+            remainder = chunk[n:]
+
+        if remainder:
+            path_or_fp.write(binascii.a2b_base64(remainder))
     
     def __str__(self):
         return str(self.value)
 
-    def __eq__(self, other):
-        if self.value is None or other is None:
-            return self.value is None and other is None
-        if isinstance(other, base64Binary):
-            return self.value.__eq__(other.value)
-        elif isinstance(other, str):
-            return self.value.__eq__(other)
-        
-        return self.value.__eq__(other)
-        
-    def __ne__(self, other):
-        if self.value is None or other is None:
-            return not (self.value is None and other is None)
-        if isinstance(other, base64Binary):
-            return self.value.__ne__(other.value)
-        elif isinstance(other, str):
-            return self.value.__ne__(other)
-        
-        return self.value.__ne__(other)
-        
-    def __lt__(self, other):
-        if isinstance(other, base64Binary):
-            return self.value.__lt__(other.value)
-        elif isinstance(other, str):
-            return self.value.__lt__(other)
-        
-        return self.value.__lt__(other)
-        
-    def __le__(self, other):
-        if isinstance(other, base64Binary):
-            return self.value.__le__(other.value)
-        elif isinstance(other, str):
-            return self.value.__le__(other)
-        
-        return self.value.__le__(other)
-        
-    def __gt__(self, other):
-        if isinstance(other, base64Binary):
-            return self.value.__gt__(other.value)
-        elif isinstance(other, str):
-            return self.value.__gt__(other)
-        
-        return self.value.__gt__(other)
-        
-    def __ge__(self, other):
-        if isinstance(other, base64Binary):
-            return self.value.__ge__(other.value)
-        elif isinstance(other, str):
-            return self.value.__ge__(other)
-        
-        return self.value.__ge__(other)
-        
     def __add__(self, other):
         if isinstance(other, base64Binary):
             return base64Binary(self.value.__add__(other.value))
@@ -3,7 +3,7 @@ from __future__ import print_function
 import datetime as dt
 import logging
 
-from . import Property, DateTimeProperty, BaseType, dateTimeBase
+from . import Property, PropertyList, DateTimeProperty, BaseType, dateTimeBase
 
 __all__ = ['boolean', ]
 
@@ -16,18 +16,74 @@ class boolean_(int):
     
     __str__ = __repr__
 
+# Values accepted by boolean(), including their JSON/XML representation.
+_VALUES = {True: boolean_(1), False: boolean_(0), 'true': boolean_(1), 'false': boolean_(0)}
+
+class SharedInstanceError(TypeError):
+    def __init__(self, instance):
+        message = ("The shared boolean '{}' cannot be modified; "
+                   "use boolean({}) to create a new instance.")
+        message = message.format(instance, bool(instance))
+        super(SharedInstanceError, self).__init__(message)
+# class SharedInstanceError
+
+class _SharedList(PropertyList):
+    """Empty, immutable PropertyList for the extensions of a shared boolean."""
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError('The extensions of a shared boolean cannot be modified.')
+
+    insert = append = extend = _immutable
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _immutable
+# class _SharedList
+
 class boolean(BaseType):
-    """Adapted from https://www.python.org/dev/peps/pep-0285/"""
+    """Adapted from https://www.python.org/dev/peps/pep-0285/
+
+    boolean.TRUE and boolean.FALSE are shared, immutable instances. They are
+    used when a value is parsed or assigned as native value (e.g.
+    ``patient.active = True``), unless it has an id or extensions. Calling
+    boolean() always creates a new (mutable) instance.
+    """
     
     value = Property('value', boolean_, '1', '1', 'xmlAttr')
     
-    def __init__(self, value):
-        if value == "true":
-            value = 1
-        elif value == "false":
-            value = 0
-        
-        super(boolean, self).__init__(value)
+    def __init__(self, value=None, **kwargs):
+        try:
+            value = _VALUES.get(value, value)
+        except TypeError:
+            # unhashable; leave it to Property to complain.
+            pass
+
+        super(boolean, self).__init__(value, **kwargs)
+
+    @classmethod
+    def of(cls, value):
+        """Return the shared instance for value (True, False, 'true', 'false')."""
+        try:
+            return _SHARED[value]
+        except (KeyError, TypeError):
+            raise ValueError('"{}" is not a valid boolean'.format(value))
+
+    def _share(self):
+        """Make this instance immutable (used for TRUE and FALSE)."""
+        definition = type(self).extension.definition
+        self._property_values['extension'] = _SharedList(definition)
+        self.__dict__['_shared'] = True
+        return self
+
+    def __setattr__(self, attr, value):
+        if self.__dict__.get('_shared'):
+            raise SharedInstanceError(self)
+
+        super().__setattr__(attr, value)
+
+    def __reduce_ex__(self, protocol):
+        # Keep the shared instances unique when (un)pickling or copying.
+        if self.__dict__.get('_shared'):
+            return (boolean.of, (bool(self), ))
+
+        return super().__reduce_ex__(protocol)
     
     def __repr__(self):
         if self.value:
@@ -37,33 +93,45 @@ class boolean(BaseType):
 
     __str__ = __repr__
 
+    def __bool__(self):
+        return bool(self.value)
+
+    def __int__(self):
+        return int(self.value)
+
+    def __hash__(self):
+        return hash(bool(self.value))
+
     def __eq__(self, other):
         if self.value is None or other is None:
             return self.value is None and other is None
 
-        return bool(int(self.value) == int(other))
+        if isinstance(other, (bool, int, boolean)):
+            return int(self.value) == int(other)
+
+        return NotImplemented
 
     def __and__(self, other):
-        if isinstance(other, bool) or isinstance(other, boolean):
-            return bool(int(self.value) & int(other))
-        else:
-            return int.__and__(self, other)
+        if isinstance(other, (bool, boolean)):
+            return bool(self.value) & bool(other)
+
+        return NotImplemented
 
     __rand__ = __and__
 
     def __or__(self, other):
-        if isinstance(other, bool):
-            return bool(int(self.value) | int(other))
-        else:
-            return int.__or__(self, other)
+        if isinstance(other, (bool, boolean)):
+            return bool(self.value) | bool(other)
+
+        return NotImplemented
 
     __ror__ = __or__
 
     def __xor__(self, other):
-        if isinstance(other, bool):
-            return bool(int(self.value) ^ int(other))
-        else:
-            return int.__xor__(self.value, other)
+        if isinstance(other, (bool, boolean)):
+            return bool(self.value) ^ bool(other)
+
+        return NotImplemented
 
     __rxor__ = __xor__
     
@@ -72,5 +140,12 @@ class boolean(BaseType):
         return bool(self.value)
     
     
+boolean.TRUE = boolean(True)._share()
+boolean.FALSE = boolean(False)._share()
 
-
+_SHARED = {
+    True: boolean.TRUE,
+    False: boolean.FALSE,
+    'true': boolean.TRUE,
+    'false': boolean.FALSE,
+}
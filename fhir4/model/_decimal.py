@@ -1,79 +1,285 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function
 import datetime as dt
+import fractions
 import logging
+import re
+import json
+import json.encoder
 
 from . import Property, DateTimeProperty, BaseType, dateTimeBase
 
 __all__ = ['decimal', ]
 
+_regex = re.compile(r'(?P<sign>-?)(?P<int>0|[1-9][0-9]*)(\.(?P<frac>[0-9]+))?([eE](?P<exp>[+-]?[0-9]+))?')
+
+class decimal_(float):
+    """float that retains the lexical representation of a FHIR decimal.
+
+    The lexical form (e.g. '1.50') is used when serializing, so values round
+    trip exactly. Comparison and addition, subtraction and multiplication
+    with other decimal_ values or ints are exact: they use the value as
+    scaled integer (150, 2). Other operations are float operations.
+    """
+    __slots__ = ('_lexical', '_scaled')
+
+    def __new__(cls, value):
+        if isinstance(value, decimal_):
+            return value
+
+        if isinstance(value, float):
+            lexical = repr(value)
+        else:
+            lexical = str(value)
+
+        if _regex.fullmatch(lexical) is None:
+            raise ValueError('"{}" is not a valid decimal'.format(value))
+
+        self = float.__new__(cls, lexical)
+        self._lexical = lexical
+        self._scaled = None
+        return self
+
+    @classmethod
+    def fromScaled(cls, unscaled, scale):
+        """Create a decimal_ with value unscaled * 10**-scale."""
+        if scale <= 0:
+            return cls(unscaled * 10 ** -scale)
+
+        digits = str(abs(unscaled)).rjust(scale + 1, '0')
+        sign = '-' if unscaled < 0 else ''
+        return cls('{}{}.{}'.format(sign, digits[:-scale], digits[-scale:]))
+
+    @property
+    def scaled(self):
+        """Return (unscaled, scale) so that value == unscaled * 10**-scale."""
+        if self._scaled is None:
+            m = _regex.fullmatch(self._lexical)
+            frac = m.group('frac') or ''
+            unscaled = int(m.group('int') + frac)
+            scale = len(frac) - int(m.group('exp') or 0)
+            self._scaled = (-unscaled if m.group('sign') else unscaled, scale)
+
+        return self._scaled
+
+    def _align(self, other):
+        """Return the scaled values of self and other (decimal_ or int)."""
+        a, scale_a = self.scaled
+        b, scale_b = other.scaled if isinstance(other, decimal_) else (int(other), 0)
+        scale = max(scale_a, scale_b)
+        return a * 10 ** (scale - scale_a), b * 10 ** (scale - scale_b), scale
+
+    @staticmethod
+    def _exact(other):
+        return isinstance(other, (decimal_, int)) and not isinstance(other, bool)
+
+    def __repr__(self):
+        return self._lexical
+
+    __str__ = __repr__
+
+    def __hash__(self):
+        # Hash the exact value, like int and Fraction do: equal decimals
+        # and ints (also beyond 2**53) have the same hash.
+        unscaled, scale = self.scaled
+
+        if scale <= 0:
+            return hash(unscaled * 10 ** -scale)
+
+        if unscaled % 10 ** scale == 0:
+            return hash(unscaled // 10 ** scale)
+
+        return hash(fractions.Fraction(unscaled, 10 ** scale))
+
+    def __eq__(self, other):
+        if decimal_._exact(other):
+            a, b, scale = self._align(other)
+            return a == b
+        return float.__eq__(self, other)
+
+    def __ne__(self, other):
+        if decimal_._exact(other):
+            a, b, scale = self._align(other)
+            return a != b
+        return float.__ne__(self, other)
+
+    def __lt__(self, other):
+        if decimal_._exact(other):
+            a, b, scale = self._align(other)
+            return a < b
+        return float.__lt__(self, other)
+
+    def __le__(self, other):
+        if decimal_._exact(other):
+            a, b, scale = self._align(other)
+            return a <= b
+        return float.__le__(self, other)
+
+    def __gt__(self, other):
+        if decimal_._exact(other):
+            a, b, scale = self._align(other)
+            return a > b
+        return float.__gt__(self, other)
+
+    def __ge__(self, other):
+        if decimal_._exact(other):
+            a, b, scale = self._align(other)
+            return a >= b
+        return float.__ge__(self, other)
+
+    def __add__(self, other):
+        if decimal_._exact(other):
+            a, b, scale = self._align(other)
+            return decimal_.fromScaled(a + b, scale)
+        return float.__add__(self, other)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        if decimal_._exact(other):
+            a, b, scale = self._align(other)
+            return decimal_.fromScaled(a - b, scale)
+        return float.__sub__(self, other)
+
+    def __rsub__(self, other):
+        if decimal_._exact(other):
+            a, b, scale = self._align(other)
+            return decimal_.fromScaled(b - a, scale)
+        return float.__rsub__(self, other)
+
+    def __mul__(self, other):
+        if decimal_._exact(other):
+            a, scale_a = self.scaled
+            b, scale_b = other.scaled if isinstance(other, decimal_) else (int(other), 0)
+            return decimal_.fromScaled(a * b, scale_a + scale_b)
+        return float.__mul__(self, other)
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        unscaled, scale = self.scaled
+        return decimal_.fromScaled(-unscaled, scale)
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        unscaled, scale = self.scaled
+        return decimal_.fromScaled(abs(unscaled), scale)
+
+    def __reduce__(self):
+        return (decimal_, (self._lexical, ))
+# class decimal_
+
+class DecimalEncoder(json.JSONEncoder):
+    """JSONEncoder that writes decimal_ values in their lexical form.
+
+    Always uses the pure Python encoder (the C encoder cannot be told how
+    to format floats), which json.dumps() also uses when indenting.
+    """
+
+    def iterencode(self, o, _one_shot=False):
+        markers = {} if self.check_circular else None
+
+        if self.ensure_ascii:
+            _encoder = json.encoder.encode_basestring_ascii
+        else:
+            _encoder = json.encoder.encode_basestring
+
+        def floatstr(o, _floatstr=json.encoder.JSONEncoder(allow_nan=self.allow_nan)):
+            if isinstance(o, decimal_):
+                return o._lexical
+            return _floatstr.encode(o)
+
+        _iterencode = json.encoder._make_iterencode(
+            markers, self.default, _encoder, self.indent, floatstr,
+            self.key_separator, self.item_separator, self.sort_keys,
+            self.skipkeys, _one_shot)
+        return _iterencode(o, 0)
+# class DecimalEncoder
+
+def json_dumps(obj, indent=2, separators=None):
+    """json.dumps() that keeps the lexical form of decimals."""
+    return json.dumps(obj, indent=indent, separators=separators, cls=DecimalEncoder)
+
+def json_loads(string):
+    """json.loads() that keeps the lexical form of decimals."""
+    return json.loads(string, parse_float=decimal_)
+
 class decimal(BaseType):
     """Autogenerated decimal type."""
     
-    value = Property('value', float, '1', '1', 'xmlAttr')
+    value = Property('value', decimal_, '1', '1', 'xmlAttr')
     
     def __init__(self, value=None):
-        """Initialize a new decimal instance."""
+        """Initialize a new decimal instance.
+
+        :param value: str (lexical form), int, float or decimal_.
+        """
         if value is not None:
-            value = float(value)
+            value = decimal_(value)
 
         super(decimal, self).__init__(value)
     
     def __float__(self):
         return float(self.value)
 
-    def __eq__(self, other):
-        if self.value is None or other is None:
-            return self.value is None and other is None
-        if isinstance(other, decimal):
-            return self.value.__eq__(other.value)
-        elif isinstance(other, float):
-            return self.value.__eq__(other)
-        
-        return self.value.__eq__(other)
-        
-    def __ne__(self, other):
-        if self.value is None or other is None:
-            return not (self.value is None and other is None)
-        if isinstance(other, decimal):
-            return self.value.__ne__(other.value)
-        elif isinstance(other, float):
-            return self.value.__ne__(other)
-        
-        return self.value.__ne__(other)
-        
-    def __lt__(self, other):
-        if isinstance(other, decimal):
-            return self.value.__lt__(other.value)
-        elif isinstance(other, float):
-            return self.value.__lt__(other)
-        
-        return self.value.__lt__(other)
-        
-    def __le__(self, other):
-        if isinstance(other, decimal):
-            return self.value.__le__(other.value)
-        elif isinstance(other, float):
-            return self.value.__le__(other)
-        
-        return self.value.__le__(other)
-        
-    def __gt__(self, other):
-        if isinstance(other, decimal):
-            return self.value.__gt__(other.value)
-        elif isinstance(other, float):
-            return self.value.__gt__(other)
-        
-        return self.value.__gt__(other)
-        
-    def __ge__(self, other):
-        if isinstance(other, decimal):
-            return self.value.__ge__(other.value)
-        elif isinstance(other, float):
-            return self.value.__ge__(other)
-        
-        return self.value.__ge__(other)
-        
+    @staticmethod
+    def to_float_array(values):
+        """Return a numpy float64 array for an iterable of decimals.
+
+        None (or a decimal without value) becomes NaN. Requires numpy.
+        """
+        import numpy as np
+
+        values = [getattr(v, 'value', v) for v in values]
+        floats = [np.nan if v is None else v for v in values]
+        return np.array(floats, dtype=np.float64)
+
+    @staticmethod
+    def to_scaled_array(values, scale=None):
+        """Return (masked int64 array, scale) for an iterable of decimals.
+
+        Every value equals array[i] * 10**-scale exactly; the scale defaults
+        to the largest scale found (at least 0). Missing values are masked.
+        Raises OverflowError if a value does not fit into an int64 at the
+        given scale and ValueError if it would have to be rounded. Requires
+        numpy.
+        """
+        import numpy as np
+
+        values = [getattr(v, 'value', v) for v in values]
+        scaled = [None if v is None else decimal_(v).scaled for v in values]
+
+        if scale is None:
+            scale = max([0] + [s for (i, s) in filter(None, scaled)])
+
+        unscaled, mask = [], []
+
+        for item in scaled:
+            if item is None:
+                unscaled.append(0)
+                mask.append(True)
+                continue
+
+            i, s = item
+            if s > scale:
+                i, remainder = divmod(i, 10 ** (s - scale))
+                if remainder:
+                    msg = 'Cannot represent {} at scale {} exactly'
+                    raise ValueError(msg.format(item, scale))
+            else:
+                i *= 10 ** (scale - s)
+
+            if not -2**63 <= i < 2**63:
+                raise OverflowError('{} does not fit into an int64'.format(i))
+
+            unscaled.append(i)
+            mask.append(False)
+
+        array = np.ma.array(np.array(unscaled, dtype=np.int64), mask=mask)
+        return array, scale
+
     def __add__(self, other):
         if isinstance(other, decimal):
             return decimal(self.value.__add__(other.value))
@@ -101,11 +307,13 @@ class decimal(BaseType):
     
     def __mul__(self, other):
         """x * y <==> x.__mul__(y)"""
-        return decimal(float(self).__mul__(other))
+        if isinstance(other, decimal):
+            other = other.value
+        return decimal(self.value.__mul__(other))
 
     def __rmul__(self, other):
         """y * x <==> x.__rmul__(y)"""
-        return decimal(float(self).__mul__(other))
+        return self.__mul__(other)
 
 
 
@@ -22,58 +22,6 @@ class integer(BaseType):
     def __int__(self):
         return int(self.value)
 
-    def __eq__(self, other):
-        if self.value is None or other is None:
-            return self.value is None and other is None
-        if isinstance(other, integer):
-            return self.value.__eq__(other.value)
-        elif isinstance(other, int):
-            return self.value.__eq__(other)
-        
-        return self.value.__eq__(other)
-        
-    def __ne__(self, other):
-        if self.value is None or other is None:
-            return not (self.value is None and other is None)
-        if isinstance(other, integer):
-            return self.value.__ne__(other.value)
-        elif isinstance(other, int):
-            return self.value.__ne__(other)
-        
-        return self.value.__ne__(other)
-        
-    def __lt__(self, other):
-        if isinstance(other, integer):
-            return self.value.__lt__(other.value)
-        elif isinstance(other, int):
-            return self.value.__lt__(other)
-        
-        return self.value.__lt__(other)
-        
-    def __le__(self, other):
-        if isinstance(other, integer):
-            return self.value.__le__(other.value)
-        elif isinstance(other, int):
-            return self.value.__le__(other)
-        
-        return self.value.__le__(other)
-        
-    def __gt__(self, other):
-        if isinstance(other, integer):
-            return self.value.__gt__(other.value)
-        elif isinstance(other, int):
-            return self.value.__gt__(other)
-        
-        return self.value.__gt__(other)
-        
-    def __ge__(self, other):
-        if isinstance(other, integer):
-            return self.value.__ge__(other.value)
-        elif isinstance(other, int):
-            return self.value.__ge__(other)
-        
-        return self.value.__ge__(other)
-        
     def __add__(self, other):
         if isinstance(other, integer):
             return integer(self.value.__add__(other.value))
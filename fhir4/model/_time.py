@@ -9,7 +9,7 @@ __all__ = ['time', ]
 
 class time(dateTimeBase):
     """Autogenerated time type."""
-    _regex = '([01][0-9]|2[0-3]):[0-5][0-9]:([0-5][0-9]|60)(\.[0-9]+)?'    
+    _regex = r'([01][0-9]|2[0-3]):[0-5][0-9]:([0-5][0-9]|60)(\.[0-9]+)?'    
     
     value = DateTimeProperty('value', str, '1', '1', 'xmlAttr')
 
@@ -3,77 +3,93 @@ from __future__ import print_function
 import datetime as dt
 import logging
 
+import xml.etree.ElementTree as ET
+
 from . import Property, DateTimeProperty, BaseType, dateTimeBase
+from . import xmlbackend
 
 __all__ = ['xhtml', ]
 
+def xhtml_tostring(element):
+    """Serialize an xhtml element, using the default namespace."""
+    value = xmlbackend.backend_for(element).tostring(element)
+    value = value.replace('html:', '')
+    value = value.replace(':html', '')
+    return value
+
+class XHTMLProperty(Property):
+    """Property that renders an xhtml subtree to a string on first access."""
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+
+        element = instance.__dict__.get('_element')
+        if element is not None and instance._property_values.get(self.name) is None:
+            instance._property_values[self.name] = xhtml_tostring(element)
+
+        return super().__get__(instance, owner)
+
+    def __set__(self, instance, value):
+        # Any previously parsed/source subtree is no longer valid.
+        instance.__dict__['_element'] = None
+        super().__set__(instance, value)
+# class XHTMLProperty
+
 class xhtml(BaseType):
-    """Autogenerated xhtml type."""
+    """Autogenerated xhtml type.
+
+    When marshalled from XML, the parsed ``<div>`` subtree is kept as is and
+    only converted to a string when ``value`` is accessed. Serializing back to
+    XML reuses the subtree, so unread narratives are never re-parsed.
+    """
     
-    value = Property('value', str, '1', '1', 'xmlAttr')
+    value = XHTMLProperty('value', str, '1', '1', 'xmlAttr')
     
     def __init__(self, value=None):
-        """Initialize a new xhtml instance."""
-        if value is not None:
+        """Initialize a new xhtml instance.
+
+        :param value: str or (parsed) ElementTree element.
+        """
+        element = None
+        if ET.iselement(value):
+            element, value = value, None
+        elif value is not None:
             value = str(value)
 
         super(xhtml, self).__init__(value)
+
+        if element is not None:
+            # The tail belongs to the enclosing document, not the narrative.
+            element.tail = None
+            self._element = element
     
+    def __getstate__(self):
+        """Elements are not (always) picklable: keep the string instead."""
+        self.value
+        state = super().__getstate__()
+        state['_element'] = None
+        return state
+
+    def toElement(self):
+        """Return the value as an element of the active XML backend.
+
+        The string value is parsed at most once; the result is cached.
+        """
+        backend = xmlbackend.get_backend()
+
+        if self._element is not None and not backend.iselement(self._element):
+            # Parsed by another backend: round trip through the string value.
+            self._element = backend.fromstring(self.value)
+
+        elif self._element is None and self.value is not None:
+            self._element = backend.fromstring(self.value)
+
+        return self._element
+
     def __str__(self):
         return str(self.value)
 
-    def __eq__(self, other):
-        if self.value is None or other is None:
-            return self.value is None and other is None
-        if isinstance(other, xhtml):
-            return self.value.__eq__(other.value)
-        elif isinstance(other, str):
-            return self.value.__eq__(other)
-        
-        return self.value.__eq__(other)
-        
-    def __ne__(self, other):
-        if self.value is None or other is None:
-            return not (self.value is None and other is None)
-        if isinstance(other, xhtml):
-            return self.value.__ne__(other.value)
-        elif isinstance(other, str):
-            return self.value.__ne__(other)
-        
-        return self.value.__ne__(other)
-        
-    def __lt__(self, other):
-        if isinstance(other, xhtml):
-            return self.value.__lt__(other.value)
-        elif isinstance(other, str):
-            return self.value.__lt__(other)
-        
-        return self.value.__lt__(other)
-        
-    def __le__(self, other):
-        if isinstance(other, xhtml):
-            return self.value.__le__(other.value)
-        elif isinstance(other, str):
-            return self.value.__le__(other)
-        
-        return self.value.__le__(other)
-        
-    def __gt__(self, other):
-        if isinstance(other, xhtml):
-            return self.value.__gt__(other.value)
-        elif isinstance(other, str):
-            return self.value.__gt__(other)
-        
-        return self.value.__gt__(other)
-        
-    def __ge__(self, other):
-        if isinstance(other, xhtml):
-            return self.value.__ge__(other.value)
-        elif isinstance(other, str):
-            return self.value.__ge__(other)
-        
-        return self.value.__ge__(other)
-        
     def __add__(self, other):
         if isinstance(other, xhtml):
             return xhtml(self.value.__add__(other.value))
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""In-memory interval index over Periods (and other date/time values).
+
+An IntervalIndex is built in bulk from a collection of resources (or
+elements) and a property path, for example:
+
+    >>> index = IntervalIndex(encounters, 'period')
+    >>> index.at('2017-03-01T10:00:00Z')
+    [<Encounter ...>, ...]
+    >>> index.overlapping('2017-01', '2017-03')
+
+Intervals are half open, [start, end), in microseconds since the epoch (see
+datetime_key()): a value covers its full precision, so a Period that ends on
+'2017-03-01' includes that day. A Period without start (or end) is open
+ended. Queries take O(log n + k) time for k results.
+"""
+import bisect
+import datetime as dt
+
+from . import dateTimeBase, PropertyList
+from ._datetime import dateTime
+
+__author__ = "Melle Sieswerda"
+__copyright__  = "Copyright 2017, Melle Sieswerda"
+__license__ = "GPL"
+__version__ = "0.8"
+
+__all__ = ['IntervalIndex']
+
+OPEN_START = float('-inf')
+OPEN_END = float('inf')
+
+_EPOCH = dt.datetime(1970, 1, 1)
+
+
+def _resolve(item, path):
+    """Return the values found by following 'path' (e.g. 'location.period')."""
+    values = [item]
+
+    for name in path.split('.') if path else []:
+        found = []
+
+        for value in values:
+            value = getattr(value, name, None)
+
+            if isinstance(value, (list, PropertyList)):
+                found.extend(v for v in value if v is not None)
+            elif value is not None:
+                found.append(value)
+
+        values = found
+
+    return values
+
+
+def _interval(value):
+    """Return (start, end) for a Period or a dateTimeBase (None if empty)."""
+    if isinstance(value, dateTimeBase):
+        return value.key
+
+    start, end = value.bounds()
+    start = start if start is not None else OPEN_START
+    end = end if end is not None else OPEN_END
+
+    if start == OPEN_START and end == OPEN_END:
+        return None
+
+    return start, end
+
+
+def _key(moment):
+    """Return (start, end) for a moment: str, dateTime/date/instant or datetime."""
+    if isinstance(moment, dateTimeBase):
+        return moment.key
+
+    if isinstance(moment, dt.datetime):
+        if moment.tzinfo is not None:
+            moment = moment.replace(tzinfo=None) - moment.utcoffset()
+
+        start = (moment - _EPOCH) // dt.timedelta(microseconds=1)
+        return start, start + 1
+
+    if isinstance(moment, dt.date):
+        moment = moment.isoformat()
+
+    return dateTime(moment).key
+
+
+class IntervalIndex(object):
+    """Index of intervals for fast 'at' and 'overlapping' queries.
+
+    The intervals are kept sorted by start, together with an implicit,
+    balanced binary tree that holds the maximum end of every subtree. A
+    query only descends into subtrees that can contain a match.
+    """
+
+    def __init__(self, items, path=None):
+        """Create a new IntervalIndex.
+
+        :param items: iterable of resources or elements.
+        :param str path: dotted property path to the Period(s) of an item,
+            e.g. 'period' or 'dispenseRequest.validityPeriod'. Lists along
+            the path are flattened. The path may also lead to a dateTime,
+            date or instant. If None, the items themselves are used.
+
+        Items without a Period (or with an empty one) are not indexed; an
+        item with several Periods is indexed once for each.
+        """
+        entries = []
+
+        for item in items:
+            for value in _resolve(item, path):
+                interval = _interval(value)
+
+                if interval is not None:
+                    entries.append((interval[0], interval[1], len(entries), item))
+
+        entries.sort(key=lambda e: (e[0], e[2]))
+
+        self._starts = [e[0] for e in entries]
+        self._ends = [e[1] for e in entries]
+        self._items = [e[3] for e in entries]
+        self._max_ends = list(self._ends)
+        self._build(0, len(entries))
+
+    def _build(self, lo, hi):
+        """Compute the maximum end of the subtree over [lo, hi); return it."""
+        if lo >= hi:
+            return OPEN_START
+
+        mid = (lo + hi) // 2
+        max_end = max(self._ends[mid], self._build(lo, mid), self._build(mid + 1, hi))
+        self._max_ends[mid] = max_end
+        return max_end
+
+    def __len__(self):
+        return len(self._items)
+
+    def _search(self, start, end):
+        """Return the (sorted) positions of the intervals overlapping [start, end)."""
+        # Only intervals that start before 'end' are candidates.
+        limit = bisect.bisect_left(self._starts, end)
+        positions = []
+        stack = [(0, len(self._starts))]
+
+        while stack:
+            lo, hi = stack.pop()
+
+            if lo >= hi or lo >= limit:
+                continue
+
+            mid = (lo + hi) // 2
+
+            # Nothing in this subtree ends after 'start'.
+            if self._max_ends[mid] <= start:
+                continue
+
+            if mid < limit and self._ends[mid] > start:
+                positions.append(mid)
+
+            stack.append((lo, mid))
+            stack.append((mid + 1, hi))
+
+        positions.sort()
+        return positions
+
+    def _unique(self, positions):
+        seen = set()
+        items = []
+
+        for position in positions:
+            item = self._items[position]
+
+            if id(item) not in seen:
+                seen.add(id(item))
+                items.append(item)
+
+        return items
+
+    def overlapping(self, start=None, end=None):
+        """Return the items whose interval overlaps [start, end].
+
+        :param start: str, dateTime, date, datetime.date or datetime.datetime;
+            None means open ended.
+        :param end: idem; the end is inclusive at its precision, so
+            overlapping('2017-01', '2017-03') includes all of March.
+
+        Items are returned in order of the start of their interval.
+        """
+        lo = _key(start)[0] if start is not None else OPEN_START
+        hi = _key(end)[1] if end is not None else OPEN_END
+
+        return self._unique(self._search(lo, hi))
+
+    def at(self, moment):
+        """Return the items that were active at 'moment'.
+
+        A moment of limited precision, e.g. '2017-03-01', selects everything
+        that was active at some point during that day.
+        """
+        return self.overlapping(moment, moment)
+# class IntervalIndex
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""Parse many independent documents using a pool of processes.
+
+Parsing is pure Python and CPU bound, so a single process is limited to
+a single core. parse_many() distributes chunks of documents over a
+ProcessPoolExecutor. Parsed Resources are sent back pickled; unpickling
+(see FHIRBase.__getstate__) restores the property values as is, which is
+much cheaper than parsing the document again.
+"""
+import os
+import collections
+import concurrent.futures
+import itertools
+
+from . import SUPPORTED_FORMATS, UnsupportedFormatError
+from .resource import Resource
+
+__author__ = "Melle Sieswerda"
+__copyright__  = "Copyright 2017, Melle Sieswerda"
+__license__ = "GPL"
+__version__ = "0.8"
+
+__all__ = ['parse_many']
+
+
+def _parse_chunk(documents, format, narrative):
+    """Parse a list of documents; runs in a worker process."""
+    return [Resource.loads(d, format, narrative=narrative) for d in documents]
+
+
+def _chunks(iterable, chunksize):
+    iterator = iter(iterable)
+
+    while True:
+        chunk = list(itertools.islice(iterator, chunksize))
+
+        if not chunk:
+            return
+
+        yield chunk
+
+
+def parse_many(iterable, format='xml', workers=None, chunksize=16,
+               narrative=True):
+    """Parse documents (str) from iterable and yield Resources in order.
+
+    :param str format: 'xml' or 'json'; all documents must use the same.
+    :param int workers: number of processes; defaults to the number of CPUs.
+        Use workers=0 to parse in the current process.
+    :param int chunksize: number of documents sent to a worker at once.
+    :param bool narrative: if False, Narratives are skipped while parsing.
+
+    Documents are consumed lazily: at most ``2 * workers`` chunks are in
+    flight at any time, so arbitrarily large iterables can be processed.
+    The arguments are checked when parse_many() is called, not when the
+    iteration starts.
+    """
+    if format not in SUPPORTED_FORMATS:
+        raise UnsupportedFormatError(format)
+
+    if workers is not None and workers < 0:
+        raise ValueError('workers must be >= 0, not {}'.format(workers))
+
+    if chunksize < 1:
+        raise ValueError('chunksize must be >= 1, not {}'.format(chunksize))
+
+    return _parse_many(iterable, format, workers, chunksize, narrative)
+
+
+def _parse_many(iterable, format, workers, chunksize, narrative):
+    """Generator that does the work of parse_many()."""
+    if workers == 0:
+        for chunk in _chunks(iterable, chunksize):
+            yield from _parse_chunk(chunk, format, narrative)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = 2 * workers
+    pending = collections.deque()
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk in _chunks(iterable, chunksize):
+            pending.append(executor.submit(_parse_chunk, chunk, format, narrative))
+
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
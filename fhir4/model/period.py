@@ -31,3 +31,18 @@ class Period(Element):
     
     start = Property('start', dateTime, '0', '1')
     end = Property('end', dateTime, '0', '1')
+
+    def bounds(self):
+        """Return (start, end) in microseconds since the epoch.
+
+        See datetime_key(): end is the end of the interval covered by
+        Period.end. A bound that is absent or has no value (e.g. only a
+        data-absent-reason extension) is None, i.e. open.
+        """
+        start = self.start.key if self.start is not None else None
+        end = self.end.key if self.end is not None else None
+
+        return (
+            start[0] if start is not None else None,
+            end[1] if end is not None else None,
+        )
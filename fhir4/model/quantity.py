@@ -5,6 +5,7 @@ import logging
 
 from . import Property
 from . import FHIRBase, Element, Extension, Reference
+from . import ucum
 
 
 from ._code import code
@@ -40,3 +41,84 @@ class Quantity(Element):
     unit = Property('unit', string, '0', '1')
     system = Property('system', uri, '0', '1')
     code = Property('code', code, '0', '1')
+
+
+    def _unitCode(self):
+        """Return the code used to look up the unit."""
+        if self.system is None:
+            code = self.code if self.code is not None else self.unit
+        elif str(self.system) == ucum.UCUM:
+            code = self.code
+        else:
+            # Codes from another system are meaningless to UCUM; the unit
+            # (human readable) might still be.
+            code = self.unit
+
+        return str(code) if code is not None else None
+
+    def normalized(self):
+        """Return a new Quantity with the value in the canonical UCUM unit.
+
+        E.g. 5.5 mmol/L becomes 5.5 mol.m-3 and 90 mg/dL 900 g.m-3. Raises
+        ucum.UnknownUnitError if the unit cannot be converted.
+        """
+        code = self._unitCode()
+        unit = ucum.parse_unit(code if code is not None else '1')
+        value = self.value
+
+        if value is not None:
+            value = unit.toCanonical(float(value))
+
+        return self.__class__(
+            value=value,
+            comparator=self.comparator,
+            unit=unit.canonical,
+            system=ucum.UCUM,
+            code=unit.canonical,
+        )
+
+    @staticmethod
+    def normalize_many(quantities, strict=True):
+        """Normalize a list of Quantities to their canonical UCUM units.
+
+        Return (values, units): a NumPy float array and an array (dtype
+        object) with the canonical units. Missing quantities or values
+        become NaN (unit None). If strict is False, so do quantities with
+        an unknown unit; otherwise ucum.UnknownUnitError is raised.
+
+        Requires NumPy.
+        """
+        import numpy as np
+
+        values, codes = [], []
+
+        for quantity in quantities:
+            if quantity is None or quantity.value is None:
+                values.append(np.nan)
+                codes.append(None)
+            else:
+                values.append(float(quantity.value))
+                codes.append(quantity._unitCode() or '1')
+
+        unique = {code: i for i, code in enumerate(dict.fromkeys(codes))}
+        index = np.array([unique[code] for code in codes], dtype=np.intp)
+
+        factors = np.full(len(unique), np.nan)
+        offsets = np.zeros(len(unique))
+        units = np.empty(len(unique), dtype=object)
+
+        for code, i in unique.items():
+            if code is None:
+                continue
+
+            try:
+                unit = ucum.parse_unit(code)
+            except ucum.UnknownUnitError:
+                if strict:
+                    raise
+                continue
+
+            factors[i], offsets[i], units[i] = unit
+
+        values = np.array(values, dtype=float) * factors[index] + offsets[index]
+        return values, units[index]
@@ -13,7 +13,7 @@ from ._uri import uri
 
 from .meta import Meta
 
-import xml.etree.ElementTree as ET
+from . import xmlbackend
 
 __author__ = "Melle Sieswerda"
 __copyright__  = "Copyright 2017, Melle Sieswerda"
@@ -43,13 +43,14 @@ class Resource(FHIRBase):
     def toXML(self, parent=None, path=None):
         """Return an XML representation of this object."""
         tag = self.__class__.__name__
+        backend = xmlbackend.get_backend()
         
         if parent is None:
-            parent = ET.Element(tag)
+            parent = backend.Element(tag)
             parent.set('xmlns', 'http://hl7.org/fhir')
             path = [tag, ]
         else:
             # Resources *always* render their type tag (e.g. '<Patient>')
-            parent = ET.SubElement(parent, tag)
+            parent = backend.SubElement(parent, tag)
         
         return super().toXML(parent, path)
@@ -2,6 +2,7 @@
 from __future__ import print_function
 import datetime as dt
 import logging
+import re
 
 from . import Property
 from . import FHIRBase, Element, Extension, Reference
@@ -20,6 +21,9 @@ __version__ = "0.8"
 
 __all__ = ['SampledData']
 
+# Data markers: error, above the upper limit and below the lower limit.
+MARKERS = re.compile(r'(?<!\S)[EUL](?!\S)')
+
 
 # ------------------------------------------------------------------------------
 # SampledData
@@ -40,3 +44,111 @@ class SampledData(Element):
     upperLimit = Property('upperLimit', decimal, '0', '1')
     dimensions = Property('dimensions', positiveInt, '1', '1')
     data = Property('data', string, '0', '1')
+
+
+    def to_array(self, masked=False):
+        """Return the samples as NumPy array of shape (n, dimensions).
+
+        The values are scaled to 'origin + factor * sample'. Samples with a
+        marker ('E', 'U' or 'L') become NaN, or, if masked is True, are masked
+        in the returned numpy.ma.MaskedArray; which marker it was is not
+        kept. Raises ValueError if data contains anything else that is not
+        a decimal.
+
+        Requires NumPy.
+        """
+        import numpy as np
+
+        data = self.data.value if self.data is not None else None
+        values = _parse_samples(np, data or '')
+        mask = None
+
+        if values is None:
+            values = _parse_samples(np, MARKERS.sub('nan', data))
+
+            if values is None:
+                raise ValueError("Invalid SampledData.data: '{}'".format(data))
+
+            mask = np.isnan(values)
+
+        dimensions = int(self.dimensions.value) if self.dimensions else 1
+
+        if len(values) % dimensions:
+            msg = 'Number of samples ({}) is not a multiple of dimensions ({})'
+            raise ValueError(msg.format(len(values), dimensions))
+
+        if self.factor is not None and self.factor.value is not None:
+            values *= float(self.factor.value)
+
+        if self.origin is not None and self.origin.value is not None:
+            values += float(self.origin.value)
+
+        values = values.reshape(-1, dimensions)
+
+        if masked:
+            if mask is None:
+                mask = np.ma.nomask
+            else:
+                mask = mask.reshape(-1, dimensions)
+
+            return np.ma.masked_array(values, mask=mask)
+
+        return values
+
+    @classmethod
+    def from_array(cls, array, period, origin=0, factor=None, **kwargs):
+        """Create SampledData from an array of shape (n, dimensions) or (n, ).
+
+        The samples are stored as '(value - origin) / factor'. NaN and masked
+        values are stored as 'E'. Since to_array() does not distinguish the
+        markers, 'U' and 'L' become 'E' in a round trip. Additional keyword
+        arguments (lowerLimit,
+        upperLimit, ...) are passed to the constructor.
+
+        Requires NumPy.
+        """
+        import numpy as np
+
+        array = np.ma.asarray(array, dtype=float)
+        dimensions = 1 if array.ndim == 1 else array.shape[1]
+        mask = np.ma.getmaskarray(array).ravel()
+
+        values = array.filled(np.nan).ravel()
+        mask |= np.isnan(values)
+
+        if not isinstance(origin, Quantity):
+            origin = Quantity(value=origin)
+
+        if origin.value is not None:
+            values = values - float(origin.value)
+
+        if factor is not None:
+            values = values / float(factor)
+
+        # Integral samples (the common case) are written without decimals.
+        values[mask] = 0
+
+        if np.all(np.mod(values, 1) == 0):
+            values = values.astype(np.int64)
+
+        samples = list(map(str, values.tolist()))
+
+        for i in np.flatnonzero(mask).tolist():
+            samples[i] = 'E'
+
+        return cls(
+            origin=origin,
+            period=period,
+            factor=factor,
+            dimensions=dimensions,
+            data=' '.join(samples),
+            **kwargs
+        )
+
+
+def _parse_samples(np, data):
+    """Parse space separated decimals using NumPy; return None on failure."""
+    try:
+        return np.array(data.split(), dtype=float)
+    except ValueError:
+        return None
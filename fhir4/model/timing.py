@@ -2,9 +2,13 @@
 from __future__ import print_function
 import datetime as dt
 import logging
+import math
+import functools
+from collections import namedtuple
 
 from . import Property
 from . import FHIRBase, Element, Extension, Reference
+from . import dateTimeBase
 
 from .backboneelement import BackboneElement
 from .backboneelement import BackboneElement
@@ -28,6 +32,61 @@ __version__ = "0.8"
 
 __all__ = ['Timing']
 
+US_PER_DAY = 86400 * 10**6
+
+# Length of the fixed units of time (UCUM) in microseconds.
+UNITS = {
+    's': 10**6,
+    'min': 60 * 10**6,
+    'h': 3600 * 10**6,
+    'd': US_PER_DAY,
+    'wk': 7 * US_PER_DAY,
+}
+
+# Calendar units in months.
+MONTHS = {
+    'mo': 1,
+    'a': 12,
+}
+
+DAYS_OF_WEEK = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+# Times of day (in minutes) used for the event codes in Timing.repeat.when.
+# Adjust these to match the local (e.g. hospital) schedule.
+MEALS = {'CM': 8 * 60, 'CD': 12 * 60 + 30, 'CV': 18 * 60}
+
+WHEN = {
+    'WAKE': [7 * 60],
+    'PHS': [7 * 60],
+    'MORN': [9 * 60],
+    'MORN.early': [7 * 60],
+    'MORN.late': [11 * 60],
+    'NOON': [12 * 60],
+    'AFT': [15 * 60],
+    'AFT.early': [13 * 60],
+    'AFT.late': [17 * 60],
+    'EVE': [19 * 60],
+    'EVE.early': [18 * 60],
+    'EVE.late': [21 * 60],
+    'NIGHT': [23 * 60],
+    'HS': [22 * 60],
+    'C': [MEALS['CM'], MEALS['CD'], MEALS['CV']],
+    'CM': [MEALS['CM']],
+    'CD': [MEALS['CD']],
+    'CV': [MEALS['CV']],
+}
+
+# Event codes for which the offset is *before* the event.
+BEFORE = {'AC': 'C', 'ACM': 'CM', 'ACD': 'CD', 'ACV': 'CV'}
+AFTER = {'PC': 'C', 'PCM': 'CM', 'PCD': 'CD', 'PCV': 'CV'}
+
+# Event codes that are not tied to a time of day (e.g. 'IMD', immediate)
+# are not supported.
+EVENT_CODES = set(WHEN) | set(BEFORE) | set(AFTER)
+
+# Size of the windows used by Timing.occurrences(lazy=True).
+LAZY_WINDOW = 28 * US_PER_DAY
+
 class Repeat(Element):
     """Autogenerated class for implicit type."""
     bounds = Property('bounds', ['Duration', 'Range', 'Period'], '0', '1')
@@ -66,3 +125,373 @@ class Timing(BackboneElement):
     event = Property('event', dateTime, '0', '*')
     repeat = Property('repeat', Repeat, '0', '1')
     code = Property('code', CodeableConcept, '0', '1')
+
+
+    def occurrences(self, start, end=None, lazy=False):
+        """Return the moments this schedule occurs in [start, end).
+
+        :param start: datetime.datetime, datetime.date, str or dateTime.
+        :param end: idem; may be omitted if the schedule is bounded (by a
+            Period or Duration, or a count) or if lazy is True.
+        :param bool lazy: if True, return a generator that yields
+            datetime.datetime instances. Without an end, it may be infinite.
+
+        Returns a NumPy datetime64[us] array (sorted).
+
+        All moments are wall clock times: timezones are ignored. If the
+        schedule has no Period bounds, it starts at 'start'. Event codes
+        (repeat.when) are mapped to times of day using WHEN and MEALS; codes
+        without a time of day (e.g. 'IMD') raise a ValueError.
+        The maximum values (frequencyMax, periodMax, countMax) are ignored.
+
+        Identical schedules and windows are expanded only once: the results
+        are cached and shared, so the returned array is read-only.
+
+        Requires NumPy.
+        """
+        import numpy as np
+
+        lo = _wallclock(start)
+        hi = _wallclock(end) if end is not None else None
+
+        events = [_wallclock(e) for e in self.event]
+        rule = _rule(self.repeat, lo) if self.repeat else None
+
+        if lazy:
+            return self._iterOccurrences(rule, events, lo, hi)
+
+        if hi is None:
+            if rule is None:
+                hi = max(events, default=lo) + 1
+            elif rule.finite:
+                hi = rule.last + 1
+            else:
+                raise ValueError('The schedule is unbounded: provide an end')
+
+        return _occurrences(np, rule, tuple(events), lo, hi)
+
+    def _iterOccurrences(self, rule, events, lo, hi):
+        import numpy as np
+
+        if hi is None and (rule is None or rule.finite):
+            last = rule.last if rule is not None else lo
+            hi = max([last] + events) + 1
+
+        while hi is None or lo < hi:
+            window_hi = lo + LAZY_WINDOW if hi is None else min(lo + LAZY_WINDOW, hi)
+            occurrences = _occurrences(np, rule, tuple(events), lo, window_hi)
+            yield from occurrences.astype('datetime64[us]').tolist()
+            lo = window_hi
+
+
+# ------------------------------------------------------------------------------
+# Schedule expansion
+# ------------------------------------------------------------------------------
+class _Rule(namedtuple('_Rule', ['anchor', 'end', 'count', 'frequency',
+                                   'period', 'unit', 'days', 'times'])):
+    """Hashable description of a Timing.repeat (used as cache key).
+
+    All moments are in microseconds since the epoch (wall clock).
+    """
+
+    @property
+    def finite(self):
+        return self.end is not None or self.count is not None
+
+    @property
+    def last(self):
+        """Return an upper bound of the last occurrence (if finite)."""
+        if self.count is None:
+            return self.end
+
+        if self.times:
+            # Worst case: one day per cycle and, with days of the week, only
+            # one cycle in seven has a matching day.
+            cycles = math.ceil(self.count / len(self.times)) * (7 if self.days else 1) + 1
+
+            if self.unit in MONTHS:
+                length = _add(self.anchor, cycles * self.period, self.unit) - self.anchor
+            else:
+                length = cycles * _cycle_days(self) * US_PER_DAY
+
+            length += US_PER_DAY
+        else:
+            count = math.ceil(self.count / self.frequency)
+            length = _add(self.anchor, (count + 1) * self.period, self.unit) - self.anchor
+
+        last = self.anchor + length
+        return last if self.end is None else min(last, self.end)
+# class _Rule
+
+
+def _wallclock(value):
+    """Return the wall clock time of value in microseconds since the epoch."""
+    if isinstance(value, (str, dateTimeBase)):
+        if isinstance(value, str):
+            value = dateTime(value)
+
+        p = value.parts
+        value = dt.datetime(p.year, p.month or 1, p.day or 1,
+                            p.hour or 0, p.minute or 0, min(p.second or 0, 59),
+                            p.microsecond or 0)
+
+    elif not isinstance(value, dt.datetime):
+        value = dt.datetime(value.year, value.month, value.day)
+
+    delta = value.replace(tzinfo=None) - dt.datetime(1970, 1, 1)
+    return (delta.days * 86400 + delta.seconds) * 10**6 + delta.microseconds
+
+
+def _add(moment, amount, unit):
+    """Add amount (int or float) of unit to moment (in microseconds)."""
+    if unit in MONTHS:
+        import numpy as np
+        return int(_add_months(np, np.array([moment]), amount * MONTHS[unit])[0])
+
+    return moment + int(round(amount * UNITS[unit]))
+
+
+def _add_months(np, moments, months):
+    """Add (whole) months to moments, clipping the day to the month's end."""
+    moments = moments.astype('datetime64[us]')
+    month = moments.astype('datetime64[M]')
+    target = month + np.round(months).astype(np.int64)
+
+    offset = (moments - month.astype('datetime64[us]')).astype(np.int64)
+    day, time = np.divmod(offset, US_PER_DAY)
+
+    length = (target + 1).astype('datetime64[D]') - target.astype('datetime64[D]')
+    day = np.minimum(day, length.astype(np.int64) - 1)
+
+    target = target.astype('datetime64[us]').astype(np.int64)
+    return target + day * US_PER_DAY + time
+
+
+def _times(repeat):
+    """Return the times of day (sorted, in microseconds) for a Repeat."""
+    times = set()
+
+    for t in repeat.timeOfDay:
+        p = t.parts
+        times.add(((p.hour * 60 + p.minute) * 60 + min(p.second, 59)) * 10**6 + p.microsecond)
+
+    offset = int(repeat.offset) if repeat.offset is not None else 0
+
+    for when in repeat.when:
+        when = str(when)
+
+        if when not in EVENT_CODES:
+            msg = "Unsupported event code '{}' in Timing.repeat.when; supported are: {}"
+            raise ValueError(msg.format(when, ', '.join(sorted(EVENT_CODES))))
+
+        if when in BEFORE:
+            minutes = [m - offset for m in WHEN[BEFORE[when]]]
+        elif when in AFTER:
+            minutes = [m + offset for m in WHEN[AFTER[when]]]
+        else:
+            minutes = [m + offset for m in WHEN[when]]
+
+        times.update(m * 60 * 10**6 for m in minutes)
+
+    return tuple(sorted(times))
+
+
+def _rule(repeat, start):
+    """Return the _Rule for a Repeat; 'start' is used if there is no Period."""
+    from .period import Period
+    from .range import Range
+
+    anchor, end = start, None
+    bounds = repeat.bounds
+
+    if isinstance(bounds, Period):
+        if bounds.start is not None:
+            anchor = _wallclock(bounds.start)
+        if bounds.end is not None:
+            end = _wallclock(bounds.end)
+
+    elif bounds is not None:
+        duration = bounds.high if isinstance(bounds, Range) else bounds
+
+        if duration is not None and duration.value is not None:
+            unit = duration.code or duration.unit
+            unit = str(unit) if unit is not None else None
+
+            if unit not in UNITS and unit not in MONTHS:
+                msg = "Unsupported unit '{}' in Timing.repeat.bounds; supported are: {}"
+                raise ValueError(msg.format(unit, ', '.join(list(UNITS) + list(MONTHS))))
+
+            end = _add(anchor, float(duration.value), unit)
+
+    times = _times(repeat)
+    days = tuple(sorted(DAYS_OF_WEEK.index(str(d)) for d in repeat.dayOfWeek))
+
+    if days and not times:
+        # Occurs on the given days at the time of day of the anchor.
+        times = (anchor % US_PER_DAY, )
+
+    return _Rule(
+        anchor,
+        end,
+        int(repeat.count) if repeat.count is not None else None,
+        int(repeat.frequency) if repeat.frequency is not None else 1,
+        float(repeat.period) if repeat.period is not None else 1,
+        str(repeat.periodUnit) if repeat.periodUnit is not None else 'd',
+        days,
+        times,
+    )
+
+
+def _cycle_days(rule):
+    """Return the length of a period in whole days (at least 1) for fixed units."""
+    return max(1, int(round(rule.period * UNITS[rule.unit] / US_PER_DAY)))
+
+
+def _cycles(np, rule, lo, hi):
+    """Return (starts, lengths), in days, of the periods that may overlap [lo, hi).
+
+    Periods of months and years follow the calendar. Periods shorter than
+    a day are treated as a day.
+    """
+    day0 = rule.anchor // US_PER_DAY
+    lo_day, hi_day = lo // US_PER_DAY, -(-hi // US_PER_DAY)
+
+    if rule.unit in MONTHS:
+        months = rule.period * MONTHS[rule.unit]
+        month = lambda day: np.datetime64(int(day), 'D').astype('datetime64[M]').astype(np.int64)
+        first = max(0, int((month(lo_day) - month(day0)) // months) - 1)
+        last = int((month(hi_day) - month(day0)) // months) + 2
+
+        k = np.arange(first, last + 1)
+        boundaries = _add_months(np, np.full(len(k), day0 * US_PER_DAY), k * months)
+        boundaries = boundaries // US_PER_DAY
+        return boundaries[:-1], np.diff(boundaries)
+
+    step = _cycle_days(rule)
+    first = max(0, (lo_day - day0) // step - 1)
+    last = -(-(hi_day - day0) // step)
+
+    k = np.arange(first, max(first, last) + 1)
+    return day0 + k * step, np.full(len(k), step)
+
+
+def _expand_times(np, rule, lo, hi):
+    """Expand a rule with times of day (and/or days of the week).
+
+    Every period (see _cycles) starting at the anchor has its active days:
+
+     * with days of the week, the matching days in the first day of the
+       period (unit 'd') or its first week (other units);
+     * otherwise ceil(frequency / number of times) days, spread evenly
+       over the period, starting at its first day.
+
+    The times of day apply to every active day.
+    """
+    starts, lengths = _cycles(np, rule, lo, hi)
+
+    if rule.days:
+        span = 1 if rule.unit == 'd' else 7
+        offsets = np.arange(span)
+        days = starts[:, None] + offsets[None, :]
+        days = days[offsets[None, :] < np.minimum(lengths, span)[:, None]]
+
+        # 1970-01-01 was a thursday
+        days = days[np.isin((days + 3) % 7, rule.days)]
+
+    else:
+        n = max(1, math.ceil(rule.frequency / len(rule.times)))
+        i = np.arange(n)
+        days = starts[:, None] + lengths[:, None] * i[None, :] // n
+
+    days = np.unique(days)
+    times = np.array(rule.times, dtype=np.int64)
+    return (days[:, None] * US_PER_DAY + times[None, :]).ravel()
+
+
+def _expand_frequency(np, rule, lo, hi):
+    """Expand a rule with a frequency per period."""
+    anchor, period, unit = rule.anchor, rule.period, rule.unit
+
+    if unit in MONTHS:
+        months = period * MONTHS[unit]
+        month = lambda t: np.datetime64(t, 'us').astype('datetime64[M]').astype(np.int64)
+        first = max(0, int((month(lo) - month(anchor)) // months) - 1)
+        last = int((month(hi) - month(anchor)) // months) + 2
+
+        k = np.arange(first, last + 1)
+        boundaries = _add_months(np, np.full(len(k), anchor), k * months)
+        starts, lengths = boundaries[:-1], np.diff(boundaries)
+        k = k[:-1]
+
+    else:
+        step = int(round(period * UNITS[unit]))
+        first = max(0, (lo - anchor) // step - 1)
+        last = -(-(hi - anchor) // step)
+
+        k = np.arange(first, max(first, last))
+        starts = anchor + k * step
+        lengths = np.full(len(k), step)
+
+    f = np.arange(rule.frequency)
+    occurrences = starts[:, None] + lengths[:, None] * f[None, :] // rule.frequency
+    return occurrences.ravel()
+
+
+def _expand_window(np, rule, lo, hi):
+    """Return the occurrences of 'rule' in [lo, hi)."""
+    lo = max(lo, rule.anchor)
+
+    if rule.end is not None:
+        hi = min(hi, rule.end)
+
+    if lo >= hi:
+        return np.array([], dtype=np.int64)
+
+    if rule.times:
+        occurrences = _expand_times(np, rule, lo, hi)
+    else:
+        occurrences = _expand_frequency(np, rule, lo, hi)
+
+    return occurrences[(occurrences >= lo) & (occurrences < hi)]
+
+
+@functools.lru_cache(maxsize=1024)
+def _expand_counted(rule):
+    """Return the first rule.count occurrences of 'rule' (read-only)."""
+    import numpy as np
+
+    occurrences = _expand_window(np, rule, rule.anchor, rule.last)[:rule.count]
+    occurrences.setflags(write=False)
+    return occurrences
+
+
+@functools.lru_cache(maxsize=1024)
+def _expand(rule, lo, hi):
+    """Return the occurrences of 'rule' in [lo, hi) (cached, read-only)."""
+    import numpy as np
+
+    if rule.count is not None:
+        # Counted from the start of the schedule, regardless of the window.
+        occurrences = _expand_counted(rule)
+        occurrences = occurrences[(occurrences >= lo) & (occurrences < hi)]
+    else:
+        occurrences = _expand_window(np, rule, lo, hi)
+
+    occurrences.setflags(write=False)
+    return occurrences
+
+
+def _occurrences(np, rule, events, lo, hi):
+    """Return the occurrences (datetime64[us]) of rule and events in [lo, hi)."""
+    if rule is not None:
+        occurrences = _expand(rule, lo, hi)
+    else:
+        occurrences = np.array([], dtype=np.int64)
+
+    events = [e for e in events if lo <= e < hi]
+
+    if events:
+        occurrences = np.union1d(occurrences, events)
+        occurrences.setflags(write=False)
+
+    return occurrences.view('datetime64[us]')
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+"""Direct conversion between FHIR XML and FHIR JSON.
+
+The functions in this module use the Property definitions of the model
+classes to convert one representation into the other, without building the
+object graph (i.e. no FHIRBase instances are created). The output is the same
+as that of the round trip through the model, e.g.
+``Patient.fromXML(xmlstring).toJSON()``, but considerably faster.
+
+Note that values are converted, not validated: an invalid dateTime will pass
+through unnoticed.
+"""
+import inspect
+
+from . import xmlbackend
+from . import FHIRBase, BaseType, Property, XHTML_NAMESPACE
+from . import split_namespace, upper_first_letter, eval_type_string
+from ._boolean import boolean_
+from ._decimal import json_loads, json_dumps
+from ._xhtml import xhtml_tostring
+from .resource import Resource
+
+__author__ = "Melle Sieswerda"
+__copyright__  = "Copyright 2017, Melle Sieswerda"
+__license__ = "GPL"
+__version__ = "0.8"
+
+__all__ = [
+    'xml_to_json',
+    'xml_to_native',
+    'json_to_xml',
+    'native_to_xml',
+]
+
+# Caches for the (class) metadata, which is expensive to look up.
+_properties_cache = dict()
+_details_cache = dict()
+
+
+def _properties(cls):
+    """Return the Property definitions of 'cls' in order of definition."""
+    if cls not in _properties_cache:
+        _properties_cache[cls] = [
+            getattr(cls, name).definition for name in cls._getProperties()
+        ]
+
+    return _properties_cache[cls]
+
+
+def _details(cls, key):
+    """Return (PropertyDefinition, type) for a tag/key like 'valueString'."""
+    k = (cls, key)
+
+    if k not in _details_cache:
+        prop, definition, type_ = cls._getPropertyDetailsForName(key)
+
+        # Reference(...) properties are typed by an instance.
+        if not inspect.isclass(type_):
+            type_ = type(type_)
+
+        _details_cache[k] = (definition, type_)
+
+    return _details_cache[k]
+
+
+def _resource_class(name):
+    return eval_type_string(name)
+
+
+def _is_resource(type_):
+    return issubclass(type_, Resource)
+
+
+def _is_primitive(type_):
+    return issubclass(type_, BaseType)
+
+
+def _native(type_, value):
+    """Convert a lexical/JSON value to the Python type used by 'type_'."""
+    native_type = type_.value.definition.type
+
+    if native_type is boolean_:
+        if value == 'true':
+            return True
+        if value == 'false':
+            return False
+        return bool(int(value))
+
+    return native_type(value)
+
+
+def _lexical(type_, value):
+    """Convert a JSON value to the string used in an XML 'value' attribute."""
+    value = _native(type_, value)
+
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+
+    return str(value)
+
+
+def _key(definition, type_):
+    """Return the tag/key used for a property, e.g. 'valueString'."""
+    if isinstance(definition.type, list):
+        return definition.name + upper_first_letter(type_.__name__)
+
+    return definition.name
+
+
+# ------------------------------------------------------------------------------
+# XML --> JSON
+# ------------------------------------------------------------------------------
+def _primitive_to_native(type_, element):
+    """Return (value, extended info) for a primitive type."""
+    attrib = dict(element.attrib)
+    value = attrib.pop('value', None)
+
+    if value is not None:
+        value = _native(type_, value)
+
+    return value, _element_to_native(type_, element, attrib)
+
+
+def _element_to_native(cls, element, attrib=None):
+    """Return a dict (JSON representation) for a complex type."""
+    if attrib is None:
+        attrib = element.attrib
+
+    # Group attributes and child elements by Property.
+    values = dict()
+
+    for name, value in attrib.items():
+        definition, type_ = _details(cls, name)
+        values[definition.name] = [(name, type_, _native(type_, value), None)]
+
+    for child in element:
+        ns, tag = split_namespace(child.tag)
+        definition, type_ = _details(cls, tag)
+
+        if ns == XHTML_NAMESPACE:
+            child.tail = None
+            value, ext = xhtml_tostring(child), None
+
+        elif _is_resource(type_):
+            resource = child[0]
+            value = _element_to_native(_resource_class(split_namespace(resource)[1]), resource)
+            ext = None
+
+        elif _is_primitive(type_):
+            value, ext = _primitive_to_native(type_, child)
+
+        else:
+            value = _element_to_native(type_, child)
+            ext = None
+
+        item = (_key(definition, type_), type_, value, ext)
+
+        if definition.cmax > 1:
+            values.setdefault(definition.name, []).append(item)
+        else:
+            values[definition.name] = [item]
+
+    # Render the dict in order of definition.
+    retval = dict()
+
+    if _is_resource(cls):
+        retval['resourceType'] = cls.__name__
+
+    for definition in _properties(cls):
+        items = values.get(definition.name)
+
+        if not items:
+            continue
+
+        if definition.cmax > 1:
+            retval[definition.name] = [value for key, type_, value, ext in items]
+
+            extended = [ext or None for key, type_, value, ext in items]
+            if sum(map(lambda x: x != None, extended)) > 0:
+                retval['_' + definition.name] = extended
+
+        else:
+            key, type_, value, ext = items[0]
+
+            if _is_primitive(type_):
+                if value != None:
+                    retval[key] = value
+
+                if ext:
+                    retval['_' + key] = ext
+
+            elif value:
+                retval[key] = value
+
+    return retval
+
+
+def xml_to_native(xmlstring):
+    """Convert a Resource from XML (str or bytes) to its native (dict)
+    representation.
+    """
+    root = xmlbackend.get_backend().fromstring(xmlstring)
+    return _element_to_native(_resource_class(split_namespace(root)[1]), root)
+
+
+def xml_to_json(xmlstring):
+    """Convert a Resource from XML to JSON.
+
+    Equivalent to (but faster than) ``Resource.fromXML(xmlstring).toJSON()``.
+    """
+    return json_dumps(xml_to_native(xmlstring))
+
+
+# ------------------------------------------------------------------------------
+# JSON --> XML
+# ------------------------------------------------------------------------------
+def _native_to_element(cls, dictionary, parent, backend):
+    """Add the properties in 'dictionary' to the element 'parent'."""
+    # Group keys by Property: {name: (key, type, value, extended info)}
+    values = dict()
+
+    for key, value in dictionary.items():
+        if key == 'resourceType':
+            continue
+
+        extended = key.startswith('_')
+        definition, type_ = _details(cls, key)
+        key = key.lstrip('_')
+
+        item = values.get(definition.name, (key, type_, None, None))
+
+        if extended:
+            item = (key, type_, item[2], value)
+        else:
+            item = (key, type_, value, item[3])
+
+        values[definition.name] = item
+
+    for definition in _properties(cls):
+        if definition.name not in values:
+            continue
+
+        key, type_, value, ext = values[definition.name]
+
+        if definition.repr == 'xmlAttr':
+            # Either an attribute like Extension.url or a primitive's value.
+            if not _is_primitive(type_):
+                type_ = cls
+
+            parent.set(key, _lexical(type_, value))
+
+        elif definition.repr == 'text':
+            parent.append(backend.fromstring(value))
+
+        elif definition.cmax > 1:
+            value = value or [None] * len(ext)
+            ext = ext or [None] * len(value)
+
+            for v, e in zip(value, ext):
+                _value_to_element(type_, key, v, e, parent, backend)
+
+        else:
+            key = _key(definition, type_)
+            _value_to_element(type_, key, value, ext, parent, backend)
+
+
+def _value_to_element(type_, tag, value, ext, parent, backend):
+    element = backend.SubElement(parent, tag)
+
+    if _is_resource(type_):
+        cls = _resource_class(value['resourceType'])
+        element = backend.SubElement(element, cls.__name__)
+        _native_to_element(cls, value, element, backend)
+
+    elif _is_primitive(type_):
+        primitive = dict(ext or {})
+
+        if value is not None:
+            primitive['value'] = value
+
+        _native_to_element(type_, primitive, element, backend)
+
+    else:
+        _native_to_element(type_, value or {}, element, backend)
+
+
+def native_to_xml(dictionary):
+    """Convert a Resource from its native (dict) representation to XML."""
+    backend = xmlbackend.get_backend()
+    cls = _resource_class(dictionary['resourceType'])
+
+    root = backend.Element(cls.__name__)
+    root.set('xmlns', 'http://hl7.org/fhir')
+    _native_to_element(cls, dictionary, root, backend)
+
+    return backend.prettify(root)
+
+
+def json_to_xml(jsonstring):
+    """Convert a Resource from JSON to XML.
+
+    Equivalent to (but faster than) ``Resource.fromJSON(jsonstring).toXML()``.
+    """
+    return native_to_xml(json_loads(jsonstring))
@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+"""Conversion of UCUM units to canonical units (a practical subset).
+
+A unit expression like 'mg/dL' or 'mmol/L' is parsed into a Unit: a factor
+(and for temperatures an offset) relative to its canonical unit, which is
+expressed in base units: 'g.m-3' and 'mol.m-3' respectively. Parsing is
+memoized, so converting many values in the same unit is cheap.
+
+    >>> from fhir.model import ucum
+    >>> ucum.parse_unit('mg/dL')
+    Unit(factor=10.0, offset=0.0, canonical='g.m-3')
+
+Supported are the SI prefixes, the base units, the common derived and
+clinical units (UNITS), annotations ('{beats}/min'), exponents ('m2',
+'s-1'), parentheses and factors like '10*9/L'. In contrast with UCUM, mol is
+kept as a base unit and arbitrary units like [IU] are treated as separate
+dimensions.
+"""
+import re
+import functools
+from collections import namedtuple
+
+__author__ = "Melle Sieswerda"
+__copyright__  = "Copyright 2017, Melle Sieswerda"
+__license__ = "GPL"
+__version__ = "0.8"
+
+__all__ = [
+    'UCUM',
+    'UnknownUnitError',
+    'IncompatibleUnitsError',
+    'Unit',
+    'parse_unit',
+    'convert',
+]
+
+UCUM = 'http://unitsofmeasure.org'
+
+BASE_UNITS = ['g', 'mol', 'm', 's', 'K', 'C', 'cd', 'rad']
+
+PREFIXES = {
+    'Y': 1e24, 'Z': 1e21, 'E': 1e18, 'P': 1e15, 'T': 1e12, 'G': 1e9,
+    'M': 1e6, 'k': 1e3, 'h': 1e2, 'da': 1e1, 'd': 1e-1, 'c': 1e-2,
+    'm': 1e-3, 'u': 1e-6, 'n': 1e-9, 'p': 1e-12, 'f': 1e-15, 'a': 1e-18,
+    'z': 1e-21, 'y': 1e-24,
+}
+
+# Units that are defined in terms of others: {code: (factor, expression)}
+METRIC_UNITS = {
+    'L': (1e-3, 'm3'),
+    'l': (1e-3, 'm3'),
+    'Hz': (1, 's-1'),
+    'N': (1e3, 'g.m.s-2'),
+    'Pa': (1, 'N/m2'),
+    'J': (1, 'N.m'),
+    'W': (1, 'J/s'),
+    'A': (1, 'C/s'),
+    'V': (1, 'J/C'),
+    'eq': (1, 'mol'),
+    'kat': (1, 'mol/s'),
+    'U': (1, 'umol/min'),
+    'bar': (1e5, 'Pa'),
+    'cal': (4.184, 'J'),
+    'm[Hg]': (133.322e3, 'Pa'),
+    'm[H2O]': (9.80665e3, 'Pa'),
+    'sr': (1, 'rad2'),
+    'g%': (1e-2, 'g/dL'),
+}
+
+UNITS = {
+    '1': (1, ''),
+    '%': (1e-2, '1'),
+    '[ppm]': (1e-6, '1'),
+    'min': (60, 's'),
+    'h': (3600, 's'),
+    'd': (86400, 's'),
+    'wk': (7, 'd'),
+    'mo': (30.4375, 'd'),
+    'a': (365.25, 'd'),
+    'deg': (3.141592653589793 / 180, 'rad'),
+    '[in_i]': (0.0254, 'm'),
+    '[ft_i]': (12, '[in_i]'),
+    '[lb_av]': (453.59237, 'g'),
+    '[oz_av]': (28.349523125, 'g'),
+    '[gr]': (64.79891, 'mg'),
+    '[drp]': (1 / 20, 'mL'),
+    '[tsp_us]': (4.92892159375, 'mL'),
+    '[tbs_us]': (3, '[tsp_us]'),
+    '[foz_us]': (29.5735295625, 'mL'),
+    '[mi_i]': (1609.344, 'm'),
+}
+
+# Units with an offset; only valid on their own: {code: (factor, offset)}
+TEMPERATURES = {
+    'Cel': (1, 273.15),
+    '[degF]': (5 / 9, 459.67 * 5 / 9),
+}
+
+# Arbitrary units: dimensions of their own, not convertible into others.
+ARBITRARY_UNITS = ['[IU]', '[iU]', "[arb'U]", '[USP\'U]', '[CFU]', '[HPF]', '[LPF]']
+
+
+class UnknownUnitError(ValueError):
+    def __init__(self, expression):
+        message = "The unit '{}' is unknown or invalid!".format(expression)
+        super(UnknownUnitError, self).__init__(message)
+# class UnknownUnitError
+
+
+class IncompatibleUnitsError(ValueError):
+    def __init__(self, from_, to):
+        message = "Cannot convert '{}' to '{}'!".format(from_, to)
+        super(IncompatibleUnitsError, self).__init__(message)
+# class IncompatibleUnitsError
+
+
+class Unit(namedtuple('Unit', ['factor', 'offset', 'canonical'])):
+    """A unit: value in canonical unit = factor * value + offset."""
+
+    def toCanonical(self, value):
+        return self.factor * value + self.offset
+
+    def fromCanonical(self, value):
+        return (value - self.offset) / self.factor
+# class Unit
+
+
+def _canonical(dimensions):
+    """Return the canonical unit for a dict {base unit: exponent}."""
+    parts = []
+
+    for unit in ARBITRARY_UNITS + BASE_UNITS:
+        exponent = dimensions.get(unit, 0)
+
+        if exponent == 1:
+            parts.append(unit)
+        elif exponent:
+            parts.append('{}{}'.format(unit, exponent))
+
+    return '.'.join(parts) or '1'
+
+
+def _multiply(a, b, sign=1):
+    """Multiply (sign=1) or divide (sign=-1) two (factor, dimensions)."""
+    dimensions = dict(a[1])
+
+    for unit, exponent in b[1].items():
+        dimensions[unit] = dimensions.get(unit, 0) + sign * exponent
+
+    return a[0] * b[0] ** sign, {u: e for u, e in dimensions.items() if e}
+
+
+@functools.lru_cache(maxsize=None)
+def _atom(code):
+    """Return (factor, dimensions) for a unit atom, possibly with prefix."""
+    if code in BASE_UNITS or code in ARBITRARY_UNITS:
+        return 1, {code: 1}
+
+    if code in UNITS and code not in TEMPERATURES:
+        factor, expression = UNITS[code]
+        return _multiply((factor, {}), _term(expression))
+
+    if code in METRIC_UNITS:
+        factor, expression = METRIC_UNITS[code]
+        return _multiply((factor, {}), _term(expression))
+
+    for prefix, factor in PREFIXES.items():
+        unit = code[len(prefix):]
+
+        if code.startswith(prefix) and (unit in METRIC_UNITS or unit in BASE_UNITS):
+            return _multiply((factor, {}), _atom(unit))
+
+    raise UnknownUnitError(code)
+
+
+_simple = re.compile(r'(?P<atom>.*?[^0-9+-])(?P<exponent>[+-]?[0-9]+)?')
+_power = re.compile(r'10[*^](?P<exponent>[+-]?[0-9]+)')
+
+
+def _component(component):
+    """Return (factor, dimensions) for a simple component like 'm2'."""
+    if component.isdigit():
+        return int(component), {}
+
+    match = _power.fullmatch(component)
+    if match:
+        return 10.0 ** int(match.group('exponent')), {}
+
+    match = _simple.fullmatch(component)
+    if not match:
+        raise UnknownUnitError(component)
+
+    factor, dimensions = _atom(match.group('atom'))
+    exponent = int(match.group('exponent') or 1)
+
+    return factor ** exponent, {u: e * exponent for u, e in dimensions.items()}
+
+
+def _tokenize(expression):
+    """Split an expression into components, operators and parentheses."""
+    tokens, token, depth = [], '', 0
+
+    for c in expression:
+        if c == '[':
+            depth += 1
+        elif c == ']':
+            depth -= 1
+
+        if depth == 0 and c in './()':
+            if token:
+                tokens.append(token)
+            tokens.append(c)
+            token = ''
+        else:
+            token += c
+
+    if token:
+        tokens.append(token)
+
+    return tokens
+
+
+def _term(expression):
+    """Return (factor, dimensions) for a unit expression."""
+    # Annotations have no meaning; '{beats}' on its own means '1'.
+    expression = re.sub(r'\{[^}]*\}', '', expression) or '1'
+    tokens = _tokenize(expression)
+
+    def parse(i):
+        result, sign = (1, {}), 1
+
+        while i < len(tokens):
+            token = tokens[i]
+
+            if token == ')':
+                return result, i
+
+            if token == '.':
+                sign = 1
+            elif token == '/':
+                sign = -1
+            else:
+                if token == '(':
+                    value, i = parse(i + 1)
+
+                    if i >= len(tokens):
+                        raise UnknownUnitError(expression)
+                else:
+                    value = _component(token)
+
+                result = _multiply(result, value, sign)
+
+            i += 1
+
+        return result, i
+
+    result, i = parse(0)
+
+    if i != len(tokens):
+        raise UnknownUnitError(expression)
+
+    return result
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_unit(expression):
+    """Parse a UCUM expression and return its Unit (memoized).
+
+    Raises UnknownUnitError if the expression cannot be parsed.
+    """
+    if expression in TEMPERATURES:
+        factor, offset = TEMPERATURES[expression]
+        return Unit(factor, offset, 'K')
+
+    try:
+        factor, dimensions = _term(expression)
+    except RecursionError:
+        raise UnknownUnitError(expression)
+
+    return Unit(float(factor), 0.0, _canonical(dimensions))
+
+
+def convert(value, from_, to):
+    """Convert value from one unit to another."""
+    from_unit, to_unit = parse_unit(from_), parse_unit(to)
+
+    if from_unit.canonical != to_unit.canonical:
+        raise IncompatibleUnitsError(from_, to)
+
+    return to_unit.fromCanonical(from_unit.toCanonical(value))
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""XML backends used to (un)marshall Resources and Elements.
+
+lxml is used when it is installed; ElementTree/minidom from the standard
+library serve as a fallback. A backend can be selected explicitly:
+
+    >>> from fhir.model import xmlbackend
+    >>> backend = xmlbackend.set_backend('stdlib')
+    >>> xmlbackend.get_backend().name
+    'stdlib'
+"""
+import xml.etree.ElementTree as ET
+import xml.dom.minidom
+
+try:
+    import lxml.etree
+except ImportError:
+    lxml = None
+
+__author__ = "Melle Sieswerda"
+__copyright__  = "Copyright 2017, Melle Sieswerda"
+__license__ = "GPL"
+__version__ = "0.8"
+
+__all__ = [
+    'UnsupportedBackendError',
+    'StdlibBackend',
+    'LxmlBackend',
+    'available_backends',
+    'get_backend',
+    'set_backend',
+]
+
+XML_DECLARATION = '<?xml version="1.0" ?>\n'
+
+
+class UnsupportedBackendError(Exception):
+    def __init__(self, name):
+        message = "The XML backend '{}' is not available!".format(name)
+        super(UnsupportedBackendError, self).__init__(message)
+# class UnsupportedBackendError
+
+
+class StdlibBackend(object):
+    """xml.etree.ElementTree for parsing, xml.dom.minidom for pretty printing."""
+    name = 'stdlib'
+
+    def Element(self, tag):
+        return ET.Element(tag)
+
+    def SubElement(self, parent, tag):
+        return ET.SubElement(parent, tag)
+
+    def iselement(self, element):
+        return isinstance(element, ET.Element)
+
+    def fromstring(self, xmlstring):
+        """Parse a str (or bytes) and return the root element."""
+        return ET.fromstring(xmlstring)
+
+    def parse(self, fp):
+        """Parse a (binary) file object incrementally; return the root."""
+        return ET.parse(fp).getroot()
+
+    def tostring(self, element):
+        """Serialize an element (without pretty printing) to str."""
+        return ET.tostring(element, 'unicode')
+
+    def prettify(self, element):
+        """Serialize an element to an indented str, including declaration."""
+        x = xml.dom.minidom.parseString(ET.tostring(element))
+        return x.toprettyxml(indent='  ')
+# class StdlibBackend
+
+
+class LxmlBackend(object):
+    """lxml.etree for parsing and serialization."""
+    name = 'lxml'
+
+    def __init__(self):
+        # Comments and processing instructions are dropped, just like
+        # ElementTree's default parser does.
+        options = dict(remove_comments=True, remove_pis=True)
+
+        # lxml refuses to parse a str that carries an encoding declaration.
+        # Strings are therefore encoded to UTF-8 and parsed as such.
+        self._parser = lxml.etree.XMLParser(**options)
+        self._str_parser = lxml.etree.XMLParser(encoding='utf-8', **options)
+
+    def Element(self, tag):
+        return lxml.etree.Element(tag)
+
+    def SubElement(self, parent, tag):
+        return lxml.etree.SubElement(parent, tag)
+
+    def iselement(self, element):
+        return isinstance(element, lxml.etree._Element)
+
+    def fromstring(self, xmlstring):
+        """Parse a str (or bytes) and return the root element."""
+        if isinstance(xmlstring, str):
+            return lxml.etree.fromstring(xmlstring.encode('utf-8'), self._str_parser)
+
+        return lxml.etree.fromstring(xmlstring, self._parser)
+
+    def parse(self, fp):
+        """Parse a (binary) file object incrementally; return the root."""
+        return lxml.etree.parse(fp, self._parser).getroot()
+
+    def tostring(self, element):
+        """Serialize an element (without pretty printing) to str."""
+        return lxml.etree.tostring(element, encoding='unicode')
+
+    def prettify(self, element):
+        """Serialize an element to an indented str, including declaration."""
+        pretty_xml = lxml.etree.tostring(element, encoding='unicode', pretty_print=True)
+        return XML_DECLARATION + pretty_xml
+# class LxmlBackend
+
+
+BACKENDS = {
+    'stdlib': StdlibBackend,
+    'lxml': LxmlBackend,
+}
+
+_backend = None
+_instances = dict()
+
+
+def _instance(name):
+    if name not in _instances:
+        _instances[name] = BACKENDS[name]()
+
+    return _instances[name]
+
+
+def available_backends():
+    """Return the names of the backends that can be used."""
+    if lxml is None:
+        return ['stdlib']
+
+    return ['lxml', 'stdlib']
+
+
+def get_backend():
+    """Return the active backend."""
+    return _backend
+
+
+def set_backend(name=None):
+    """Select the backend by name ('lxml' or 'stdlib').
+
+    If name is None, lxml is used if it is installed.
+    """
+    global _backend
+
+    if name is None:
+        name = available_backends()[0]
+
+    if name not in available_backends():
+        raise UnsupportedBackendError(name)
+
+    _backend = _instance(name)
+    return _backend
+
+
+def backend_for(element):
+    """Return a backend that is able to handle 'element'."""
+    if _backend.iselement(element):
+        return _backend
+
+    for name in available_backends():
+        backend = _instance(name)
+        if backend.iselement(element):
+            return backend
+
+    raise UnsupportedBackendError(type(element).__name__)
+
+
+set_backend()
@@ -3,15 +3,27 @@
 from __future__ import unicode_literals, print_function
 
 import datetime, time
+import base64
+import collections
+import copy
+import functools
+import itertools
+import json
 import logging
+import uuid
+import concurrent.futures
 
 import sqlalchemy
 from sqlalchemy import *
 from sqlalchemy.engine.url import make_url
 from sqlalchemy.orm import scoped_session, sessionmaker, relationship, backref
 from sqlalchemy.ext.declarative import declarative_base, as_declarative, declared_attr
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
 
 import fhir.model
+from . import codecs
+from .cache import ResourceCache
 
 __author__ = "Melle Sieswerda"
 __copyright__  = "Copyright 2017, Melle Sieswerda"
@@ -21,6 +33,60 @@ __version__ = "0.8"
 Session = scoped_session(sessionmaker(autocommit=False, autoflush=False))
 object_session = Session.object_session
 
+# Maximum number of ids in a single 'IN (...)' clause.
+IN_CHUNKSIZE = 500
+
+# Minimum number of rows for which get_many() decodes in parallel.
+PARALLEL_THRESHOLD = 64
+
+# Default number of Resources per page of search_page().
+PAGE_SIZE = 100
+
+# Number of threads that process the entries of a batch Bundle.
+BATCH_WORKERS = 4
+
+# Number of times a write without If-Match is attempted when other writers
+# keep changing the Resource.
+WRITE_ATTEMPTS = 5
+
+
+# ------------------------------------------------------------------------------
+# Exceptions
+# ------------------------------------------------------------------------------
+class VersionConflictError(Exception):
+    """Raised if a Resource is not at the version a write expected."""
+
+    def __init__(self, type_, id_, version):
+        msg = "{}/{} is not at version {} (anymore)".format(type_, id_, version)
+        super(VersionConflictError, self).__init__(msg)
+# class VersionConflictError
+
+
+class InvalidPageTokenError(ValueError):
+    def __init__(self, token):
+        msg = "Invalid token '{}'".format(token)
+        super(InvalidPageTokenError, self).__init__(msg)
+# class InvalidPageTokenError
+
+
+class ResourceGoneError(NoResultFound):
+    """Raised when reading a version that records a deletion."""
+
+    def __init__(self, type_, id_, version):
+        msg = "{}/{} was deleted in version {}".format(type_, id_, version)
+        super(ResourceGoneError, self).__init__(msg)
+# class ResourceGoneError
+
+
+class OutdatedSchemaError(Exception):
+    """Raised if the database has tables of an earlier version; see migrate()."""
+
+    def __init__(self, tables):
+        msg = "The table(s) {} have the schema of an earlier version; upgrade " \
+              "the database with fhir.persistance.migrate()".format(', '.join(tables))
+        super(OutdatedSchemaError, self).__init__(msg)
+# class OutdatedSchemaError
+
 
 
 # ------------------------------------------------------------------------------
@@ -46,53 +112,1459 @@ class Base(object):
         return logging.getLogger(self.__class__.__name__)
 # class Base
 
-class Resource(Base):
-    """Example DB model class."""
+class ResourceMixin(object):
+    """Columns of tables that hold the current version of Resources."""
 
-    _id = Column(Integer, primary_key=True)
+    # Logical ids are only unique within a resource type.
+    type = Column(String(50), primary_key=True)
+    id = Column(String(64), primary_key=True)
+    version = Column(Integer, default=1)
 
-    # Attributes
-    id = Column(String(50), index=True, unique=True)
-    type = Column(String(50), index=True)
+    # Name of the codec used for 'data'. Rows written by earlier versions
+    # have no codec and store pretty printed XML in 'xml'.
+    codec = Column(String(20))
+    data = Column(LargeBinary)
     xml = Column(Text)
+
+    last_updated = Column(DateTime)
+
+    @declared_attr
+    def __table_args__(cls):
+        # For iter(since=...); every table needs its own index name.
+        name = 'ix_{}_type_last_updated'.format(cls.__tablename__)
+        return (Index(name, 'type', 'last_updated'), )
+# class ResourceMixin
+
+class Resource(ResourceMixin, Base):
+    """Current version of Resources of all types."""
 # class Resource
 
+class UnknownResourceTypeError(ValueError):
+    def __init__(self, type_):
+        msg = "'{}' is not a known resource type".format(type_)
+        super(UnknownResourceTypeError, self).__init__(msg)
+# class UnknownResourceTypeError
+
+# type --> mapped class for the partition of that type.
+_partitions = dict()
+
+
+def resource_types():
+    """Return the names of the resource types in fhir.model."""
+    return sorted(
+        name for name, cls in vars(fhir.model).items()
+        if isinstance(cls, type) and issubclass(cls, fhir.model.Resource)
+    )
+
+
+def partition(type_):
+    """Return the mapped class for the table with Resources of type_.
+
+    Partitions have the same columns as Resource and are named after
+    their type, e.g. 'resource_patient'.
+    """
+    if type_ not in _partitions:
+        if type_ not in resource_types():
+            raise UnknownResourceTypeError(type_)
+
+        _partitions[type_] = type(str('Resource' + type_), (ResourceMixin, Base), {
+            '__tablename__': 'resource_' + type_.lower(),
+        })
+
+    return _partitions[type_]
+
+class ResourceHistory(Base):
+    """Previous versions of Resources.
+
+    Deleting a Resource adds a row without data (deleted=True) for the
+    version that records the deletion.
+    """
+    __tablename__ = 'resource_history'
+
+    type = Column(String(50), primary_key=True)
+    id = Column(String(64), primary_key=True)
+    version = Column(Integer, primary_key=True)
+    codec = Column(String(20))
+    data = Column(LargeBinary)
+    xml = Column(Text)
+    last_updated = Column(DateTime)
+    deleted = Column(Boolean, default=False)
+# class ResourceHistory
+
+class ChangeLog(Base):
+    """Every create, update and delete, numbered in the order of writing."""
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+
+    action = Column(String(10), nullable=False)
+    type = Column(String(50), nullable=False)
+    id = Column(String(64), nullable=False)
+    version = Column(Integer, nullable=False)
+    last_updated = Column(DateTime, nullable=False)
+# class ChangeLog
+
+ChangeEvent = collections.namedtuple('ChangeEvent', [
+    'token', 'action', 'type', 'id', 'version', 'last_updated',
+])
+
+# Index tables for search parameters; these need Base.
+from . import search
+from . import references
+from . import bundles
+
+
+def _chunks(iterable, chunksize):
+    iterator = iter(iterable)
+
+    while True:
+        chunk = list(itertools.islice(iterator, chunksize))
+
+        if not chunk:
+            return
+
+        yield chunk
+
+
+def _columns(table):
+    """Return the columns needed to decode rows of Resource(History)."""
+    return [table.type, table.id, table.version, table.codec, table.data,
+            table.xml, table.last_updated]
+
+
+def _outdated_tables(engine):
+    """Return the tables that still have the surrogate key '_id' of
+    earlier versions.
+    """
+    inspector = inspect(engine)
+    existing = inspector.get_table_names()
+
+    return [
+        table for table in (Resource.__table__, ResourceHistory.__table__)
+        if table.name in existing
+        and '_id' in [c['name'] for c in inspector.get_columns(table.name)]
+    ]
+
+
+def _create_indexes(engine, tables):
+    """Create the indexes of existing tables that do not exist yet;
+    create_all() only creates the indexes of new tables.
+    """
+    inspector = inspect(engine)
+
+    for table in tables:
+        existing = [index['name'] for index in inspector.get_indexes(table.name)]
+
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(engine)
+
+
+def migrate(URI):
+    """Upgrade the tables of a database written by an earlier version.
+
+    Earlier versions keyed 'resource' and 'resource_history' by a surrogate
+    key '_id' (and ids were unique across resource types); now they are
+    keyed by (type, id[, version]). As create_all() does not alter existing
+    tables, FHIRStore raises OutdatedSchemaError for such a database.
+
+    Every outdated table is rebuilt in a single transaction: a new table
+    is created, the rows are copied with INSERT ... SELECT, and the old
+    table is replaced. Columns that did not exist yet remain empty; a
+    missing version becomes 1. Returns the names of the upgraded tables.
+
+    :param URI: database URI or Engine.
+    """
+    engine = create_engine(URI) if isinstance(URI, str) else URI
+    outdated = _outdated_tables(engine)
+
+    with engine.begin() as connection:
+        for table in outdated:
+            old = Table(table.name, MetaData(), autoload_with=connection)
+            new = table.tometadata(MetaData(), name=table.name + '_new')
+            new.create(connection)
+
+            columns = [
+                old.c[c.name] if c.name in old.c else literal(1).label(c.name)
+                for c in new.columns
+                if c.name in old.c or c.name == 'version'
+            ]
+            names = [column.name for column in columns]
+            connection.execute(new.insert().from_select(names, select(columns)))
+
+            old.drop(connection)
+            connection.execute('ALTER TABLE {} RENAME TO {}'.format(new.name, table.name))
+
+    return [table.name for table in outdated]
+
+
+def _reference(id_, type_=None):
+    """Return (type, id) for an id, optionally given as 'Type/id'.
+
+    The type is None if it is not known.
+    """
+    id_ = str(id_)
+
+    if type_ is None and '/' in id_:
+        type_, id_ = id_.rsplit('/', 2)[-2:]
+
+    return type_, id_
+
+
+def _version(if_match):
+    """Return the version in an If-Match value: 3, '3' or 'W/"3"'."""
+    if if_match is None:
+        return None
+
+    value = str(if_match)
+
+    if value.startswith('W/'):
+        value = value[2:]
+
+    return int(value.strip('"'))
+
+
+def _instant(timestamp):
+    """Return the FHIR instant for a naive UTC datetime."""
+    return timestamp.isoformat() + 'Z'
+
+
+def _set_meta(resource, version, last_updated):
+    """Set meta.versionId and meta.lastUpdated (a naive UTC datetime)."""
+    if resource.meta is None:
+        resource.meta = fhir.model.Meta()
+
+    resource.meta.versionId = str(version)
+
+    if last_updated is not None:
+        resource.meta.lastUpdated = _instant(last_updated)
+
+
+def _timestamp(value):
+    """Return a naive UTC datetime for a datetime or a (partial) instant.
+
+    A partial instant, e.g. '2017-03', means its start.
+    """
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+        return value
+
+    start, end = fhir.model.dateTime(str(value)).key
+    return datetime.datetime(1970, 1, 1) + datetime.timedelta(microseconds=start)
+
+
+def _page_token(type_, id_):
+    """Return the (opaque) token for the page after Resource type_/id_."""
+    token = json.dumps([type_, id_]).encode('utf-8')
+    return base64.urlsafe_b64encode(token).decode('ascii')
+
+
+def _parse_page_token(type_, token):
+    """Return the id after which the page for 'token' starts."""
+    try:
+        token_type, id_ = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except (ValueError, TypeError, AttributeError):
+        raise InvalidPageTokenError(token)
+
+    if token_type != type_:
+        raise InvalidPageTokenError(token)
+
+    return id_
+
+
+def _new_id():
+    """Return a new logical id."""
+    return str(uuid.uuid4())
+
+
+# Exception --> HTTP status of a Bundle entry that failed; first match wins.
+_STATUS = [
+    (ResourceGoneError, '410 Gone'),
+    (NoResultFound, '404 Not Found'),
+    (VersionConflictError, '412 Precondition Failed'),
+    (MultipleResultsFound, '412 Precondition Failed'),
+    (IntegrityError, '409 Conflict'),
+    (ValueError, '400 Bad Request'),
+]
+
+
+def _status(exception):
+    for cls, status in _STATUS:
+        if isinstance(exception, cls):
+            return status
+
+    return '500 Internal Server Error'
+
+
+def _decode(type_, codec, data, xml, version=None, last_updated=None, trusted=()):
+    """Return the Resource stored in a row.
+
+    The row's version and last_updated take precedence over the meta in
+    the stored data. Rows stored with an unsafe codec (see
+    codecs.UNSAFE) raise UntrustedCodecError, unless it is in trusted.
+    """
+    cls = getattr(fhir.model, type_)
+
+    if codec is None:
+        resource = cls.fromXML(xml)
+    else:
+        resource = codecs.get_codec(codec, trusted).decode(data, cls)
+
+    if version is not None:
+        _set_meta(resource, version, last_updated)
+
+    return resource
+
+
+def _decode_rows(rows, trusted=()):
+    """Decode a list of (type, codec, data, xml, version, last_updated);
+    runs in a worker process.
+    """
+    return [_decode(*row, trusted=trusted) for row in rows]
+
+
 class FHIRStore(object):
-    def __init__(self, URI='sqlite:///tmp.db', drop_all=False):
-        engine = create_engine(URI, convert_unicode=True)
+    def __init__(self, URI='sqlite:///tmp.db', drop_all=False, codec='json',
+                 cache_size=1024, partitioned=False, allow_pickle=False,
+                 base=None):
+        """Create a new FHIRStore.
+
+        :param str codec: storage format used for new rows; see
+            fhir.persistance.codecs. Rows are always read with the codec
+            they were written with.
+        :param int cache_size: maximum number of Resources kept in the read
+            cache (see fhir.persistance.cache); 0 disables the cache.
+        :param bool partitioned: if True, Resources are stored in a table
+            per resource type (see partition()) instead of in a single
+            table, so scans and indexes of a type do not grow with the
+            other types. Reads and writes then always need the type.
+        :param bool allow_pickle: if True, rows stored with the 'pickle'
+            codec are read (and codec='pickle' can be used). Unpickling
+            runs arbitrary code, so anyone who can write to the database
+            could run code in every reader: only use this for trusted
+            databases. Otherwise such rows raise UntrustedCodecError.
+        :param str base: base URL of this server, e.g.
+            'http://example.org/fhir'. Absolute references that start with
+            it are indexed (and searched) like relative ones; absolute
+            references to other servers are not.
+        """
+        self.trusted_codecs = ('pickle', ) if allow_pickle else ()
+        self.codec = codecs.get_codec(codec, self.trusted_codecs)
+        self.cache = ResourceCache(cache_size)
+        self.partitioned = partitioned
+        self.base = base
+        self.engine = engine = create_engine(URI, convert_unicode=True)
+
+        # Sessions bound to a previous engine must not be reused.
+        Session.remove()
         Session.configure(bind=engine)
 
+        partitions = [partition(type_).__table__ for type_ in resource_types()]
+
         if drop_all:
             Base.metadata.drop_all(engine)
 
-        Base.metadata.create_all(bind=engine)
-    
-    def get(self, id):
-        """Retrieve a Resource from the database."""
+        outdated = _outdated_tables(engine)
+
+        if outdated:
+            raise OutdatedSchemaError([table.name for table in outdated])
+
+        tables = [t for t in Base.metadata.sorted_tables if t not in partitions]
+
+        if partitioned:
+            tables += partitions
+
+        Base.metadata.create_all(bind=engine, tables=tables)
+        _create_indexes(engine, tables)
+
+    def _table(self, type_):
+        """Return the mapped class that holds Resources of type_."""
+        if not self.partitioned:
+            return Resource
+
+        if type_ is None:
+            raise ValueError('A partitioned FHIRStore needs the resource type')
+
+        return partition(type_)
+
+    def get(self, id, type=None):
+        """Retrieve a Resource from the database.
+
+        :param id: the id, or 'Type/id'.
+        :param str type: resource type; if not given (and not part of id),
+            the id must be unique across types.
+        """
+        resource = self.get_many([id], type)[0]
+
+        if resource is None:
+            raise NoResultFound('No Resource with id {}'.format(id))
+
+        return resource
+
+    def get_many(self, ids, type=None, workers=0):
+        """Retrieve many Resources from the database.
+
+        Returns a list with a Resource (or None if it does not exist) for
+        every id, in the same order. Rows are read with one query per
+        resource type and IN_CHUNKSIZE ids. Resources are served from the
+        cache if their current version is in it.
+
+        :param ids: ids, or references 'Type/id'.
+        :param str type: resource type of ids without one; see get().
+        :param int workers: if > 0 and at least PARALLEL_THRESHOLD rows
+            need decoding, they are decoded by this many processes.
+        """
+        keys = [_reference(id, type) for id in ids]
+        groups = dict()
+        found = dict()
+
+        for type_, id_ in dict.fromkeys(keys):
+            groups.setdefault(type_, []).append(id_)
+
+        for type_, group in groups.items():
+            found.update(self._get_many(type_, group, workers))
+
+        return [found.get(key) for key in keys]
+
+    def _get_many(self, type_, ids, workers):
+        """Return {(type_, id): Resource} for the ids that exist."""
         session = Session()
+        table = self._table(type_)
+        found = dict()
+        missing = ids
+
+        def query(*columns):
+            query = session.query(*columns)
+
+            if type_ is not None:
+                query = query.filter(table.type == type_)
+
+            return query
+
+        def add(id_, resource):
+            if (type_, id_) in found:
+                raise MultipleResultsFound('The id {} is used by several resource types'.format(id_))
+
+            found[(type_, id_)] = resource
+
+        # Look up the current versions only if there is anything to hit;
+        # otherwise every row read is a miss (counted below).
+        looked_up = len(self.cache) > 0
+
+        if looked_up:
+            missing = []
+
+            for chunk in _chunks(ids, IN_CHUNKSIZE):
+                versions = query(table.type, table.id, table.version)
+
+                for key in versions.filter(table.id.in_(chunk)):
+                    resource = self.cache.get(tuple(key))
+
+                    if resource is None:
+                        missing.append(key.id)
+                    else:
+                        add(key.id, resource)
+
+        rows = []
+
+        for chunk in _chunks(missing, IN_CHUNKSIZE):
+            rows.extend(query(*_columns(table)).filter(table.id.in_(chunk)))
+
+        if not looked_up:
+            self.cache.miss(len(rows))
 
-        persisted_resource = session.query(Resource).filter_by(id=str(id)).one()
-        cls = getattr(fhir.model, persisted_resource.type)
-        return cls.fromXML(persisted_resource.xml)
+        for row, resource in zip(rows, self._decode_many(rows, workers)):
+            self.cache.put((row.type, row.id, row.version), resource)
+            add(row.id, resource)
+
+        return found
+
+    def _decode_many(self, rows, workers=0):
+        """Return the Resources stored in rows."""
+        rows = [(r.type, r.codec, r.data, r.xml, r.version, r.last_updated)
+                for r in rows]
+
+        if not workers or len(rows) < PARALLEL_THRESHOLD:
+            return _decode_rows(rows, self.trusted_codecs)
+
+        chunksize = max(1, len(rows) // (4 * workers))
+        decode_rows = functools.partial(_decode_rows, trusted=self.trusted_codecs)
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            chunks = executor.map(decode_rows, _chunks(rows, chunksize))
+            return list(itertools.chain.from_iterable(chunks))
+
+    def _encode(self, resource):
+        """Return the column values for storing a Resource."""
+        return dict(
+            id=str(resource.id),
+            type=resource.__class__.__name__,
+            codec=self.codec.name,
+            data=self.codec.encode(resource),
+        )
+
+    def _decode(self, persisted_resource):
+        """Return the Resource stored in a row."""
+        r = persisted_resource
+        return _decode(r.type, r.codec, r.data, r.xml, r.version, r.last_updated,
+                       self.trusted_codecs)
     
+    def _index(self, session, index_rows):
+        """Insert index rows ({table: [dict, ...]}) for search parameters
+        and references.
+        """
+        for table, rows in index_rows.items():
+            if rows:
+                session.execute(table.__table__.insert(), rows)
+
+    def _extract(self, resource):
+        """Return the index rows ({table: [dict, ...]}) for a Resource."""
+        index_rows = search.extract(resource, self.base)
+        index_rows[references.ResourceLink] = references.extract(resource, self.base)
+        return index_rows
+
+    def _unindex(self, session, type_, id_):
+        """Delete the index rows of a Resource."""
+        for table in search.TABLES.values():
+            session.query(table).filter(
+                table.resource_type == type_,
+                table.resource_id == id_,
+            ).delete(synchronize_session=False)
+
+        link = references.ResourceLink
+        session.query(link).filter(
+            link.source_type == type_,
+            link.source_id == id_,
+        ).delete(synchronize_session=False)
+
+    def _log(self, session, action, type_, id_, version, now):
+        """Add a change to the change log."""
+        session.execute(ChangeLog.__table__.insert(), dict(
+            action=action,
+            type=type_,
+            id=id_,
+            version=version,
+            last_updated=now,
+        ))
+
+    def _archive(self, session, type_, id_, version):
+        """Copy a version of a Resource to the history, in SQL.
+
+        Returns the number of rows copied (0 if the Resource does not exist
+        at that version). Copying a version twice violates the history's
+        unique constraint.
+        """
+        table = self._table(type_)
+        columns = _columns(table.__table__.c)
+        select_ = select(columns).where(and_(
+            table.type == type_,
+            table.id == id_,
+            table.version == version,
+        ))
+        names = [column.key for column in columns]
+        insert = ResourceHistory.__table__.insert().from_select(names, select_)
+
+        return session.execute(insert).rowcount
+
+    def _latest_versions(self, session, keys):
+        """Return {(type, id): latest version in the history} for keys."""
+        groups = dict()
+        latest = dict()
+
+        for type_, id_ in keys:
+            groups.setdefault(type_, []).append(id_)
+
+        for type_, ids in groups.items():
+            for chunk in _chunks(ids, IN_CHUNKSIZE):
+                query = session.query(
+                    ResourceHistory.type,
+                    ResourceHistory.id,
+                    func.max(ResourceHistory.version),
+                ).filter(
+                    ResourceHistory.type == type_,
+                    ResourceHistory.id.in_(chunk),
+                ).group_by(ResourceHistory.type, ResourceHistory.id)
+
+                latest.update(((t, i), v) for t, i, v in query)
+
+        return latest
+
+    def _insert(self, session, resources, now):
+        """Insert new Resources, one executemany per table.
+
+        Resources get version 1, unless they were deleted before: then the
+        history continues. Returns the versions.
+        """
+        table_rows = dict()
+        index_rows = dict()
+        changes = []
+        versions = []
+
+        keys = [(r.__class__.__name__, str(r.id)) for r in resources]
+        latest = self._latest_versions(session, keys)
+
+        for resource, key in zip(resources, keys):
+            version = latest.get(key, 0) + 1
+            versions.append(version)
+
+            row = self._encode(resource)
+            row.update(version=version, last_updated=now)
+            table_rows.setdefault(self._table(row['type']), []).append(row)
+            changes.append(dict(action='create', type=row['type'], id=row['id'],
+                                version=version, last_updated=now))
+
+            for table, values in self._extract(resource).items():
+                index_rows.setdefault(table, []).extend(values)
+
+        for table, rows in table_rows.items():
+            session.execute(table.__table__.insert(), rows)
+
+        if changes:
+            session.execute(ChangeLog.__table__.insert(), changes)
+
+        self._index(session, index_rows)
+
+        return versions
+
     def post(self, resource):
         """Create a Resource in the database."""
         session = Session()
+        now = datetime.datetime.utcnow()
 
-        persisted_resource = Resource(
-            id=str(resource.id),
-            type=resource.__class__.__name__,
-            xml=resource.toXML()
+        try:
+            version, = self._insert(session, [resource], now)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+        _set_meta(resource, version, now)
+
+    def post_many(self, resources, batch_size=1000, progress=None):
+        """Create many Resources in the database.
+
+        Resources are consumed (and serialized) lazily and inserted in chunks
+        of batch_size rows: one executemany and one commit per chunk.
+
+        :param resources: iterable of Resources.
+        :param int batch_size: number of Resources per transaction.
+        :param progress: optional callable progress(count, elapsed) that is
+            called after every chunk with the number of Resources stored so
+            far and the elapsed time in seconds.
+
+        Every Resource gets version 1 (or continues its history if it was
+        deleted before); meta.versionId and meta.lastUpdated are set once
+        its chunk is committed.
+
+        Returns the number of Resources that were stored. If a chunk fails
+        (e.g. a duplicate id), that chunk is rolled back; earlier chunks
+        remain committed.
+        """
+        log = logging.getLogger(self.__class__.__name__)
+        session = Session()
+        resources = iter(resources)
+
+        count = 0
+        start = time.perf_counter()
+
+        while True:
+            chunk = list(itertools.islice(resources, batch_size))
+
+            if not chunk:
+                break
+
+            now = datetime.datetime.utcnow()
+
+            try:
+                versions = self._insert(session, chunk, now)
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+
+            for resource, version in zip(chunk, versions):
+                _set_meta(resource, version, now)
+
+            count += len(chunk)
+            elapsed = time.perf_counter() - start
+            log.debug('stored {} resources ({:.0f}/s)'.format(count, count / elapsed))
+
+            if progress is not None:
+                progress(count, elapsed)
+
+        return count
+
+    def changes(self, since_token=None, types=None, lag=0, batch_size=1000):
+        """Yield the changes made after since_token as ChangeEvents.
+
+        Every event is a ChangeEvent(token, action, type, id, version,
+        last_updated) with action 'create', 'update' or 'delete'. Events
+        are yielded in the order in which they were written; resume by
+        passing the token of the last event that was processed. Reading
+        uses the primary key of the change log, so its cost only depends
+        on the number of new changes.
+
+        :param str since_token: token of an event; None starts at the
+            beginning.
+        :param types: only yield changes to these resource types.
+        :param lag: only yield changes that are at least 'lag' seconds
+            old. Databases that run write transactions concurrently (i.e.
+            not SQLite) may commit a change after one that was written
+            later; a lag longer than the longest write transaction
+            ensures no change is skipped.
+        """
+        query = Session().query(ChangeLog)
+
+        if since_token is not None:
+            try:
+                since = int(since_token)
+            except (ValueError, TypeError):
+                raise InvalidPageTokenError(since_token)
+
+            query = query.filter(ChangeLog.seq > since)
+
+        if types is not None:
+            query = query.filter(ChangeLog.type.in_(list(types)))
+
+        if lag:
+            until = datetime.datetime.utcnow() - datetime.timedelta(seconds=lag)
+            query = query.filter(ChangeLog.last_updated <= until)
+
+        query = query.order_by(ChangeLog.seq).execution_options(stream_results=True)
+
+        for change in query.yield_per(batch_size):
+            yield ChangeEvent(
+                str(change.seq),
+                change.action,
+                change.type,
+                change.id,
+                change.version,
+                _instant(change.last_updated),
+            )
+
+    def search(self, type, **params):
+        """Return the Resources of 'type' that match all search parameters.
+
+        Parameters are given as keywords; underscores are read as dashes,
+        so value_quantity means 'value-quantity'. Use a dict for modifiers:
+        ``store.search('Patient', **{'name:exact': 'Chalmers'})``. Values
+        follow FHIR's search syntax:
+
+         * token: 'code', 'system|code', 'system|' or '|code'
+         * string: prefix match, ignoring case and accents (modifiers
+           ':exact' and ':contains')
+         * date: a (partial) dateTime, optionally with prefix, e.g. 'ge2017-01'
+         * reference: 'Patient/123' or '123'
+         * quantity: '[prefix]number|system|code', e.g. 'gt5.4||mmol/L';
+           UCUM units are compared after conversion to canonical units.
+
+        Commas separate alternatives (OR); a list of values must all match
+        (AND). '_id' matches logical ids. Only the parameters in
+        search.SEARCH_PARAMETERS are supported.
+        """
+        table, query = self._search_query(Session(), type, params)
+        return [self._decode(r) for r in query.order_by(table.id)]
+
+    def search_page(self, type, count=PAGE_SIZE, token=None, **params):
+        """Return a page of search results as (Resources, next token).
+
+        Results are ordered by id and pages are found with a keyset (seek)
+        condition, 'id > last id of the previous page', so a deep page
+        costs as much as the first. The next token is None on the last
+        page. Pass the same search parameters (see search()) for every page.
+
+        :param int count: maximum number of Resources per page.
+        :param str token: token returned with the previous page.
+        """
+        session = Session()
+        table, query = self._search_query(session, type, params)
+
+        if token is not None:
+            query = query.filter(table.id > _parse_page_token(type, token))
+
+        query = query.with_entities(*_columns(table)).order_by(table.id)
+        rows = query.limit(count + 1).all()
+        next_token = None
+
+        if len(rows) > count:
+            rows = rows[:count]
+            next_token = _page_token(type, rows[-1].id)
+
+        return self._decode_many(rows), next_token
+
+    def _search_query(self, session, type, params):
+        """Return (table, query) for the Resources that match params."""
+        table = self._table(type)
+        query = session.query(table).filter(table.type == type)
+
+        for key, value in params.items():
+            if key == '_id':
+                # Like other parameters: each value of a list must match.
+                for v in ([value] if isinstance(value, str) else value):
+                    query = query.filter(table.id.in_(v.split(',')))
+
+                continue
+
+            index, name, conditions = search.condition(type, key, value, self.base)
+
+            for condition in conditions:
+                ids = session.query(index.resource_id).filter(
+                    index.resource_type == type,
+                    index.param == name,
+                    condition,
+                )
+                query = query.filter(table.id.in_(ids))
+
+        return table, query
+
+    def iter(self, type, since=None, batch_size=1000):
+        """Yield all Resources of 'type' (in order of id) one at a time.
+
+        Rows are streamed, batch_size at a time (with a server-side cursor
+        where the database supports it), and only decoded when the
+        Resource is needed, so memory use does not grow with the number of
+        Resources. The read cache is bypassed.
+
+        :param since: only yield Resources last updated at or after since:
+            a datetime (naive means UTC) or a (partial) instant, e.g.
+            '2017-03-01T12:00:00Z'. The rows are found with the index on
+            (type, last_updated). For repeated incremental exports,
+            changes() is more suitable: it also reports deletions and
+            resumes from a token instead of a timestamp.
+        """
+        table = self._table(type)
+        query = Session().query(*_columns(table)).filter(table.type == type)
+
+        if since is not None:
+            query = query.filter(table.last_updated >= _timestamp(since))
+
+        query = query.order_by(table.id).execution_options(stream_results=True)
+
+        for row in query.yield_per(batch_size):
+            yield self._decode(row)
+
+    def _current_version(self, session, type_, id_):
+        table = self._table(type_)
+        return session.query(table.version).filter(
+            table.type == type_,
+            table.id == id_,
+        ).scalar()
+
+    def _write(self, operation, type_, id_, if_match):
+        """Run operation(session, current_version) in a transaction.
+
+        Without If-Match the current version is read first and the write is
+        retried (at most WRITE_ATTEMPTS times) if another writer got there
+        in between; with If-Match a conflict raises VersionConflictError.
+        Errors that are not caused by another writer, i.e. the current
+        version did not change, are raised as is. Returns the result of
+        the operation.
+        """
+        session = Session()
+        expected = _version(if_match)
+        attempts = 0
+
+        while True:
+            version = expected
+            attempts += 1
+
+            if version is None:
+                version = self._current_version(session, type_, id_)
+
+            try:
+                result = operation(session, version)
+                session.commit()
+            except (VersionConflictError, IntegrityError):
+                session.rollback()
+
+                if self._current_version(session, type_, id_) == version:
+                    raise
+
+                if expected is not None or attempts >= WRITE_ATTEMPTS:
+                    raise VersionConflictError(type_, id_, version)
+
+                continue
+            except Exception:
+                session.rollback()
+                raise
+            finally:
+                self.cache.invalidate(type_, id_)
+
+            return result
+
+    def _put(self, session, resource, current, now):
+        """Store a new version of a Resource; return the version.
+
+        If current is None, the Resource is created. Raises
+        VersionConflictError if it is not at version current (anymore).
+        """
+        type_, id_ = resource.__class__.__name__, str(resource.id)
+        table = self._table(type_)
+        values = self._encode(resource)
+
+        if current is None:
+            # A new Resource, or one that was deleted before.
+            latest = session.query(func.max(ResourceHistory.version)).filter(
+                ResourceHistory.type == type_,
+                ResourceHistory.id == id_,
+            ).scalar()
+            version = (latest or 0) + 1
+
+            session.execute(
+                table.__table__.insert(),
+                dict(values, version=version, last_updated=now),
+            )
+
+        else:
+            version = current + 1
+
+            if not self._archive(session, type_, id_, current):
+                raise VersionConflictError(type_, id_, current)
+
+            statement = table.__table__.update().where(and_(
+                table.type == type_,
+                table.id == id_,
+                table.version == current,
+            )).values(
+                version=table.version + 1,
+                codec=values['codec'],
+                data=values['data'],
+                xml=None,
+                last_updated=now,
+            )
+
+            if session.execute(statement).rowcount != 1:
+                raise VersionConflictError(type_, id_, current)
+
+        self._log(session, 'create' if current is None else 'update', type_, id_, version, now)
+        self._unindex(session, type_, id_)
+        self._index(session, self._extract(resource))
+
+        return version
+
+    def _delete(self, session, type_, id_, current, now):
+        """Delete a Resource; return the version that records the deletion."""
+        if current is None:
+            raise NoResultFound('No Resource {}/{}'.format(type_, id_))
+
+        if not self._archive(session, type_, id_, current):
+            raise VersionConflictError(type_, id_, current)
+
+        session.execute(ResourceHistory.__table__.insert(), dict(
+            type=type_,
+            id=id_,
+            version=current + 1,
+            last_updated=now,
+            deleted=True,
+        ))
+
+        table = self._table(type_)
+        deleted = session.query(table).filter(
+            table.type == type_,
+            table.id == id_,
+            table.version == current,
+        ).delete(synchronize_session=False)
+
+        if deleted != 1:
+            raise VersionConflictError(type_, id_, current)
+
+        self._log(session, 'delete', type_, id_, current + 1, now)
+        self._unindex(session, type_, id_)
+
+        return current + 1
+
+    def put(self, resource, if_match=None):
+        """Update a Resource in the database, or create it.
+
+        The previous version is moved to the history and the Resource's
+        version is incremented by a single conditional UPDATE. On success,
+        meta.versionId and meta.lastUpdated of 'resource' are set.
+
+        :param if_match: expected current version, as int, str or ETag
+            ('W/"3"'). If the Resource does not exist at this version,
+            VersionConflictError is raised and nothing is written.
+
+        Returns the new version.
+        """
+        now = datetime.datetime.utcnow()
+        type_, id_ = resource.__class__.__name__, str(resource.id)
+
+        def put(session, current):
+            return self._put(session, resource, current, now)
+
+        version = self._write(put, type_, id_, if_match)
+        _set_meta(resource, version, now)
+        return version
+
+    def delete(self, resource, if_match=None):
+        """Delete a Resource from the database.
+
+        The current version is moved to the history, followed by a version
+        that records the deletion (see vread() and history()).
+
+        :param if_match: see put().
+
+        Returns the version that records the deletion.
+        """
+        now = datetime.datetime.utcnow()
+        type_, id_ = resource.__class__.__name__, str(resource.id)
+
+        def delete(session, current):
+            return self._delete(session, type_, id_, current, now)
+
+        return self._write(delete, type_, id_, if_match)
+
+    def vread(self, type, id, version):
+        """Retrieve a specific version of a Resource.
+
+        Raises NoResultFound if the version does not exist and
+        ResourceGoneError if it records a deletion.
+        """
+        session = Session()
+        id, version = str(id), int(version)
+
+        for table in (self._table(type), ResourceHistory):
+            row = session.query(*_columns(table)).filter(
+                table.type == type,
+                table.id == id,
+                table.version == version,
+            ).first()
+
+            if row is not None:
+                break
+        else:
+            raise NoResultFound('No Resource {}/{}/_history/{}'.format(type, id, version))
+
+        if row.codec is None and row.xml is None:
+            raise ResourceGoneError(type, id, version)
+
+        return self._decode(row)
+
+    def history(self, type, id):
+        """Return all versions of a Resource, newest first.
+
+        Deletions are not included: they have no content.
+        """
+        session = Session()
+        id = str(id)
+        rows = []
+
+        for table in (self._table(type), ResourceHistory):
+            rows.extend(session.query(*_columns(table)).filter(
+                table.type == type,
+                table.id == id,
+                table.codec.isnot(None) | table.xml.isnot(None),
+            ))
+
+        rows.sort(key=lambda row: row.version, reverse=True)
+        return self._decode_many(rows)
+
+    def _grouped(self, keys):
+        """Yield (type, chunk of ids) for (type, id) keys."""
+        groups = dict()
+
+        for type_, id_ in keys:
+            groups.setdefault(type_, []).append(id_)
+
+        for type_, ids in groups.items():
+            for chunk in _chunks(ids, IN_CHUNKSIZE):
+                yield type_, chunk
+
+    def _linked(self, condition, target=True):
+        """Return the rows of the Resources at one end of the matching links.
+
+        :param condition: condition on ResourceLink.
+        :param bool target: True for the targets, False for the sources.
+        """
+        session = Session()
+        link = references.ResourceLink
+
+        if target:
+            type_column, id_column = link.target_type, link.target_id
+        else:
+            type_column, id_column = link.source_type, link.source_id
+
+        types = [None]
+
+        if self.partitioned:
+            query = session.query(type_column).filter(condition).distinct()
+            types = [type_ for type_, in query]
+
+        rows = []
+
+        for type_ in types:
+            table = self._table(type_)
+            linked = exists().where(and_(
+                condition,
+                type_column == table.type,
+                id_column == table.id,
+            ))
+            rows.extend(session.query(*_columns(table)).filter(linked))
+
+        return rows
+
+    def include(self, resources, path=None):
+        """Return the Resources referenced by resources (_include).
+
+        :param str path: only follow References at this path, e.g.
+            'subject'.
+
+        References to Resources that do not exist are ignored. Every
+        Resource is returned once.
+        """
+        link = references.ResourceLink
+        keys = [(r.__class__.__name__, str(r.id)) for r in resources]
+        found = dict()
+
+        for type_, ids in self._grouped(keys):
+            condition = and_(link.source_type == type_, link.source_id.in_(ids))
+
+            if path is not None:
+                condition = and_(condition, link.path == path)
+
+            for row in self._linked(condition, target=True):
+                found[(row.type, row.id)] = row
+
+        return self._decode_many(list(found.values()))
+
+    def revinclude(self, resources, type=None, path=None):
+        """Return the Resources that refer to any of resources (_revinclude).
+
+        :param str type: only return Resources of this type.
+        :param str path: only follow References at this path.
+        """
+        link = references.ResourceLink
+        keys = [(r.__class__.__name__, str(r.id)) for r in resources]
+        found = dict()
+
+        for type_, ids in self._grouped(keys):
+            condition = and_(link.target_type == type_, link.target_id.in_(ids))
+
+            if type is not None:
+                condition = and_(condition, link.source_type == type)
+
+            if path is not None:
+                condition = and_(condition, link.path == path)
+
+            for row in self._linked(condition, target=False):
+                found[(row.type, row.id)] = row
+
+        return self._decode_many(list(found.values()))
+
+    def referrers(self, type, id):
+        """Return the Links (see references.Link) that point at type/id.
+
+        Use this to check what a delete would leave dangling.
+        """
+        link = references.ResourceLink
+        query = Session().query(link).filter(
+            link.target_type == type,
+            link.target_id == str(id),
         )
 
-        session.add(persisted_resource)
-        session.commit()
+        return [row.toLink() for row in query.order_by(link.source_type, link.source_id)]
+
+    def dangling_references(self, type=None):
+        """Return the Links to Resources that do not exist.
+
+        :param str type: only check the References in Resources of this type.
+        """
+        session = Session()
+        link = references.ResourceLink
+        query = session.query(link.target_type).distinct()
+
+        if type is not None:
+            query = query.filter(link.source_type == type)
+
+        dangling = []
+
+        for target_type, in query.all():
+            table = self._table(target_type)
+            missing = session.query(link).filter(
+                link.target_type == target_type,
+                ~exists().where(and_(
+                    table.type == link.target_type,
+                    table.id == link.target_id,
+                )),
+            )
+
+            if type is not None:
+                missing = missing.filter(link.source_type == type)
+
+            dangling.extend(row.toLink() for row in missing)
+
+        return dangling
+
+    def everything(self, type, id, max_depth=None):
+        """Return a Resource together with everything that is linked to it.
+
+        These are the Resources that refer to it, directly or through
+        others (e.g. the Encounters of a Patient and the Observations of
+        these Encounters), up to max_depth links away, plus the Resources
+        these refer to (e.g. Practitioners). The graph is traversed with
+        one query per level on the reference index; the Resource itself
+        comes first.
+        """
+        session = Session()
+        link = references.ResourceLink
+        start = (type, str(id))
+        seen = dict.fromkeys([start])
+        frontier = [start]
+        depth = 0
+
+        while frontier and (max_depth is None or depth < max_depth):
+            found = []
+
+            for type_, ids in self._grouped(frontier):
+                query = session.query(link.source_type, link.source_id).filter(
+                    link.target_type == type_,
+                    link.target_id.in_(ids),
+                )
+                found.extend(tuple(key) for key in query.distinct())
+
+            frontier = [key for key in dict.fromkeys(found) if key not in seen]
+            seen.update(dict.fromkeys(frontier))
+            depth += 1
+
+        targets = []
+
+        for type_, ids in self._grouped(list(seen)):
+            query = session.query(link.target_type, link.target_id).filter(
+                link.source_type == type_,
+                link.source_id.in_(ids),
+            )
+            targets.extend(tuple(key) for key in query.distinct())
+
+        seen.update(dict.fromkeys(targets))
+
+        keys = ['{}/{}'.format(*key) for key in seen]
+        return [resource for resource in self.get_many(keys) if resource is not None]
+
+    def process_bundle(self, bundle, workers=None):
+        """Process a Bundle of type 'transaction' or 'batch'.
+
+        Returns a Bundle of type 'transaction-response' or 'batch-response'
+        with an entry (with response) for every entry, in the same order.
+        See bundles.parse_request() for the supported requests. New
+        Resources get a UUID as id; the Resources in 'bundle' are updated
+        in place (id, meta and references).
+
+        A transaction is all or nothing: its writes are done in a single
+        database transaction (deletes, then creates with one insert per
+        table, then updates) and references to the fullUrl of its entries,
+        e.g. 'urn:uuid:...', are rewritten to the assigned ids. If an entry
+        fails, the exception is raised and nothing is written; 'bundle' is
+        then left unchanged, as the transaction works on copies of its
+        Resources.
+
+        The entries of a batch are independent and processed concurrently
+        by 'workers' threads (default BATCH_WORKERS, but 1 for in-memory
+        SQLite databases, which are not shared between threads). A failed
+        entry gets an error status and an OperationOutcome.
+        """
+        type_ = str(bundle.type) if bundle.type is not None else None
+
+        if type_ == 'transaction':
+            entries = self._transaction(bundle)
+        elif type_ == 'batch':
+            entries = self._batch(bundle, workers)
+        else:
+            msg = "Cannot process a Bundle of type '{}'".format(type_)
+            raise bundles.InvalidBundleError(msg)
+
+        return fhir.model.Bundle(type=type_ + '-response', entry=entries)
+
+    def _existing(self, request):
+        """Return the Resource that matches ifNoneExist, or None."""
+        matches = self.search(request.type, **request.if_none_exist)
+
+        if len(matches) > 1:
+            msg = 'ifNoneExist matches {} Resources'.format(len(matches))
+            raise MultipleResultsFound(msg)
+
+        return matches[0] if matches else None
+
+    def _read(self, request):
+        """Return the response Entry for a GET request."""
+        type_, id_ = request.type, request.id
+
+        if id_ is None:
+            result = self.search(type_, **request.params)
+            return bundles.response_entry('200 OK', resource=bundles.searchset(result))
+
+        if request.version is not None:
+            resource = self.vread(type_, id_, request.version)
+        else:
+            resource = self.get(id_, type_)
+
+        meta = resource.meta
+        return bundles.response_entry('200 OK', type_, id_, meta.versionId,
+                                      meta.lastUpdated, resource=resource)
+
+    def _process_entry(self, entry):
+        """Process a single (batch) entry; return the response Entry."""
+        request = bundles.parse_request(entry)
+        type_, resource = request.type, entry.resource
+
+        if request.method == 'GET':
+            return self._read(request)
+
+        if request.method == 'DELETE':
+            resource = getattr(fhir.model, type_)(id=request.id)
+            self.delete(resource, request.if_match)
+            return bundles.response_entry('204 No Content')
+
+        if request.method == 'POST':
+            existing = None
+
+            if request.if_none_exist is not None:
+                existing = self._existing(request)
+
+            if existing is not None:
+                resource, status = existing, '200 OK'
+            else:
+                resource.id = _new_id()
+                self.post(resource)
+                status = '201 Created'
+
+        else:
+            resource.id = request.id
+            version = self.put(resource, request.if_match)
+            status = '201 Created' if version == 1 else '200 OK'
+
+        meta = resource.meta
+        return bundles.response_entry(status, type_, resource.id,
+                                      meta.versionId, meta.lastUpdated)
+
+    def _in_memory(self):
+        url = self.engine.url
+        return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+    def _batch(self, bundle, workers=None):
+        """Process the entries of a batch; return the response Entries."""
+        if workers is None:
+            workers = 1 if self._in_memory() else BATCH_WORKERS
+
+        def process(entry):
+            try:
+                return self._process_entry(entry)
+            except Exception as e:
+                return bundles.error_entry(_status(e), e)
+
+        def process_in_thread(entry):
+            try:
+                return process(entry)
+            finally:
+                Session.remove()
+
+        if workers <= 1:
+            return [process(entry) for entry in bundle.entry]
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(process_in_thread, bundle.entry))
+
+    def _transaction(self, bundle):
+        """Process the entries of a transaction; return the response Entries."""
+        session = Session()
+        now = datetime.datetime.utcnow()
+        entries = list(bundle.entry)
+        requests = [bundles.parse_request(entry) for entry in entries]
+        responses = [None] * len(entries)
+
+        # The Resources in the Bundle are only updated after the commit.
+        resources = [copy.deepcopy(entry.resource) for entry in entries]
+
+        # fullUrl --> 'Type/id'
+        mapping = dict()
+
+        # Assign ids; conditional creates may resolve to existing Resources.
+        for i, (entry, request) in enumerate(zip(entries, requests)):
+            if request.method == 'POST':
+                existing = None
+
+                if request.if_none_exist is not None:
+                    existing = self._existing(request)
+
+                if existing is not None:
+                    id_, meta = str(existing.id), existing.meta
+                    responses[i] = bundles.response_entry(
+                        '200 OK', request.type, id_, meta.versionId, meta.lastUpdated
+                    )
+                else:
+                    id_ = resources[i].id = _new_id()
+
+            elif request.method == 'PUT':
+                id_ = resources[i].id = request.id
+
+            else:
+                continue
+
+            if entry.fullUrl is not None:
+                mapping[str(entry.fullUrl)] = '{}/{}'.format(request.type, id_)
+
+        for resource in resources:
+            if resource is not None:
+                bundles.rewrite_references(resource, mapping)
+
+        def pending(method):
+            return [
+                i for i, request in enumerate(requests)
+                if request.method == method and responses[i] is None
+            ]
+
+        deletes, creates, updates = pending('DELETE'), pending('POST'), pending('PUT')
+        written = [(requests[i].type, requests[i].id) for i in deletes + updates]
+        versions = dict()
+
+        try:
+            for i in deletes:
+                request = requests[i]
+                current = _version(request.if_match)
+
+                if current is None:
+                    current = self._current_version(session, request.type, request.id)
+
+                self._delete(session, request.type, request.id, current, now)
+                responses[i] = bundles.response_entry('204 No Content')
+
+            created = self._insert(session, [resources[i] for i in creates], now)
+            versions.update(zip(creates, created))
+
+            for i in updates:
+                request = requests[i]
+                current = _version(request.if_match)
+
+                if current is None:
+                    current = self._current_version(session, request.type, request.id)
+
+                versions[i] = self._put(session, resources[i], current, now)
+
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            for type_, id_ in written:
+                self.cache.invalidate(type_, id_)
+
+        for entry, resource in zip(entries, resources):
+            if resource is not None:
+                entry.resource.id = resource.id
+                bundles.rewrite_references(entry.resource, mapping)
+
+        for i, version in versions.items():
+            request, resource = requests[i], entries[i].resource
+            _set_meta(resource, version, now)
+
+            status = '201 Created' if request.method == 'POST' or version == 1 else '200 OK'
+            responses[i] = bundles.response_entry(
+                status, request.type, resource.id, version, _instant(now)
+            )
 
-    def put(self, resource):
-        """Update a Resource in the database."""
-        pass
+        # Reads see the result of the transaction.
+        for i in pending('GET'):
+            responses[i] = self._read(requests[i])
 
-    def delete(self, resource):
-        """Delete a Resource from the database."""
-        pass
+        return responses
 # class FHIRStore
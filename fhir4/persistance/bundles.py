@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""Helpers for processing transaction and batch Bundles.
+
+See FHIRStore.process_bundle(). This module deals with the Bundle side:
+parsing Entry.request, rewriting references between entries and building
+the entries of the response Bundle.
+"""
+import collections
+import re
+import urllib.parse
+
+import fhir.model
+from fhir.model.bundle import Entry, Response
+from fhir.model.operationoutcome import Issue
+
+from .references import walk
+
+__author__ = "Melle Sieswerda"
+__copyright__  = "Copyright 2017, Melle Sieswerda"
+__license__ = "GPL"
+__version__ = "0.8"
+
+__all__ = [
+    'InvalidBundleError',
+    'Request',
+    'parse_request',
+    'references',
+    'rewrite_references',
+    'response_entry',
+    'searchset',
+    'error_entry',
+]
+
+# Order in which a transaction processes its entries.
+METHODS = ['DELETE', 'POST', 'PUT', 'GET']
+
+_url = re.compile(
+    r'(?:.*/)?(?P<type>[A-Z][A-Za-z]+)'
+    r'(?:/(?P<id>[A-Za-z0-9\-\.]{1,64})(?:/_history/(?P<version>[0-9]+))?)?'
+    r'(?:\?(?P<query>.*))?'
+)
+
+Request = collections.namedtuple('Request', [
+    'method', 'type', 'id', 'version', 'params', 'if_match', 'if_none_exist',
+])
+
+
+class InvalidBundleError(ValueError):
+    def __init__(self, description):
+        super(InvalidBundleError, self).__init__(description)
+# class InvalidBundleError
+
+
+def _params(query):
+    """Return search parameters {name: value or [values]} for a query string."""
+    params = dict()
+
+    for name, value in urllib.parse.parse_qsl(query or '', keep_blank_values=True):
+        if name in params:
+            if not isinstance(params[name], list):
+                params[name] = [params[name]]
+
+            params[name].append(value)
+        else:
+            params[name] = value
+
+    return params
+
+
+def parse_request(entry):
+    """Return the Request for an Entry.
+
+    Supported are 'POST Type' (optionally with ifNoneExist), 'PUT Type/id',
+    'DELETE Type/id' (both optionally with ifMatch) and 'GET' of
+    'Type/id', 'Type/id/_history/version' or 'Type?query'.
+    """
+    if entry.request is None:
+        raise InvalidBundleError('Entry without request')
+
+    method = str(entry.request.method).upper()
+    match = _url.fullmatch(str(entry.request.url))
+
+    if method not in METHODS or match is None:
+        msg = "Unsupported request '{} {}'"
+        raise InvalidBundleError(msg.format(method, entry.request.url))
+
+    type_, id_, version, query = match.group('type', 'id', 'version', 'query')
+
+    if method in ('PUT', 'DELETE') and (id_ is None or query is not None):
+        msg = "{} needs a url 'Type/id' (conditional requests are not supported)"
+        raise InvalidBundleError(msg.format(method))
+
+    if method in ('POST', 'PUT'):
+        if entry.resource is None:
+            raise InvalidBundleError('{} without resource'.format(method))
+
+        if entry.resource.__class__.__name__ != type_:
+            msg = "Cannot {} a {} to '{}'"
+            raise InvalidBundleError(msg.format(method, entry.resource.__class__.__name__, entry.request.url))
+
+    if_match = entry.request.ifMatch
+    if_none_exist = entry.request.ifNoneExist
+
+    return Request(
+        method,
+        type_,
+        id_,
+        version,
+        _params(query),
+        str(if_match) if if_match is not None else None,
+        _params(str(if_none_exist)) if if_none_exist is not None else None,
+    )
+
+
+def references(element):
+    """Yield all References in a Resource or Element."""
+    for path, reference in walk(element):
+        yield reference
+
+
+def rewrite_references(resource, mapping):
+    """Replace references that are keys in mapping by their value.
+
+    Returns the number of References that were changed.
+    """
+    count = 0
+
+    for reference in references(resource):
+        if reference.reference is not None and str(reference.reference) in mapping:
+            reference.reference = mapping[str(reference.reference)]
+            count += 1
+
+    return count
+
+
+def response_entry(status, type_=None, id_=None, version=None, last_modified=None,
+                   resource=None):
+    """Return an Entry for the response Bundle.
+
+    :param str status: HTTP status, e.g. '201 Created'.
+    :param last_modified: instant of the version (str).
+    """
+    response = Response(status=status)
+
+    if version is not None:
+        response.location = '{}/{}/_history/{}'.format(type_, id_, version)
+        response.etag = 'W/"{}"'.format(version)
+
+    if last_modified is not None:
+        response.lastModified = str(last_modified)
+
+    return Entry(resource=resource, response=response)
+
+
+def searchset(resources):
+    """Return a Bundle of type 'searchset' with resources."""
+    return fhir.model.Bundle(
+        type='searchset',
+        total=len(resources),
+        entry=[Entry(resource=resource) for resource in resources],
+    )
+
+
+def error_entry(status, exception):
+    """Return an Entry with an OperationOutcome that describes exception."""
+    outcome = fhir.model.OperationOutcome(issue=[Issue(
+        severity='error',
+        code='processing',
+        diagnostics=str(exception),
+    )])
+
+    return Entry(response=Response(status=status, outcome=outcome))
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""Bounded LRU cache for Resources read by FHIRStore.
+
+Entries are keyed by (type, id, version), so a cached Resource is only used
+for the version it was read as. Resources are kept pickled: every hit
+returns a fresh copy (unpickling is an order of magnitude cheaper than
+parsing), so callers can modify what they get without affecting the cache.
+The cache can be shared between threads.
+"""
+import pickle
+import threading
+from collections import OrderedDict, namedtuple
+
+__author__ = "Melle Sieswerda"
+__copyright__  = "Copyright 2017, Melle Sieswerda"
+__license__ = "GPL"
+__version__ = "0.8"
+
+__all__ = ['CacheInfo', 'ResourceCache']
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class ResourceCache(object):
+    """LRU cache of Resources keyed by (type, id, version)."""
+
+    def __init__(self, maxsize=1024):
+        """Create a new cache that holds at most maxsize Resources.
+
+        A maxsize of 0 disables the cache.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        # (type, id) --> version of the entry in the cache.
+        self._versions = dict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return (a copy of) the Resource for key or None."""
+        with self._lock:
+            data = self._entries.get(key)
+
+            if data is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        return pickle.loads(data)
+
+    def miss(self, count=1):
+        """Record misses for Resources that were not looked up with get(),
+        e.g. because the cache was empty.
+        """
+        with self._lock:
+            self.misses += count
+
+    def put(self, key, resource):
+        """Store a Resource; replaces other versions of the same Resource."""
+        if not self.maxsize:
+            return
+
+        data = pickle.dumps(resource, pickle.HIGHEST_PROTOCOL)
+
+        with self._lock:
+            self._invalidate(*key[:2])
+            self._entries[key] = data
+            self._versions[key[:2]] = key[2]
+
+            while len(self._entries) > self.maxsize:
+                evicted, data = self._entries.popitem(last=False)
+                del self._versions[evicted[:2]]
+
+    def invalidate(self, type_, id_):
+        """Remove the Resource type_/id_ (any version) from the cache."""
+        with self._lock:
+            self._invalidate(type_, id_)
+
+    def _invalidate(self, type_, id_):
+        if (type_, id_) in self._versions:
+            version = self._versions.pop((type_, id_))
+            del self._entries[(type_, id_, version)]
+
+    def clear(self):
+        """Remove all entries and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self.hits = self.misses = 0
+
+    def info(self):
+        """Return the statistics as CacheInfo(hits, misses, maxsize, currsize)."""
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+# class ResourceCache
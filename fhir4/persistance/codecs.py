@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""Codecs used by FHIRStore to (de)serialize stored Resources.
+
+Every row records the codec it was written with, so the codec of a store
+can be changed without making existing rows unreadable:
+
+    >>> from fhir.persistance import codecs
+    >>> codec = codecs.get_codec('json+zlib')
+    >>> data = codec.encode(patient)
+    >>> codec.decode(data, fhir.model.Patient)
+
+Available are 'xml' (pretty printed, as written by earlier versions),
+'json' (compact), 'json+zlib', 'json+zstd' (requires zstandard) and
+'pickle'. The latter is the fastest to decode, but ties the stored data to
+the model's classes and must only be used for trusted databases: decoding
+a pickle can run arbitrary code. Codecs in UNSAFE are therefore only
+returned by get_codec() if explicitly trusted:
+
+    >>> codecs.get_codec('pickle', trusted=['pickle'])
+"""
+import pickle
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+import fhir.model
+from fhir.model import json_loads, json_dumps
+
+__author__ = "Melle Sieswerda"
+__copyright__  = "Copyright 2017, Melle Sieswerda"
+__license__ = "GPL"
+__version__ = "0.8"
+
+__all__ = [
+    'UnsupportedCodecError',
+    'UntrustedCodecError',
+    'XMLCodec',
+    'JSONCodec',
+    'ZlibCodec',
+    'ZstdCodec',
+    'PickleCodec',
+    'available_codecs',
+    'get_codec',
+]
+
+
+class UnsupportedCodecError(Exception):
+    def __init__(self, name):
+        message = "The storage codec '{}' is not available!".format(name)
+        super(UnsupportedCodecError, self).__init__(message)
+# class UnsupportedCodecError
+
+
+class UntrustedCodecError(Exception):
+    def __init__(self, name):
+        message = "The storage codec '{}' is unsafe and not trusted!".format(name)
+        super(UntrustedCodecError, self).__init__(message)
+# class UntrustedCodecError
+
+
+class XMLCodec(object):
+    """Pretty printed XML, i.e. the output of Resource.toXML()."""
+    name = 'xml'
+
+    def encode(self, resource):
+        return resource.toXML().encode('utf-8')
+
+    def decode(self, data, cls):
+        return cls.fromXML(bytes(data).decode('utf-8'))
+# class XMLCodec
+
+
+class JSONCodec(object):
+    """Compact JSON (no whitespace)."""
+    name = 'json'
+
+    def encode(self, resource):
+        jsonstring = json_dumps(resource.toDict(), indent=None, separators=(',', ':'))
+        return jsonstring.encode('utf-8')
+
+    def decode(self, data, cls):
+        return cls._fromNative(json_loads(bytes(data)))
+# class JSONCodec
+
+
+class ZlibCodec(JSONCodec):
+    """Compact JSON, compressed with zlib."""
+    name = 'json+zlib'
+    level = 6
+
+    def encode(self, resource):
+        return zlib.compress(super().encode(resource), self.level)
+
+    def decode(self, data, cls):
+        return super().decode(zlib.decompress(data), cls)
+# class ZlibCodec
+
+
+class ZstdCodec(JSONCodec):
+    """Compact JSON, compressed with Zstandard."""
+    name = 'json+zstd'
+    level = 3
+
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=self.level)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def encode(self, resource):
+        return self._compressor.compress(super().encode(resource))
+
+    def decode(self, data, cls):
+        return super().decode(self._decompressor.decompress(data), cls)
+# class ZstdCodec
+
+
+class PickleCodec(object):
+    """Pickled Resources; fast, but only for trusted databases."""
+    name = 'pickle'
+
+    def encode(self, resource):
+        return pickle.dumps(resource, pickle.HIGHEST_PROTOCOL)
+
+    def decode(self, data, cls):
+        return pickle.loads(data)
+# class PickleCodec
+
+
+CODECS = {
+    'xml': XMLCodec,
+    'json': JSONCodec,
+    'json+zlib': ZlibCodec,
+    'json+zstd': ZstdCodec,
+    'pickle': PickleCodec,
+}
+
+# Codecs that can run arbitrary code when decoding.
+UNSAFE = {'pickle'}
+
+_instances = dict()
+
+
+def available_codecs():
+    """Return the names of the codecs that can be used."""
+    names = ['json', 'json+zlib', 'json+zstd', 'pickle', 'xml']
+
+    if zstandard is None:
+        names.remove('json+zstd')
+
+    return names
+
+
+def get_codec(name, trusted=()):
+    """Return the codec called 'name'.
+
+    :param trusted: names of the codecs in UNSAFE that may be returned.
+    """
+    if name not in available_codecs():
+        raise UnsupportedCodecError(name)
+
+    if name in UNSAFE and name not in trusted:
+        raise UntrustedCodecError(name)
+
+    if name not in _instances:
+        _instances[name] = CODECS[name]()
+
+    return _instances[name]
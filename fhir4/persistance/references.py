@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""Index of the references between stored Resources.
+
+When a Resource is stored, every Reference it contains (at any depth,
+including contained Resources) that points at 'Type/id' is written to the
+resource_link table as (source, path, target). Absolute references are
+only included if they point at this server, i.e. start with its base URL
+(see FHIRStore):
+
+    >>> extract(observation)
+    [{'source_type': 'Observation', 'source_id': 'o1', 'path': 'subject',
+      'target_type': 'Patient', 'target_id': '123'}, ...]
+
+The table is indexed on both ends, so finding what a Resource refers to, or
+what refers to it, does not require loading any Resources. See
+FHIRStore.include(), revinclude(), referrers(), dangling_references() and
+everything().
+"""
+import collections
+import re
+
+from sqlalchemy import Column, Integer, String, Index
+
+import fhir.model
+
+from . import Base
+
+__author__ = "Melle Sieswerda"
+__copyright__  = "Copyright 2017, Melle Sieswerda"
+__license__ = "GPL"
+__version__ = "0.8"
+
+__all__ = [
+    'ResourceLink',
+    'Link',
+    'walk',
+    'parse_url',
+    'parse',
+    'extract',
+]
+
+# Relative URL of a Resource, optionally with version, and optionally
+# preceded by the base URL of a server.
+_reference = re.compile(
+    r'(?:(?P<base>.+)/)?(?P<type>[A-Z][A-Za-z]+)/(?P<id>[A-Za-z0-9\-\.]{1,64})'
+    r'(?:/_history/[^/]+)?'
+)
+
+Link = collections.namedtuple('Link', [
+    'source_type', 'source_id', 'path', 'target_type', 'target_id',
+])
+
+
+class ResourceLink(Base):
+    """A reference from one Resource (source) to another (target)."""
+    __tablename__ = 'resource_link'
+
+    _id = Column(Integer, primary_key=True)
+
+    source_type = Column(String(50), nullable=False)
+    source_id = Column(String(64), nullable=False)
+
+    # Dotted property path of the Reference, e.g. 'context.encounter'.
+    path = Column(String(255), nullable=False)
+
+    target_type = Column(String(50), nullable=False)
+    target_id = Column(String(64), nullable=False)
+
+    __table_args__ = (
+        Index('ix_resource_link_target', 'target_type', 'target_id', 'source_type'),
+        Index('ix_resource_link_source', 'source_type', 'source_id'),
+    )
+
+    def toLink(self):
+        return Link(self.source_type, self.source_id, self.path,
+                    self.target_type, self.target_id)
+# class ResourceLink
+
+
+def walk(element, path=None):
+    """Yield (path, Reference) for all References in a Resource or Element.
+
+    Only properties that have a value are visited; lists are flattened, so
+    the path does not contain indices.
+    """
+    for name, value in element._property_values.items():
+        child = name if path is None else path + '.' + name
+        values = value if isinstance(value, list) else [value]
+
+        for value in values:
+            if isinstance(value, fhir.model.Reference):
+                yield child, value
+            elif isinstance(value, fhir.model.FHIRBase) \
+                    and not isinstance(value, fhir.model.BaseType):
+                yield from walk(value, child)
+
+
+def parse_url(url, base=None):
+    """Return (type, id) for the URL of a Resource on this server or None.
+
+    Relative URLs ('Patient/123', optionally with '/_history/2') are on
+    this server; absolute URLs only if their base is 'base', e.g.
+    'http://example.org/fhir'.
+    """
+    match = _reference.fullmatch(url)
+
+    if match is None:
+        return None
+
+    if match.group('base') is not None:
+        if base is None or match.group('base') != base.rstrip('/'):
+            return None
+
+    return match.group('type', 'id')
+
+
+def parse(reference, base=None):
+    """Return (type, id) of a Reference or None if it is not 'Type/id'.
+
+    Local ('#...') and logical (identifier only) references give None, as
+    do absolute references to other servers; see parse_url().
+    """
+    if reference.reference is None:
+        return None
+
+    return parse_url(str(reference.reference), base)
+
+
+def extract(resource, base=None):
+    """Return the rows for ResourceLink for a Resource.
+
+    :param str base: base URL of this server; see parse_url().
+    """
+    type_, id_ = resource.__class__.__name__, str(resource.id)
+    rows = []
+
+    for path, reference in walk(resource):
+        target = parse(reference, base)
+
+        if target is not None:
+            rows.append(dict(
+                source_type=type_,
+                source_id=id_,
+                path=path,
+                target_type=target[0],
+                target_id=target[1],
+            ))
+
+    return rows
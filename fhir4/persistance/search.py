@@ -0,0 +1,549 @@
+# -*- coding: utf-8 -*-
+"""Search parameters: extraction at write time and translation to SQL.
+
+When a Resource is stored, the values of its search parameters (see
+SEARCH_PARAMETERS) are written to indexed side tables, one per kind of
+parameter:
+
+ * token: (system, code), e.g. from a CodeableConcept or Identifier
+ * string: normalized (lower case, without accents) text
+ * date: the interval [low, high) in microseconds since the epoch
+ * reference: (type, id) of the referenced Resource
+ * quantity: value and unit, plus the value in its canonical UCUM unit
+
+FHIRStore.search() combines conditions on these tables, so searching does
+not require loading (and parsing) the stored Resources.
+"""
+import functools
+import re
+import unicodedata
+
+from sqlalchemy import Column, Integer, BigInteger, Float, String, Index
+from sqlalchemy import and_, or_, not_
+
+import fhir.model
+from fhir.model import dateTimeBase, dateTime, ucum
+
+from . import Base
+from .references import parse_url
+
+__author__ = "Melle Sieswerda"
+__copyright__  = "Copyright 2017, Melle Sieswerda"
+__license__ = "GPL"
+__version__ = "0.8"
+
+__all__ = [
+    'SEARCH_PARAMETERS',
+    'UnknownSearchParameterError',
+    'InvalidSearchValueError',
+    'TokenIndex',
+    'StringIndex',
+    'DateIndex',
+    'ReferenceIndex',
+    'QuantityIndex',
+    'extract',
+]
+
+# Lowest and highest moments that can be stored; used for open ended Periods.
+MIN_MOMENT = -2**63
+MAX_MOMENT = 2**63 - 1
+
+# Search parameters by type: {name: (kind, property path[, target type])}
+# The (optional) target type restricts a reference parameter, e.g. an
+# Observation's 'patient' is its 'subject', if that is a Patient.
+SEARCH_PARAMETERS = {
+    'Patient': {
+        'identifier': ('token', 'identifier'),
+        'active': ('token', 'active'),
+        'gender': ('token', 'gender'),
+        'name': ('string', 'name'),
+        'family': ('string', 'name.family'),
+        'given': ('string', 'name.given'),
+        'address': ('string', 'address'),
+        'birthdate': ('date', 'birthDate'),
+        'general-practitioner': ('reference', 'generalPractitioner'),
+        'organization': ('reference', 'managingOrganization'),
+    },
+    'Observation': {
+        'identifier': ('token', 'identifier'),
+        'status': ('token', 'status'),
+        'category': ('token', 'category'),
+        'code': ('token', 'code'),
+        'component-code': ('token', 'component.code'),
+        'subject': ('reference', 'subject'),
+        'patient': ('reference', 'subject', 'Patient'),
+        'encounter': ('reference', 'encounter'),
+        'performer': ('reference', 'performer'),
+        'date': ('date', 'effective'),
+        'value-quantity': ('quantity', 'value'),
+    },
+    'Encounter': {
+        'identifier': ('token', 'identifier'),
+        'status': ('token', 'status'),
+        'class': ('token', 'class_'),
+        'type': ('token', 'type'),
+        'subject': ('reference', 'subject'),
+        'patient': ('reference', 'subject', 'Patient'),
+        'episode-of-care': ('reference', 'episodeOfCare'),
+        'location': ('reference', 'location.location'),
+        'service-provider': ('reference', 'serviceProvider'),
+        'part-of': ('reference', 'partOf'),
+        'date': ('date', 'period'),
+    },
+    'EpisodeOfCare': {
+        'identifier': ('token', 'identifier'),
+        'status': ('token', 'status'),
+        'type': ('token', 'type'),
+        'patient': ('reference', 'patient'),
+        'organization': ('reference', 'managingOrganization'),
+        'care-manager': ('reference', 'careManager'),
+        'date': ('date', 'period'),
+    },
+    'MedicationRequest': {
+        'identifier': ('token', 'identifier'),
+        'status': ('token', 'status'),
+        'intent': ('token', 'intent'),
+        'category': ('token', 'category'),
+        'code': ('token', 'medication'),
+        'medication': ('reference', 'medication'),
+        'subject': ('reference', 'subject'),
+        'patient': ('reference', 'subject', 'Patient'),
+        'encounter': ('reference', 'encounter'),
+        'requester': ('reference', 'requester'),
+        'authoredon': ('date', 'authoredOn'),
+    },
+    'Composition': {
+        'identifier': ('token', 'identifier'),
+        'status': ('token', 'status'),
+        'type': ('token', 'type'),
+        'category': ('token', 'category'),
+        'subject': ('reference', 'subject'),
+        'patient': ('reference', 'subject', 'Patient'),
+        'encounter': ('reference', 'encounter'),
+        'author': ('reference', 'author'),
+        'entry': ('reference', 'section.entry'),
+        'title': ('string', 'title'),
+        'date': ('date', 'date'),
+    },
+}
+
+_prefix = re.compile(r'(?P<prefix>eq|ne|gt|lt|ge|le|sa|eb|ap)?(?P<value>.*)')
+
+
+class UnknownSearchParameterError(ValueError):
+    def __init__(self, type_, name):
+        message = "'{}' is not a supported search parameter for {}!".format(name, type_)
+        super(UnknownSearchParameterError, self).__init__(message)
+# class UnknownSearchParameterError
+
+
+class InvalidSearchValueError(ValueError):
+    def __init__(self, name, value):
+        message = "'{}' is not a valid value for the search parameter '{}'!".format(value, name)
+        super(InvalidSearchValueError, self).__init__(message)
+# class InvalidSearchValueError
+
+
+# ------------------------------------------------------------------------------
+# Index tables
+# ------------------------------------------------------------------------------
+class IndexMixin(object):
+    """Columns shared by all index tables."""
+    _id = Column(Integer, primary_key=True)
+    resource_type = Column(String(50), nullable=False)
+    resource_id = Column(String(64), nullable=False)
+    param = Column(String(64), nullable=False)
+# class IndexMixin
+
+
+class TokenIndex(IndexMixin, Base):
+    system = Column(String(255))
+    code = Column(String(255))
+
+    __table_args__ = (
+        Index('ix_tokenindex_search', 'resource_type', 'param', 'code', 'system'),
+        Index('ix_tokenindex_resource', 'resource_type', 'resource_id'),
+    )
+# class TokenIndex
+
+
+class StringIndex(IndexMixin, Base):
+    value = Column(String(255))
+
+    __table_args__ = (
+        Index('ix_stringindex_search', 'resource_type', 'param', 'value'),
+        Index('ix_stringindex_resource', 'resource_type', 'resource_id'),
+    )
+# class StringIndex
+
+
+class DateIndex(IndexMixin, Base):
+    low = Column(BigInteger)
+    high = Column(BigInteger)
+
+    __table_args__ = (
+        Index('ix_dateindex_search', 'resource_type', 'param', 'low', 'high'),
+        Index('ix_dateindex_resource', 'resource_type', 'resource_id'),
+    )
+# class DateIndex
+
+
+class ReferenceIndex(IndexMixin, Base):
+    target_type = Column(String(50))
+    target_id = Column(String(64))
+
+    __table_args__ = (
+        Index('ix_referenceindex_search', 'resource_type', 'param', 'target_id', 'target_type'),
+        Index('ix_referenceindex_resource', 'resource_type', 'resource_id'),
+    )
+# class ReferenceIndex
+
+
+class QuantityIndex(IndexMixin, Base):
+    value = Column(Float)
+    system = Column(String(255))
+    code = Column(String(64))
+    canonical_value = Column(Float)
+    canonical_code = Column(String(64))
+
+    __table_args__ = (
+        Index('ix_quantityindex_search', 'resource_type', 'param', 'code', 'value'),
+        Index('ix_quantityindex_canonical', 'resource_type', 'param', 'canonical_code', 'canonical_value'),
+        Index('ix_quantityindex_resource', 'resource_type', 'resource_id'),
+    )
+# class QuantityIndex
+
+
+TABLES = {
+    'token': TokenIndex,
+    'string': StringIndex,
+    'date': DateIndex,
+    'reference': ReferenceIndex,
+    'quantity': QuantityIndex,
+}
+
+
+# ------------------------------------------------------------------------------
+# Extraction
+# ------------------------------------------------------------------------------
+def _resolve(resource, path):
+    """Return the (non empty) values found by following a dotted path."""
+    values = [resource]
+
+    for name in path.split('.'):
+        found = []
+
+        for value in values:
+            value = getattr(value, name, None)
+
+            if isinstance(value, list):
+                found.extend(v for v in value if v is not None)
+            elif value is not None:
+                found.append(value)
+
+        values = found
+
+    return values
+
+
+def normalize(string):
+    """Return string in lower case, without accents and surrounding space."""
+    string = unicodedata.normalize('NFKD', str(string))
+    string = ''.join(c for c in string if not unicodedata.combining(c))
+    return string.strip().lower()[:255]
+
+
+def _str(value):
+    return str(value) if value is not None and value.value is not None else None
+
+
+def _tokens(value):
+    if isinstance(value, fhir.model.CodeableConcept):
+        return [dict(system=_str(c.system), code=_str(c.code)) for c in value.coding]
+
+    if isinstance(value, fhir.model.Coding):
+        return [dict(system=_str(value.system), code=_str(value.code))]
+
+    if isinstance(value, fhir.model.Identifier):
+        return [dict(system=_str(value.system), code=_str(value.value))]
+
+    if isinstance(value, fhir.model.BaseType) and value.value is not None:
+        return [dict(system=None, code=str(value))]
+
+    return []
+
+
+def _strings(value):
+    if isinstance(value, fhir.model.HumanName):
+        parts = [value.text, value.family] + value.given + value.prefix + value.suffix
+    elif isinstance(value, fhir.model.Address):
+        parts = [value.text] + value.line + [
+            value.city, value.district, value.state, value.postalCode, value.country
+        ]
+    elif isinstance(value, fhir.model.BaseType):
+        parts = [value]
+    else:
+        parts = []
+
+    return [dict(value=normalize(p)) for p in parts if p is not None and p.value is not None]
+
+
+def _dates(value):
+    if isinstance(value, dateTimeBase):
+        if value.parts is None or value.parts.year is None:
+            return []
+
+        low, high = value.key
+
+    elif isinstance(value, fhir.model.Period):
+        low, high = value.bounds()
+        low = low if low is not None else MIN_MOMENT
+        high = high if high is not None else MAX_MOMENT
+
+    else:
+        return []
+
+    return [dict(low=low, high=high)]
+
+
+def _references(value, target_type=None, base=None):
+    if not isinstance(value, fhir.model.Reference) or value.reference is None:
+        return []
+
+    target = parse_url(str(value.reference), base)
+
+    if target is None or target_type not in (None, target[0]):
+        return []
+
+    return [dict(target_type=target[0], target_id=target[1])]
+
+
+def _canonical(value, code):
+    """Return (value, code) in the canonical UCUM unit, or (None, None)."""
+    try:
+        unit = ucum.parse_unit(code)
+    except (ucum.UnknownUnitError, ValueError):
+        return None, None
+
+    return unit.toCanonical(value), unit.canonical
+
+
+def _quantities(value):
+    if not isinstance(value, fhir.model.Quantity) or value.value is None:
+        return []
+
+    code = _str(value.code) or _str(value.unit)
+    system = _str(value.system)
+    row = dict(value=float(value.value), system=system, code=code,
+               canonical_value=None, canonical_code=None)
+
+    if code is not None and system in (None, ucum.UCUM):
+        row['canonical_value'], row['canonical_code'] = _canonical(row['value'], code)
+
+    return [row]
+
+
+EXTRACTORS = {
+    'token': _tokens,
+    'string': _strings,
+    'date': _dates,
+    'reference': _references,
+    'quantity': _quantities,
+}
+
+
+def extract(resource, base=None):
+    """Return the index rows for a Resource: {table: [dict, ...]}.
+
+    :param str base: base URL of this server; absolute references are only
+        indexed if they start with it (see references.parse_url()).
+    """
+    type_ = resource.__class__.__name__
+    id_ = str(resource.id)
+    rows = dict()
+
+    for name, definition in SEARCH_PARAMETERS.get(type_, {}).items():
+        kind, path = definition[:2]
+        extractor = EXTRACTORS[kind]
+        args = definition[2:]
+
+        if kind == 'reference':
+            extractor = functools.partial(extractor, base=base)
+
+        for value in _resolve(resource, path):
+            for row in extractor(value, *args):
+                row.update(resource_type=type_, resource_id=id_, param=name)
+                rows.setdefault(TABLES[kind], []).append(row)
+
+    return rows
+
+
+# ------------------------------------------------------------------------------
+# Search
+# ------------------------------------------------------------------------------
+def _token_condition(table, value, modifier):
+    if '|' not in value:
+        return table.code == value
+
+    system, code = value.split('|', 1)
+    conditions = []
+
+    if code:
+        conditions.append(table.code == code)
+
+    conditions.append(table.system == system if system else table.system == None)
+    return and_(*conditions)
+
+
+def _string_condition(table, value, modifier):
+    value = normalize(value)
+
+    if modifier == 'exact':
+        return table.value == value
+
+    if modifier == 'contains':
+        return table.value.contains(value, autoescape=True)
+
+    return table.value.startswith(value, autoescape=True)
+
+
+def _date_condition(table, value, modifier):
+    prefix, value = _prefix.fullmatch(value).groups()
+    low, high = dateTime(value).key
+
+    # Intervals are half open: [low, high)
+    conditions = {
+        'eq': and_(table.low >= low, table.high <= high),
+        'ne': not_(and_(table.low >= low, table.high <= high)),
+        'gt': table.high > high,
+        'lt': table.low < low,
+        'ge': table.high > low,
+        'le': table.low < high,
+        'sa': table.low >= high,
+        'eb': table.high <= low,
+        'ap': and_(table.low < high, table.high > low),
+    }
+
+    return conditions[prefix or 'eq']
+
+
+def _number_condition(column, prefix, number, unit=None):
+    """Return the condition for a number (decimal_) on a column.
+
+    If a ucum.Unit is given, the column holds values in its canonical unit.
+    """
+    convert = unit.toCanonical if unit is not None else float
+    unscaled, scale = number.scaled
+
+    # A number implies a range based on its precision: 5.4 is [5.35, 5.45)
+    low = convert((unscaled - 0.5) * 10.0 ** -scale)
+    high = convert((unscaled + 0.5) * 10.0 ** -scale)
+    value = convert(float(number))
+    margin = abs(value) / 10
+
+    conditions = {
+        'eq': and_(column >= low, column < high),
+        'ne': or_(column < low, column >= high),
+        'gt': column > value,
+        'lt': column < value,
+        'ge': column >= value,
+        'le': column <= value,
+        'sa': column > value,
+        'eb': column < value,
+        'ap': and_(column >= value - margin, column <= value + margin),
+    }
+
+    return conditions[prefix or 'eq']
+
+
+def _quantity_condition(table, value, modifier):
+    number, system, code = (value.split('|') + [None, None])[:3]
+    prefix, number = _prefix.fullmatch(number).groups()
+    number = fhir.model.decimal(number).value
+
+    if code and system in ('', None, ucum.UCUM):
+        try:
+            unit = ucum.parse_unit(code)
+        except (ucum.UnknownUnitError, ValueError):
+            unit = None
+
+        if unit is not None:
+            return and_(
+                table.canonical_code == unit.canonical,
+                _number_condition(table.canonical_value, prefix, number, unit),
+            )
+
+    conditions = [_number_condition(table.value, prefix, number)]
+
+    if code:
+        conditions.append(table.code == code)
+
+    if system:
+        conditions.append(table.system == system)
+
+    return and_(*conditions)
+
+
+def _reference_condition(table, value, modifier, base=None):
+    target = parse_url(value, base)
+
+    if target is None:
+        return table.target_id == value
+
+    return and_(
+        table.target_id == target[1],
+        table.target_type == target[0],
+    )
+
+
+CONDITIONS = {
+    'token': _token_condition,
+    'string': _string_condition,
+    'date': _date_condition,
+    'reference': _reference_condition,
+    'quantity': _quantity_condition,
+}
+
+
+def parameter(type_, key):
+    """Return (name, modifier, kind, table) for a keyword like 'value_quantity'.
+
+    Underscores in keywords are read as dashes ('value_quantity' means
+    'value-quantity'); a modifier follows a colon ('name:exact').
+    """
+    name, _, modifier = key.partition(':')
+    name = name.replace('_', '-')
+
+    if name not in SEARCH_PARAMETERS.get(type_, {}):
+        raise UnknownSearchParameterError(type_, name)
+
+    kind = SEARCH_PARAMETERS[type_][name][0]
+    return name, modifier or None, kind, TABLES[kind]
+
+
+def condition(type_, key, value, base=None):
+    """Return a condition on Resource ids for a single search parameter.
+
+    'value' is a str, in which commas separate alternatives (OR), or a list
+    of str that must all match (AND). 'base' is the base URL of this server
+    (see extract()).
+    """
+    name, modifier, kind, table = parameter(type_, key)
+    values = [value] if isinstance(value, str) else value
+    make_condition = CONDITIONS[kind]
+    conditions = []
+
+    if kind == 'reference':
+        make_condition = functools.partial(make_condition, base=base)
+
+    for value in values:
+        try:
+            alternatives = [
+                make_condition(table, v, modifier) for v in value.split(',')
+            ]
+        except (ValueError, TypeError, AttributeError):
+            raise InvalidSearchValueError(name, value)
+
+        conditions.append(or_(*alternatives))
+
+    return table, name, conditions
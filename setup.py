@@ -41,6 +41,10 @@ setup(
         'termcolor',
         'xmldiff',
     ],
+    extras_require={
+        'lxml': ['lxml'],
+        'numpy': ['numpy'],
+    },
     package_data={},
     entry_points={},
 )
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import unittest
+import datetime as dt
+
+import fhir.model
+from fhir.model import Encounter, Period, Identifier, IntervalIndex
+
+
+def encounter(id_, start=None, end=None):
+    return Encounter(id=id_, period=Period(start=start, end=end))
+
+
+def ids(resources):
+    return [str(r.id) for r in resources]
+
+
+class TestIntervalIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.encounters = [
+            encounter('a', '2017-01-01T08:00:00Z', '2017-01-01T10:00:00Z'),
+            encounter('b', '2017-01-01', '2017-01-03'),
+            encounter('c', '2016-12-01'),                 # still active
+            encounter('d', None, '2016-12-31'),           # no known start
+            encounter('e', '2017-02'),
+            Encounter(id='f'),                            # no period
+        ]
+        self.index = IntervalIndex(self.encounters, 'period')
+
+    def test_len(self):
+        self.assertEqual(len(self.index), 5)
+        self.assertEqual(len(IntervalIndex([])), 0)
+        self.assertEqual(IntervalIndex([]).at('2017'), [])
+
+    def test_at(self):
+        index = self.index
+
+        self.assertEqual(ids(index.at('2017-01-01T09:00:00Z')), ['c', 'b', 'a'])
+        self.assertEqual(ids(index.at('2017-01-01T10:00:00Z')), ['c', 'b', 'a'])
+        self.assertEqual(ids(index.at('2017-01-01T10:00:01Z')), ['c', 'b'])
+
+        # The end of a Period is inclusive at its precision.
+        self.assertEqual(ids(index.at('2017-01-03T23:59:59Z')), ['c', 'b'])
+        self.assertEqual(ids(index.at('2016-12-31')), ['d', 'c'])
+        self.assertEqual(ids(index.at('1900')), ['d'])
+        self.assertEqual(ids(index.at('2030')), ['c', 'e'])
+
+        # A moment of limited precision covers its full interval.
+        self.assertEqual(ids(index.at('2017-01')), ['c', 'b', 'a'])
+
+    def test_absent_bounds(self):
+        # A bound with only a data-absent-reason extension is open.
+        absent = {'extension': [{
+            'url': 'http://hl7.org/fhir/StructureDefinition/data-absent-reason',
+            'valueCode': 'unknown',
+        }]}
+        e = Encounter._fromNative({
+            'resourceType': 'Encounter',
+            'id': 'x',
+            'status': 'finished',
+            'period': {'_start': absent, 'end': '2017-01-02'},
+        })
+        self.assertEqual(e.period.bounds()[0], None)
+
+        index = IntervalIndex([e], 'period')
+        self.assertEqual(ids(index.at('1900')), ['x'])
+        self.assertEqual(ids(index.at('2017-01-03')), [])
+
+    def test_moments(self):
+        index = self.index
+        expected = ['c', 'b', 'a']
+
+        moment = dt.datetime(2017, 1, 1, 10, 30, tzinfo=dt.timezone(dt.timedelta(hours=1)))
+        self.assertEqual(ids(index.at(moment)), expected)
+        self.assertEqual(ids(index.at(dt.datetime(2017, 1, 1, 9, 30))), expected)
+        self.assertEqual(ids(index.at(dt.date(2017, 1, 2))), ['c', 'b'])
+        self.assertEqual(ids(index.at(fhir.model.dateTime('2017-01-02'))), ['c', 'b'])
+
+    def test_overlapping(self):
+        index = self.index
+
+        self.assertEqual(ids(index.overlapping('2016-11', '2016-11')), ['d'])
+        self.assertEqual(ids(index.overlapping('2017-01-02', '2017-02-01')), ['c', 'b', 'e'])
+        self.assertEqual(ids(index.overlapping(None, '2016-12-01')), ['d', 'c'])
+        self.assertEqual(ids(index.overlapping('2017-01-04')), ['c', 'e'])
+        self.assertEqual(ids(index.overlapping()), ['d', 'c', 'b', 'a', 'e'])
+
+    def test_path(self):
+        patient = fhir.model.Patient(id='p', identifier=[
+            Identifier(value='1', period=Period(start='2010', end='2012')),
+            Identifier(value='2', period=Period(start='2011')),
+        ])
+
+        index = IntervalIndex([patient], 'identifier.period')
+        self.assertEqual(len(index), 2)
+
+        # Items with several matching Periods are returned once.
+        self.assertEqual(ids(index.at('2011-06')), ['p'])
+        self.assertEqual(ids(index.at('2009')), [])
+
+        # Without a path, the items are the Periods themselves.
+        periods = [p.period for p in patient.identifier]
+        index = IntervalIndex(periods)
+        self.assertEqual([str(p.start) for p in index.at('2013')], ['2011'])
+
+    def test_many(self):
+        encounters = [
+            encounter(str(i), '2017-01-01T%02d:00:00Z' % (i % 24), '2017-01-%02dT23:00:00Z' % (1 + i % 28))
+            for i in range(500)
+        ]
+        index = IntervalIndex(encounters, 'period')
+
+        for moment in ['2017-01-01T05:30:00Z', '2017-01-15', '2017-01-28T23:00:00Z']:
+            start, end = fhir.model.dateTime(moment).key
+            expected = {
+                str(e.id) for e in encounters
+                if e.period.start.key[0] < end and start < e.period.end.key[1]
+            }
+
+            self.assertEqual(set(ids(index.at(moment))), expected)
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import unittest
+import logging
+import pickle
+
+import fhir
+import fhir.model
+
+
+class TestParallel(unittest.TestCase):
+
+    def setUp(self):
+        self.names = ['patient-example', 'bundle-example', 'patient-mom', 'bundle-references']
+
+    def test_pickle(self):
+        xmlstring = fhir.get_example_data('patient-example', 'xml')
+        p = fhir.model.Patient.fromXML(xmlstring)
+        q = pickle.loads(pickle.dumps(p))
+
+        self.assertIsInstance(q.name, fhir.model.PropertyList)
+        self.assertEqual(q.toXML(), p.toXML())
+        self.assertEqual(q.toJSON(), p.toJSON())
+
+    def test_parseManyKeepsOrder(self):
+        for format_ in ['xml', 'json']:
+            documents = [fhir.get_example_data(n, format_) for n in self.names] * 5
+            expected = [fhir.model.Resource.loads(d, format_).toJSON() for d in documents]
+
+            resources = fhir.model.parse_many(documents, format_, workers=2, chunksize=3)
+            self.assertEqual([r.toJSON() for r in resources], expected)
+
+    def test_parseManyInProcess(self):
+        documents = (fhir.get_example_data(n, 'json') for n in self.names)
+        resources = list(fhir.model.parse_many(documents, 'json', workers=0, narrative=False))
+
+        self.assertEqual(len(resources), 4)
+        self.assertIsNone(resources[0].text)
+
+    def test_unsupportedFormat(self):
+        # Invalid arguments raise at the call, not when iterating.
+        with self.assertRaises(fhir.model.UnsupportedFormatError):
+            fhir.model.parse_many([], 'yaml')
+
+        self.assertRaises(ValueError, fhir.model.parse_many, [], chunksize=0)
+        self.assertRaises(ValueError, fhir.model.parse_many, [], workers=-1)
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import unittest
+
+import fhir.model
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+@unittest.skipIf(numpy is None, 'requires numpy')
+class TestSampledData(unittest.TestCase):
+
+    def setUp(self):
+        self.sd = fhir.model.SampledData(
+            origin=fhir.model.Quantity(value=10),
+            period=2,
+            factor=0.5,
+            dimensions=2,
+            data='1 2 E 4 5 U'
+        )
+
+    def test_to_array(self):
+        a = self.sd.to_array()
+
+        self.assertEqual(a.shape, (3, 2))
+        self.assertEqual(a[0].tolist(), [10.5, 11.0])
+        self.assertTrue(numpy.isnan(a[1, 0]))
+        self.assertTrue(numpy.isnan(a[2, 1]))
+
+    def test_to_array_masked(self):
+        a = self.sd.to_array(masked=True)
+
+        self.assertEqual(a.mask.tolist(), [[False, False], [True, False], [False, True]])
+        self.assertEqual(a.sum(), 10.5 + 11 + 12 + 12.5)
+
+    def test_to_array_dimensions(self):
+        self.sd.data = '1 2 3'
+        self.assertRaises(ValueError, self.sd.to_array)
+
+    def test_to_array_invalid(self):
+        for data in ['1 2 x 4', '1 2 x', '1,2 3 4', 'E 2 x 4']:
+            self.sd.data = data
+            self.assertRaises(ValueError, self.sd.to_array)
+
+    def test_from_array(self):
+        sd = fhir.model.SampledData.from_array(
+            self.sd.to_array(masked=True),
+            period=2,
+            origin=10,
+            factor=0.5
+        )
+
+        # Markers are not kept: 'U' becomes 'E'.
+        self.assertEqual(str(sd.data), '1 2 E 4 5 E')
+        self.assertEqual(sd.dimensions, 2)
+        self.assertEqual(sd.origin.value, 10)
+
+        sd = fhir.model.SampledData.from_array([0.25, 1], period=1)
+        self.assertEqual(str(sd.data), '0.25 1.0')
+        self.assertEqual(sd.dimensions, 1)
@@ -102,6 +102,32 @@ class TestSerialization(unittest.TestCase):
         diff = jsondiff.diff(jsonstring, p.toJSON(), load=True)
         self.assertEquals(diff, {})
 
+    def test_narrativeFromXML(self):
+        """Test that narratives are passed through and can be skipped."""
+        xmlstring = fhir.get_example_data('patient-glossy', 'xml')
+        p = fhir.model.Patient.fromXML(xmlstring)
+
+        div = p.text.div
+        self.assertIsNotNone(div.toElement())
+        self.assertTrue(div.value.startswith('<div xmlns="http://www.w3.org/1999/xhtml">'))
+        self.assertTrue(div.value.endswith('</div>'))
+
+        x = ET.fromstring(p.toXML())
+        self.assertEqual(len(x.findall('.//{http://www.w3.org/1999/xhtml}p')), 2)
+
+        p = fhir.model.Patient.fromXML(xmlstring, narrative=False)
+        self.assertIsNone(p.text)
+        self.assertEqual(p.id, 'glossy')
+
+    def test_narrativeFromJSON(self):
+        jsonstring = fhir.get_example_data('patient-glossy', 'json')
+        p = fhir.model.Patient.fromJSON(jsonstring, narrative=False)
+        self.assertIsNone(p.text)
+
+        p = fhir.model.Patient.fromJSON(jsonstring)
+        x = ET.fromstring(p.toXML())
+        self.assertEqual(len(x.findall('.//{http://www.w3.org/1999/xhtml}p')), 2)
+
     def test_exampleBundleFromXML(self):
         xmlstring = fhir.get_example_data('bundle-example', 'xml')
         b = fhir.model.Bundle.fromXML(xmlstring)
@@ -156,3 +182,36 @@ class TestSerialization(unittest.TestCase):
         diff = jsondiff.diff(jsonstring, b.toJSON(), load=True)
         self.assertEquals(diff, {})
 
+    def test_loadFromPath(self):
+        """Test loading resources from files, detecting the format."""
+        for format_ in ['xml', 'json']:
+            path = fhir.get_example_path('bundle-example', format_)
+            b = fhir.model.Resource.load(path)
+
+            self.assertIsInstance(b, fhir.model.Bundle)
+            self.assertEqual(b.id, 'bundle-example')
+
+    def test_loadFromFileObject(self):
+        path = fhir.get_example_path('patient-example', 'xml')
+        expected = fhir.model.Patient.fromXML(fhir.get_example_data('patient-example', 'xml'))
+
+        with open(path, 'rb') as fp:
+            p = fhir.model.Patient.load(fp)
+
+        self.assertEqual(p.toJSON(), expected.toJSON())
+
+    def test_loadMemoryMapped(self):
+        threshold = fhir.model.MMAP_THRESHOLD
+
+        for format_ in ['xml', 'json']:
+            path = fhir.get_example_path('patient-example', format_)
+
+            try:
+                fhir.model.MMAP_THRESHOLD = 0
+                p = fhir.model.Patient.load(path, narrative=False)
+            finally:
+                fhir.model.MMAP_THRESHOLD = threshold
+
+            self.assertEqual(p.id, 'example')
+            self.assertIsNone(p.text)
+
@@ -1,6 +1,11 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function
 import unittest
+import os
+import io
+import gc
+import copy
+import pickle
 import logging
 import pprint
 
@@ -8,6 +13,11 @@ import xml.etree.ElementTree as ET
 from formencode.doctest_xml_compare import xml_compare
 
 import fhir.model
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
         
 
 class TestSimpleTypes(unittest.TestCase):
@@ -55,6 +65,88 @@ class TestSimpleTypes(unittest.TestCase):
         self.assertEquals(3*i, 3*t)
         self.assertEquals(i*3, 3*t)
 
+    def test_compareAndHash(self):
+        a, b = fhir.model.code('a'), fhir.model.code('b')
+
+        self.assertTrue(a == fhir.model.code('a'))
+        self.assertTrue(a != b)
+        self.assertTrue(a < b <= fhir.model.string('b'))
+        self.assertTrue(b > 'a' and b >= 'b')
+        self.assertEqual(a, fhir.model.uri('a'))
+        self.assertTrue(fhir.model.string(None) == None)
+        self.assertFalse(a == None)
+
+        # Primitives can be used in sets and as dict keys: they hash like
+        # their value.
+        codes = {a, b, fhir.model.code('a'), fhir.model.string('b')}
+        self.assertEqual(len(codes), 2)
+        self.assertIn('a', codes)
+        self.assertEqual({fhir.model.id('x'): 1}['x'], 1)
+        self.assertEqual({'x': 1}[fhir.model.id('x')], 1)
+
+        self.assertEqual(hash(fhir.model.integer(3)), hash(3))
+        self.assertEqual(len({fhir.model.integer(1), fhir.model.decimal('1.0')}), 1)
+        self.assertEqual(len({fhir.model.dateTime('2015'), '2015'}), 1)
+
+    def test_decimalExact(self):
+        d = fhir.model.decimal('1.50')
+
+        # The lexical form is retained ...
+        self.assertEqual(str(d), '1.50')
+        self.assertEqual(str(fhir.model.decimal(10)), '10')
+        self.assertEqual(str(fhir.model.decimal('1.0e3')), '1.0e3')
+
+        # ... and survives arithmetic with decimals and ints.
+        self.assertEqual(str(d + fhir.model.decimal('1.5')), '3.00')
+        self.assertEqual(str(d * 2), '3.00')
+        self.assertEqual(str(-d.value), '-1.50')
+        self.assertEqual(str(d.value - 2), '-0.50')
+
+        # Comparisons are exact.
+        a = fhir.model.decimal('0.1').value + fhir.model.decimal('0.2').value
+        self.assertEqual(a, fhir.model.decimal('0.3'))
+        self.assertTrue(fhir.model.decimal('0.30') == fhir.model.decimal('0.3'))
+        self.assertTrue(fhir.model.decimal('1e-1') < fhir.model.decimal('0.11'))
+        self.assertEqual(hash(fhir.model.decimal('1.0').value), hash(1))
+        self.assertEqual(hash(fhir.model.decimal('0.30').value), hash(fhir.model.decimal('0.3').value))
+
+        # Above 2**53 the float value is not exact, but hash and eq are.
+        big = fhir.model.decimal('10000000000000000000000001').value
+        self.assertEqual(big, 10000000000000000000000001)
+        self.assertEqual(hash(big), hash(10000000000000000000000001))
+        self.assertEqual(len({big, 10000000000000000000000001}), 1)
+        self.assertEqual(len({big, fhir.model.decimal('1.0e25').value}), 2)
+        self.assertEqual(hash(fhir.model.decimal('1.0e25').value), hash(10 ** 25))
+
+        self.assertRaises(ValueError, fhir.model.decimal, '1.')
+        self.assertRaises(ValueError, fhir.model.decimal, '01')
+
+        # JSON and XML keep the lexical form.
+        q = fhir.model.Quantity(value='1.50', unit='mg')
+        self.assertIn('"value": 1.50', q.toJSON())
+        self.assertIn('value="1.50"', q.toXML())
+        self.assertEqual(str(pickle.loads(pickle.dumps(q)).value), '1.50')
+
+    @unittest.skipIf(numpy is None, 'requires numpy')
+    def test_decimalArrays(self):
+        values = [fhir.model.decimal('1.5'), None, fhir.model.decimal('-2.25')]
+
+        floats = fhir.model.decimal.to_float_array(values)
+        self.assertEqual(floats.dtype, numpy.float64)
+        self.assertEqual(floats[0], 1.5)
+        self.assertTrue(numpy.isnan(floats[1]))
+
+        array, scale = fhir.model.decimal.to_scaled_array(values)
+        self.assertEqual(scale, 2)
+        self.assertEqual(array.dtype, numpy.int64)
+        self.assertEqual(array.sum(), 150 - 225)
+        self.assertTrue(array.mask[1])
+
+        array, scale = fhir.model.decimal.to_scaled_array(['1.5', '2'], scale=3)
+        self.assertEqual(list(array), [1500, 2000])
+        self.assertRaises(ValueError, fhir.model.decimal.to_scaled_array, ['1.25'], 1)
+        self.assertRaises(OverflowError, fhir.model.decimal.to_scaled_array, ['1e30'])
+
     def test_boolean(self):
         # Using native Python values
         t = fhir.model.boolean(True)
@@ -76,6 +168,48 @@ class TestSimpleTypes(unittest.TestCase):
         self.assertEquals(t, True)
         self.assertEquals(f, False)
 
+        # Truth value and logical operators
+        self.assertFalse(f)
+        self.assertTrue(bool(t))
+        self.assertIs(t & f, False)
+        self.assertIs(t | f, True)
+        self.assertIs(t ^ True, False)
+        self.assertIs(False | t, True)
+        self.assertNotEqual(t, 'true')
+
+    def test_booleanShared(self):
+        TRUE, FALSE = fhir.model.boolean.TRUE, fhir.model.boolean.FALSE
+
+        p = fhir.model.Patient(active=True)
+        self.assertIs(p.active, TRUE)
+
+        p.active = 'false'
+        self.assertIs(p.active, FALSE)
+
+        # Shared instances cannot be modified.
+        with self.assertRaises(TypeError):
+            p.active.id = 'a1'
+        with self.assertRaises(TypeError):
+            p.active.extension.append(fhir.model.Extension(url='http://x'))
+
+        # ... but a new instance can.
+        p.active = fhir.model.boolean(False)
+        p.active.id = 'a1'
+        self.assertIsNot(p.active, FALSE)
+        self.assertEquals(FALSE.id, None)
+
+        # Parsing (without id/extensions) and copying keep the instances.
+        for format_ in ['xml', 'json']:
+            q = fhir.model.Patient.loads(fhir.model.Patient(active=True).dumps(format_), format_)
+            self.assertIs(q.active, TRUE)
+
+            q = fhir.model.Patient.loads(p.dumps(format_), format_)
+            self.assertEquals(q.active.id, 'a1')
+            self.assertIsNot(q.active, FALSE)
+
+        self.assertIs(pickle.loads(pickle.dumps(TRUE)), TRUE)
+        self.assertIs(copy.deepcopy(FALSE), FALSE)
+
     def test_dateTime(self):
         datetime_as_string = '2016-12-01T00:00:00Z'
         dt = fhir.model.dateTime(datetime_as_string)
@@ -84,7 +218,103 @@ class TestSimpleTypes(unittest.TestCase):
         self.assertRaises(ValueError, fhir.model.dateTime, '2016-12-01T00:00:01')
         self.assertRaises(ValueError, fhir.model.dateTime, '2016-12-01T00:01:00')
         self.assertRaises(ValueError, fhir.model.dateTime, '2016-12-01T01:00:00')      
+        self.assertRaises(ValueError, fhir.model.dateTime, '2016-12-01T00:00:00')
+        self.assertRaises(ValueError, fhir.model.dateTime, '2016-02-30')
+        self.assertRaises(ValueError, fhir.model.dateTime, '2016-12-01 garbage')
+
+    def test_dateTimeParts(self):
+        dt = fhir.model.dateTime('2016-12-01T10:11:12.5-05:30')
+        self.assertEquals(dt.precision, 'second')
+        self.assertEquals(dt.parts.tzoffset, -330)
+        self.assertEquals(dt.parts.microsecond, 500000)
+        self.assertEquals(dt.parts.digits, 1)
+        self.assertEquals(dt.toDatetime().isoformat(), '2016-12-01T10:11:12.500000-05:30')
+
+        dt = fhir.model.dateTime('2016-12')
+        self.assertEquals(dt.precision, 'month')
+        self.assertEquals(dt.parts.day, None)
+        self.assertEquals(dt.toDatetime().isoformat(), '2016-12-01')
+
+        # Setting a new value replaces the cached parts.
+        dt.value = '2017'
+        self.assertEquals(dt.precision, 'year')
+        self.assertEquals(str(dt), '2017')
+        self.assertEquals(dt.toDatetime().isoformat(), '2017-01-01')
+
+        # Clearing the value clears the cached parts.
+        dt.key
+        dt.value = None
+        self.assertIsNone(dt.parts)
+        self.assertIsNone(dt.precision)
+        self.assertIsNone(dt.toDatetime())
+        self.assertIsNone(dt.key)
+
+        i = fhir.model.instant('2016-12-01T10:11:12Z')
+        self.assertEquals(i.parts.tzoffset, 0)
+        self.assertRaises(ValueError, fhir.model.instant, '2016-12-01')
         
+
+    def test_dateTimeKey(self):
+        year = fhir.model.dateTime('2015')
+        month = fhir.model.dateTime('2015-02')
+        moment = fhir.model.dateTime('2015-02-01T10:00:00.5+01:00')
+
+        self.assertEquals(year.key, (1420070400000000, 1451606400000000))
+        self.assertEquals(month.key, (1422748800000000, 1425168000000000))
+        self.assertEquals(moment.key, (1422781200500000, 1422781200600000))
+        self.assertEquals(fhir.model.date('9999-12').key[1], 253402300800000000)
+
+        self.assertTrue(year.contains(month))
+        self.assertTrue(month.contains(moment))
+        self.assertFalse(moment.contains(month))
+        self.assertTrue(moment.overlaps(year))
+        self.assertFalse(month.overlaps('2015-03'))
+
+        # The same moment in a different timezone
+        utc = fhir.model.instant('2015-02-01T09:00:00.5Z')
+        self.assertTrue(utc.contains(moment))
+        self.assertTrue(utc <= moment and utc >= moment)
+
+        # Equality is that of the value; ordering is chronological.
+        utc = fhir.model.instant('2015-02-01T09:00:00Z')
+        local = fhir.model.dateTime('2015-02-01T10:00:00+01:00')
+        self.assertTrue(utc <= local and utc >= local)
+        self.assertFalse(utc == local)
+        self.assertEquals(utc.key, local.key)
+
+        # For the same start, the finest precision comes first.
+        values = [fhir.model.dateTime(v) for v in ['2015', '2015-01', '2015-01-01']]
+        self.assertEquals([str(d) for d in sorted(values)], ['2015-01-01', '2015-01', '2015'])
+        self.assertTrue(values[1] < values[0])
+
+        empty = fhir.model.dateTime(None)
+        self.assertIsNone(empty.key)
+        self.assertRaises(TypeError, lambda: empty < year)
+        self.assertRaises(TypeError, lambda: year < empty)
+        self.assertRaises(TypeError, empty.overlaps, year)
+        self.assertRaises(TypeError, year.contains, empty)
+
+        self.assertTrue(year < month < moment)
+        self.assertTrue(month > '2015-01-31')
+        self.assertEquals(
+            [str(d) for d in sorted([moment, year, month])],
+            ['2015', '2015-02', '2015-02-01T10:00:00.5+01:00']
+        )
+
+        with self.assertRaises(TypeError):
+            year < fhir.model.time('10:00:00')
+
+    @unittest.skipIf(numpy is None, 'requires numpy')
+    def test_dateTimeToDatetime64(self):
+        values = [fhir.model.date('2015'), '2015-02-01T10:00:00Z', None]
+        starts, ends = fhir.model.to_datetime64(values)
+
+        self.assertEquals(starts.dtype, numpy.dtype('datetime64[us]'))
+        self.assertEquals(str(starts[0]), '2015-01-01T00:00:00.000000')
+        self.assertEquals(str(ends[0]), '2016-01-01T00:00:00.000000')
+        self.assertEquals(str(ends[1]), '2015-02-01T10:00:01.000000')
+        self.assertTrue(numpy.isnat(starts[2]))
+
     def test_date(self):
         date_as_string = '2016-12-01'
         dt = fhir.model.date(date_as_string)
@@ -94,9 +324,76 @@ class TestSimpleTypes(unittest.TestCase):
         dt = fhir.model.time('00:00:00')
         self.assertEquals(str(dt), '00:00:00')
 
-        # This should raise an error, but is currently not implemented.
-        # with self.assertRaises(ValueError):
-        #     fhir.model.time('00:00:00+01:00')
-        #
-        # with self.assertRaises(ValueError):
-        #     fhir.model.time('00:00:00Z')
+        self.assertEquals(dt.toDatetime().isoformat(), '00:00:00')
+
+        with self.assertRaises(ValueError):
+            fhir.model.time('00:00:00+01:00')
+
+        with self.assertRaises(ValueError):
+            fhir.model.time('00:00:00Z')
+
+    def test_base64Binary(self):
+        content = bytes(range(256)) * 10
+        b = fhir.model.base64Binary.fromBytes(content)
+
+        self.assertEquals(b.decode(), content)
+        self.assertEquals(b.view().tobytes(), content)
+        self.assertEquals(fhir.model.base64Binary().decode(), None)
+        self.assertEquals(fhir.model.base64Binary().view(), None)
+
+        # Views share the decoded buffer, until a new value is set.
+        c = fhir.model.base64Binary.fromBytes(content)
+        self.assertIs(c.view().obj, c.view().obj)
+        c.value = str(fhir.model.base64Binary.fromBytes(b'abc'))
+        self.assertEquals(c.view().tobytes(), b'abc')
+
+        # Whitespace in the encoded text is ignored; odd chunk sizes work.
+        b = fhir.model.base64Binary('\n'.join(str(b)[i:i+76] for i in range(0, len(str(b)), 76)))
+        fp = io.BytesIO()
+        b.save(fp, chunksize=101)
+        self.assertEquals(fp.getvalue(), content)
+
+    def test_base64BinarySpill(self):
+        content = os.urandom(3000)
+        encoded = str(fhir.model.base64Binary.fromBytes(content))
+
+        patient = fhir.model.Patient(photo=[fhir.model.Attachment(data=encoded)])
+        json = patient.toJSON()
+
+        p = fhir.model.Patient.fromJSON(json, spill=1000)
+        data = p.photo[0].data
+        path = data._path
+
+        self.assertTrue(data.spilled)
+        self.assertTrue(os.path.exists(path))
+        self.assertEquals(data.decode(), content)
+        self.assertEquals(p.toJSON(), json)
+
+        fp = io.BytesIO()
+        data.save(fp)
+        self.assertEquals(fp.getvalue(), content)
+
+        # Values in lists and with extensions (a '_data' sibling) are spilled
+        # as well.
+        native = patient.toNative()
+        native['photo'].append(dict(native['photo'][0], _data={'id': 'd'}))
+        p = fhir.model.Patient.fromNative(native, spill=1000)
+        self.assertEquals([a.data.spilled for a in p.photo], [True, True])
+        self.assertEquals(str(p.photo[1].data.id), 'd')
+        self.assertEquals(p.photo[1].data.decode(), content)
+
+        # Values below the threshold are kept in memory.
+        p = fhir.model.Patient.fromXML(patient.toXML(), spill=10000)
+        self.assertFalse(p.photo[0].data.spilled)
+
+        # The file is removed when the value is replaced ...
+        data.value = 'AAAA'
+        self.assertFalse(os.path.exists(path))
+
+        # ... or garbage collected.
+        p = fhir.model.Patient.fromXML(patient.toXML(), spill=1000)
+        path = p.photo[0].data._path
+        self.assertTrue(os.path.exists(path))
+        del p, data
+        gc.collect()
+        self.assertFalse(os.path.exists(path))
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import unittest
+import itertools
+import datetime as dt
+
+import fhir.model
+from fhir.model.timing import Repeat
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def as_strings(occurrences):
+    return [str(o) for o in numpy.datetime_as_string(occurrences, unit='m')]
+
+
+@unittest.skipIf(numpy is None, 'requires numpy')
+class TestTiming(unittest.TestCase):
+
+    def test_frequency(self):
+        t = fhir.model.Timing(repeat=Repeat(frequency=2, period=1, periodUnit='d'))
+        o = t.occurrences('2020-01-01T08:00:00Z', '2020-01-03')
+
+        self.assertEqual(o.dtype, numpy.dtype('datetime64[us]'))
+        self.assertEqual(as_strings(o), [
+            '2020-01-01T08:00', '2020-01-01T20:00',
+            '2020-01-02T08:00', '2020-01-02T20:00',
+        ])
+
+    def test_count(self):
+        t = fhir.model.Timing(repeat=Repeat(period=8, periodUnit='h', count=3))
+
+        # The count applies from the start of the schedule.
+        o = t.occurrences(dt.datetime(2020, 1, 1, 6))
+        self.assertEqual(as_strings(o), [
+            '2020-01-01T06:00', '2020-01-01T14:00', '2020-01-01T22:00',
+        ])
+
+    def test_bounds(self):
+        period = fhir.model.Period(start='2020-01-01', end='2020-01-03')
+        t = fhir.model.Timing(repeat=Repeat(timeOfDay=['08:00:00', '20:00:00'], bounds=period))
+
+        o = t.occurrences('2019-01-01')
+        self.assertEqual(len(o), 4)
+        self.assertEqual(as_strings(o)[-1], '2020-01-02T20:00')
+
+        duration = fhir.model.Duration(value=7, code='d')
+        t = fhir.model.Timing(repeat=Repeat(timeOfDay=['10:00:00'], period=2, periodUnit='d', bounds=duration))
+        o = t.occurrences(dt.date(2020, 1, 1))
+        self.assertEqual(len(o), 4)
+
+        # A Duration needs a (known) unit.
+        for duration in [fhir.model.Duration(value=7), fhir.model.Duration(value=7, code='week')]:
+            t = fhir.model.Timing(repeat=Repeat(timeOfDay=['10:00:00'], bounds=duration))
+            self.assertRaises(ValueError, t.occurrences, dt.date(2020, 1, 1))
+
+    def test_dayOfWeek(self):
+        t = fhir.model.Timing(repeat=Repeat(dayOfWeek=['mon', 'thu']))
+        o = t.occurrences(dt.datetime(2020, 1, 1, 9), dt.date(2020, 1, 10))
+        self.assertEqual(as_strings(o), [
+            '2020-01-02T09:00', '2020-01-06T09:00', '2020-01-09T09:00',
+        ])
+
+    def test_when(self):
+        t = fhir.model.Timing(repeat=Repeat(when=['ACM', 'HS'], offset=30))
+        o = t.occurrences(dt.date(2020, 1, 1), dt.date(2020, 1, 2))
+        self.assertEqual(as_strings(o), ['2020-01-01T07:30', '2020-01-01T22:30'])
+
+    def test_when_unsupported(self):
+        t = fhir.model.Timing(repeat=Repeat(when=['IMD']))
+        self.assertRaises(ValueError, t.occurrences, dt.date(2020, 1, 1), dt.date(2020, 1, 2))
+
+    def test_weekly_times(self):
+        repeat = Repeat(frequency=1, period=1, periodUnit='wk', timeOfDay=['08:00:00'])
+        o = fhir.model.Timing(repeat=repeat).occurrences(dt.date(2020, 1, 1), dt.date(2020, 1, 22))
+        self.assertEqual(as_strings(o), [
+            '2020-01-01T08:00', '2020-01-08T08:00', '2020-01-15T08:00',
+        ])
+
+        # Two days a week, spread over the week.
+        repeat = Repeat(frequency=2, period=1, periodUnit='wk', timeOfDay=['08:00:00'])
+        o = fhir.model.Timing(repeat=repeat).occurrences(dt.date(2020, 1, 1), dt.date(2020, 1, 15))
+        self.assertEqual(as_strings(o), [
+            '2020-01-01T08:00', '2020-01-04T08:00',
+            '2020-01-08T08:00', '2020-01-11T08:00',
+        ])
+
+        # Every other week on mondays and thursdays.
+        repeat = Repeat(period=2, periodUnit='wk', dayOfWeek=['mon', 'thu'], timeOfDay=['08:00:00'])
+        o = fhir.model.Timing(repeat=repeat).occurrences(dt.date(2020, 1, 6), dt.date(2020, 1, 27))
+        self.assertEqual(as_strings(o), [
+            '2020-01-06T08:00', '2020-01-09T08:00', '2020-01-20T08:00', '2020-01-23T08:00',
+        ])
+
+    def test_monthly_times(self):
+        repeat = Repeat(frequency=1, period=1, periodUnit='mo', timeOfDay=['08:00:00', '20:00:00'])
+        t = fhir.model.Timing(repeat=repeat)
+
+        o = t.occurrences(dt.date(2020, 1, 31), dt.date(2020, 4, 1))
+        self.assertEqual(as_strings(o), [
+            '2020-01-31T08:00', '2020-01-31T20:00',
+            '2020-02-29T08:00', '2020-02-29T20:00',
+            '2020-03-31T08:00', '2020-03-31T20:00',
+        ])
+
+        repeat = Repeat(period=1, periodUnit='a', timeOfDay=['08:00:00'], count=2)
+        o = fhir.model.Timing(repeat=repeat).occurrences(dt.date(2020, 2, 29))
+        self.assertEqual(as_strings(o), ['2020-02-29T08:00', '2021-02-28T08:00'])
+
+    def test_months(self):
+        t = fhir.model.Timing(repeat=Repeat(period=1, periodUnit='mo'))
+        o = t.occurrences(dt.datetime(2020, 1, 31, 10), dt.date(2020, 4, 1))
+        self.assertEqual(as_strings(o), [
+            '2020-01-31T10:00', '2020-02-29T10:00', '2020-03-31T10:00',
+        ])
+
+    def test_events(self):
+        t = fhir.model.Timing(event=['2020-01-02T10:00:00Z', '2020-05-01'])
+        o = t.occurrences('2020-01-01', '2020-03-01')
+        self.assertEqual(as_strings(o), ['2020-01-02T10:00'])
+
+    def test_lazy(self):
+        t = fhir.model.Timing(repeat=Repeat(frequency=3, period=1, periodUnit='d'))
+        o = t.occurrences(dt.datetime(2020, 1, 1), lazy=True)
+
+        o = list(itertools.islice(o, 100))
+        self.assertEqual(len(o), 100)
+        self.assertEqual(o[-1], dt.datetime(2020, 2, 3))
+
+        self.assertRaises(ValueError, t.occurrences, dt.datetime(2020, 1, 1))
+
+    def test_cache(self):
+        repeat = dict(frequency=2, period=1, periodUnit='d')
+        t1 = fhir.model.Timing(repeat=Repeat(**repeat))
+        t2 = fhir.model.Timing(repeat=Repeat(**repeat))
+
+        o1 = t1.occurrences('2020-01-01', '2020-02-01')
+        o2 = t2.occurrences('2020-01-01', '2020-02-01')
+        self.assertTrue(numpy.shares_memory(o1, o2))
+        self.assertFalse(o1.flags.writeable)
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import unittest
+import logging
+import json
+
+import fhir
+import fhir.model
+
+EXAMPLES = [
+    ('patient-example', fhir.model.Patient),
+    ('patient-glossy', fhir.model.Patient),
+    ('patient-mom', fhir.model.Patient),
+    ('bundle-example', fhir.model.Bundle),
+    ('bundle-references', fhir.model.Bundle),
+]
+
+
+class TestTranscode(unittest.TestCase):
+
+    def test_xmlToJSONMatchesModel(self):
+        for name, cls in EXAMPLES:
+            xmlstring = fhir.get_example_data(name, 'xml')
+            expected = cls.fromXML(xmlstring).toJSON()
+            self.assertEqual(fhir.model.xml_to_json(xmlstring), expected, name)
+
+            # Like fromXML(), bytes are accepted too.
+            self.assertEqual(fhir.model.xml_to_json(xmlstring.encode('utf-8')), expected, name)
+
+    def test_jsonToXMLMatchesModel(self):
+        for name, cls in EXAMPLES:
+            jsonstring = fhir.get_example_data(name, 'json')
+            expected = cls.fromJSON(jsonstring).toXML()
+            self.assertEqual(fhir.model.json_to_xml(jsonstring), expected, name)
+
+    def test_extendedListValues(self):
+        """'_given' siblings, choice types and contained resources."""
+        data = {
+            "resourceType": "Patient",
+            "contained": [
+                {"resourceType": "Patient", "id": "p1"},
+            ],
+            "name": [{
+                "given": ["Melle", None],
+                "_given": [None, {"extension": [{
+                    "url": "http://example.com/initial",
+                    "valueBoolean": True
+                }]}]
+            }],
+            "deceasedDateTime": "2016-12-01T00:00:00Z",
+        }
+
+        xmlstring = fhir.model.native_to_xml(data)
+        p = fhir.model.Patient.fromXML(xmlstring)
+        self.assertEqual(p.contained[0].id, 'p1')
+        self.assertEqual(p.name[0].given[0], 'Melle')
+        self.assertEqual(p.name[0].given[1].extension[0].value, True)
+        self.assertIsInstance(p.deceased, fhir.model.dateTime)
+
+        self.assertEqual(fhir.model.xml_to_native(xmlstring), data)
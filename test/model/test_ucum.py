@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import unittest
+import math
+
+import fhir.model
+from fhir.model import ucum
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class TestUCUM(unittest.TestCase):
+
+    def test_parse_unit(self):
+        self.assertEqual(ucum.parse_unit('mg/dL'), (10.0, 0.0, 'g.m-3'))
+        self.assertEqual(ucum.parse_unit('mmol/L'), (1.0, 0.0, 'mol.m-3'))
+        self.assertEqual(ucum.parse_unit('kg/m2'), (1000.0, 0.0, 'g.m-2'))
+        self.assertEqual(ucum.parse_unit('[IU]/L').canonical, '[IU].m-3')
+        self.assertEqual(ucum.parse_unit('{beats}/min').canonical, 's-1')
+        self.assertEqual(ucum.parse_unit('10*9/L').factor, 1e12)
+        self.assertEqual(ucum.parse_unit('ug/(kg.min)').canonical, 's-1')
+
+        self.assertRaises(ucum.UnknownUnitError, ucum.parse_unit, 'foo')
+        self.assertRaises(ucum.UnknownUnitError, ucum.parse_unit, 'mg/(dL')
+        self.assertRaises(ucum.UnknownUnitError, ucum.parse_unit, 'Cel/h')
+
+    def test_convert(self):
+        self.assertAlmostEqual(ucum.convert(98.6, '[degF]', 'Cel'), 37.0)
+        self.assertAlmostEqual(ucum.convert(1, '[lb_av]', 'kg'), 0.45359237)
+        self.assertAlmostEqual(ucum.convert(120, 'mm[Hg]', 'kPa'), 15.99864)
+        self.assertRaises(ucum.IncompatibleUnitsError, ucum.convert, 1, 'mg', 'mL')
+
+    def test_normalized(self):
+        q = fhir.model.Quantity(value=90, unit='mg/dL', system=ucum.UCUM, code='mg/dL')
+        n = q.normalized()
+
+        self.assertEqual(n.value, 900)
+        self.assertEqual(n.code, 'g.m-3')
+        self.assertEqual(n.system, ucum.UCUM)
+
+        # Subclasses (e.g. Duration) are retained.
+        d = fhir.model.Duration(value=2, code='h').normalized()
+        self.assertTrue(isinstance(d, fhir.model.Duration))
+        self.assertEqual(d.value, 7200)
+
+        # Codes from another system are not interpreted as UCUM.
+        q = fhir.model.Quantity(value=1, unit='mg', system='http://snomed.info/sct', code='258684004')
+        self.assertEqual(q.normalized().value, 1e-3)
+
+    @unittest.skipIf(numpy is None, 'requires numpy')
+    def test_normalize_many(self):
+        quantities = [
+            fhir.model.Quantity(value=90, code='mg/dL'),
+            fhir.model.Quantity(value=5, unit='mmol/L'),
+            None,
+            fhir.model.Quantity(value=1, code='g/L'),
+            fhir.model.Quantity(value=1, code='bogus'),
+        ]
+
+        values, units = fhir.model.Quantity.normalize_many(quantities, strict=False)
+
+        self.assertEqual(values[[0, 1, 3]].tolist(), [900, 5, 1000])
+        self.assertTrue(math.isnan(values[2]) and math.isnan(values[4]))
+        self.assertEqual(units.tolist(), ['g.m-3', 'mol.m-3', None, 'g.m-3', None])
+
+        self.assertRaises(ucum.UnknownUnitError, fhir.model.Quantity.normalize_many, quantities)
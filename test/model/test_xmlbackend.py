@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""Run the existing XML tests under every available XML backend."""
+from __future__ import print_function
+import unittest
+import logging
+
+import fhir
+import fhir.model
+from fhir.model import xmlbackend
+
+from . import test_complex_types
+from . import test_multiple_types
+from . import test_serialization
+
+HAS_LXML = 'lxml' in xmlbackend.available_backends()
+
+
+class BackendMixin(object):
+    backend = None
+
+    def setUp(self):
+        self._previous_backend = xmlbackend.get_backend().name
+        xmlbackend.set_backend(self.backend)
+
+    def tearDown(self):
+        xmlbackend.set_backend(self._previous_backend)
+
+
+class TestComplexTypesStdlib(BackendMixin, test_complex_types.TestComplexTypes):
+    backend = 'stdlib'
+
+class TestMultipleStdlib(BackendMixin, test_multiple_types.TestMultiple):
+    backend = 'stdlib'
+
+class TestSerializationStdlib(BackendMixin, test_serialization.TestSerialization):
+    backend = 'stdlib'
+
+
+@unittest.skipUnless(HAS_LXML, 'lxml is not installed')
+class TestComplexTypesLxml(BackendMixin, test_complex_types.TestComplexTypes):
+    backend = 'lxml'
+
+@unittest.skipUnless(HAS_LXML, 'lxml is not installed')
+class TestMultipleLxml(BackendMixin, test_multiple_types.TestMultiple):
+    backend = 'lxml'
+
+@unittest.skipUnless(HAS_LXML, 'lxml is not installed')
+class TestSerializationLxml(BackendMixin, test_serialization.TestSerialization):
+    backend = 'lxml'
+
+
+class TestBackends(unittest.TestCase):
+
+    def test_unsupportedBackend(self):
+        with self.assertRaises(xmlbackend.UnsupportedBackendError):
+            xmlbackend.set_backend('libxml3')
+
+    @unittest.skipUnless(HAS_LXML, 'lxml is not installed')
+    def test_crossBackendRoundTrip(self):
+        """Narratives parsed by one backend can be written by the other."""
+        xmlstring = fhir.get_example_data('patient-glossy', 'xml')
+        previous = xmlbackend.get_backend().name
+
+        try:
+            xmlbackend.set_backend('stdlib')
+            p = fhir.model.Patient.fromXML(xmlstring)
+            xmlbackend.set_backend('lxml')
+            q = fhir.model.Patient.fromXML(p.toXML())
+        finally:
+            xmlbackend.set_backend(previous)
+
+        self.assertEqual(q.id, 'glossy')
+        self.assertEqual(p.toJSON(), q.toJSON())
@@ -2,11 +2,30 @@
 from __future__ import print_function
 import unittest
 import logging
+import datetime
+import itertools
+import os
+import tempfile
+import unittest.mock
 
+import sqlalchemy
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
 
-from fhir.persistance import FHIRStore
+
+import fhir
+import fhir.persistance
+from fhir.persistance import FHIRStore, Session, Resource as PersistedResource
+from fhir.persistance import VersionConflictError, ResourceGoneError, UnknownResourceTypeError
+from fhir.persistance import InvalidPageTokenError
+from fhir.persistance import codecs
+from fhir.persistance.cache import ResourceCache, CacheInfo
+from fhir.persistance.bundles import InvalidBundleError
+from fhir.persistance.references import Link, parse_url
+from fhir.persistance.search import UnknownSearchParameterError, InvalidSearchValueError
 import fhir.model
 from fhir.model import *
+from fhir.model.bundle import Entry, Request
 
 
 # @unittest.skip('not right now')
@@ -45,4 +64,674 @@ from fhir.model import *
 #         self.assertEquals(p.id, self.p.id)
 # 
 #     def test_post(self):
-#         self.store.post(self.p)
\ No newline at end of file
+#         self.store.post(self.p)
+
+class TestFHIRStore(unittest.TestCase):
+
+    def setUp(self):
+        self.store = FHIRStore('sqlite://')
+
+    def patients(self, n, prefix='p'):
+        for i in range(n):
+            yield Patient(id='{}{}'.format(prefix, i), active=bool(i % 2))
+
+    def test_post_many(self):
+        calls = []
+        progress = lambda count, elapsed: calls.append(count)
+
+        count = self.store.post_many(self.patients(25), batch_size=10, progress=progress)
+
+        self.assertEqual(count, 25)
+        self.assertEqual(calls, [10, 20, 25])
+        self.assertEqual(self.store.get('p24').active, False)
+        self.assertEqual(self.store.get('p7').active, True)
+
+    def test_post_many_rollback(self):
+        self.store.post_many(self.patients(5), batch_size=2)
+
+        # The chunk with the duplicate is rolled back; earlier ones are kept.
+        patients = itertools.chain(self.patients(3, 'q'), self.patients(1))
+        self.assertRaises(IntegrityError, self.store.post_many, patients, batch_size=2)
+
+        self.assertEqual(str(self.store.get('q1').id), 'q1')
+        self.assertRaises(NoResultFound, self.store.get, 'q2')
+
+    def test_codecs(self):
+        xmlstring = fhir.get_example_data('patient-example')
+        patient = Patient.fromXML(xmlstring)
+
+        for name in codecs.available_codecs():
+            store = FHIRStore('sqlite://', codec=name, allow_pickle=True)
+            store.post(patient)
+
+            p = store.get(patient.id)
+            self.assertEqual(p.toJSON(), patient.toJSON(), name)
+
+        self.assertRaises(codecs.UnsupportedCodecError, FHIRStore, 'sqlite://', codec='yaml')
+
+    def test_untrusted_codec(self):
+        # Pickled rows are not read unless the store allows it, whatever the
+        # codec used for writing.
+        self.store.post(Patient(id='p1'))
+
+        session = Session()
+        session.query(PersistedResource).filter_by(id='p1').update(dict(
+            codec='pickle',
+            data=codecs.PickleCodec().encode(Patient(id='p1')),
+        ))
+        session.commit()
+        self.store.cache.clear()
+
+        self.assertRaises(codecs.UntrustedCodecError, self.store.get, 'p1')
+        self.assertRaises(codecs.UntrustedCodecError, self.store.search, 'Patient')
+
+        self.store.trusted_codecs = ('pickle', )
+        self.assertEqual(str(self.store.get('p1').id), 'p1')
+
+        self.assertRaises(codecs.UntrustedCodecError, FHIRStore, 'sqlite://', codec='pickle')
+
+    def test_mixed_codecs(self):
+        # Rows written before codecs existed only have XML ...
+        session = Session()
+        session.add(PersistedResource(id='legacy', type='Patient', xml=Patient(id='legacy').toXML()))
+        session.commit()
+
+        # ... and remain readable, like rows written with another codec.
+        self.store.post(Patient(id='json'))
+        self.store.codec = codecs.get_codec('json+zlib')
+        self.store.post(Patient(id='zlib'))
+
+        for id_ in ['legacy', 'json', 'zlib']:
+            self.assertEqual(str(self.store.get(id_).id), id_)
+
+    def observation(self, id_, code, patient, date, value, unit):
+        return Observation(
+            id=id_,
+            status='final',
+            code=CodeableConcept(coding=[Coding(system='http://loinc.org', code=code)]),
+            subject=Reference(reference=patient),
+            effective=dateTime(date),
+            value=Quantity(value=value, unit=unit, system='http://unitsofmeasure.org', code=unit),
+        )
+
+    def search(self, type_, **params):
+        return [str(r.id) for r in self.store.search(type_, **params)]
+
+    def test_search_patient(self):
+        for name in ['patient-example', 'patient-glossy', 'patient-mom']:
+            self.store.post(fhir.model.Resource.fromXML(fhir.get_example_data(name)))
+
+        self.assertEqual(self.search('Patient', name='chal'), ['example'])
+        self.assertEqual(self.search('Patient', family='CHALMERS'), ['example'])
+        self.assertEqual(self.search('Patient', **{'family:exact': 'chal'}), [])
+        self.assertEqual(self.search('Patient', gender='male'), ['example', 'glossy'])
+        self.assertEqual(self.search('Patient', gender='male', birthdate='ge1970'), ['example'])
+        self.assertEqual(self.search('Patient', gender='female,male', _id='mom,glossy'), ['glossy', 'mom'])
+        self.assertEqual(self.search('Patient', _id=['mom,glossy', 'glossy,example']), ['glossy'])
+        self.assertEqual(self.search('Patient', _id=['mom', 'glossy']), [])
+        self.assertEqual(self.search('Patient', identifier='urn:oid:1.2.36.146.595.217.0.1|12345'), ['example'])
+        self.assertEqual(self.search('Patient', identifier='|12345'), [])
+
+        self.assertRaises(UnknownSearchParameterError, self.store.search, 'Patient', shoe_size='43')
+        self.assertRaises(InvalidSearchValueError, self.store.search, 'Patient', birthdate='yesterday')
+
+    def test_search_observation(self):
+        self.store.post_many([
+            self.observation('o1', '15074-8', 'Patient/1', '2017-03-01T10:00:00Z', '6.3', 'mmol/L'),
+            self.observation('o2', '15074-8', 'Patient/2', '2017-03-02T10:00:00Z', '5400', 'umol/L'),
+            self.observation('o3', '2339-0', 'Group/1', '2016-12-31', '98', 'mg/dL'),
+        ])
+
+        self.assertEqual(self.search('Observation', code='15074-8'), ['o1', 'o2'])
+        self.assertEqual(self.search('Observation', code='http://loinc.org|2339-0'), ['o3'])
+        self.assertEqual(self.search('Observation', subject='1'), ['o1', 'o3'])
+        self.assertEqual(self.search('Observation', patient='1'), ['o1'])
+        self.assertEqual(self.search('Observation', patient='Patient/2'), ['o2'])
+
+        # Dates
+        self.assertEqual(self.search('Observation', date='2017-03'), ['o1', 'o2'])
+        self.assertEqual(self.search('Observation', date='lt2017'), ['o3'])
+        self.assertEqual(self.search('Observation', date=['ge2017-03-01', 'lt2017-03-02']), ['o1'])
+
+        # Quantities are compared in canonical units, with implicit precision.
+        self.assertEqual(self.search('Observation', value_quantity='6.3||mmol/L'), ['o1'])
+        self.assertEqual(self.search('Observation', value_quantity='5.4||mmol/L'), ['o2'])
+        self.assertEqual(self.search('Observation', value_quantity='gt5.5||mmol/L'), ['o1'])
+        self.assertEqual(self.search('Observation', value_quantity='le1|http://unitsofmeasure.org|g/L'), ['o3'])
+        self.assertEqual(self.search('Observation', value_quantity='98'), ['o3'])
+
+    def test_search_absent_period_start(self):
+        # A start with only a data-absent-reason is open ended.
+        episode = EpisodeOfCare._fromNative({
+            'resourceType': 'EpisodeOfCare',
+            'id': 'e',
+            'status': 'finished',
+            'patient': {'reference': 'Patient/p'},
+            'period': {
+                '_start': {'extension': [{
+                    'url': 'http://hl7.org/fhir/StructureDefinition/data-absent-reason',
+                    'valueCode': 'unknown',
+                }]},
+                'end': '2017-01-02',
+            },
+        })
+        self.store.post(episode)
+
+        self.assertEqual(self.search('EpisodeOfCare', date='le1900'), ['e'])
+        self.assertEqual(self.search('EpisodeOfCare', date='ap2017-01-02'), ['e'])
+        self.assertEqual(self.search('EpisodeOfCare', date='ge2017-01-03'), [])
+
+    def test_get_many(self):
+        self.store.post_many(self.patients(10))
+        cache = self.store.cache
+
+        patients = self.store.get_many(['p3', 'p1', 'x', 'p3'])
+        self.assertEqual([p and str(p.id) for p in patients], ['p3', 'p1', None, 'p3'])
+        self.assertEqual(cache.info().currsize, 2)
+
+        # Cold reads are misses, even though the (empty) cache was skipped.
+        self.assertEqual(cache.info().misses, 2)
+
+        # Hits return copies: modifying them does not affect the cache.
+        p = self.store.get('p3')
+        p.active = False
+        self.assertEqual(self.store.get('p3').active, True)
+        self.assertEqual(cache.info().hits, 2)
+
+        self.assertRaises(NoResultFound, self.store.get, 'x')
+
+        # Decoding in worker processes gives the same result.
+        ids = ['p{}'.format(i) for i in range(10)]
+        cache.clear()
+
+        with unittest.mock.patch('fhir.persistance.PARALLEL_THRESHOLD', 2):
+            patients = self.store.get_many(ids, workers=2)
+
+        self.assertEqual([str(p.id) for p in patients], ids)
+
+    def test_cache(self):
+        cache = ResourceCache(maxsize=2)
+
+        for i in range(3):
+            cache.put(('Patient', str(i), 1), Patient(id=str(i)))
+
+        self.assertIsNone(cache.get(('Patient', '0', 1)))
+        self.assertEqual(str(cache.get(('Patient', '1', 1)).id), '1')
+
+        # A new version replaces the old one.
+        cache.put(('Patient', '1', 2), Patient(id='1', active=True))
+        self.assertIsNone(cache.get(('Patient', '1', 1)))
+        self.assertEqual(cache.get(('Patient', '1', 2)).active, True)
+
+        cache.invalidate('Patient', '1')
+        self.assertIsNone(cache.get(('Patient', '1', 2)))
+        self.assertEqual(cache.info(), CacheInfo(hits=2, misses=3, maxsize=2, currsize=1))
+
+        disabled = ResourceCache(maxsize=0)
+        disabled.put(('Patient', '1', 1), Patient(id='1'))
+        self.assertEqual(len(disabled), 0)
+
+        # A disabled cache counts every read as a miss.
+        store = FHIRStore('sqlite://', cache_size=0)
+        store.post_many(self.patients(3))
+        store.get_many(['p0', 'p1'])
+        store.get('p0')
+        self.assertEqual(store.cache.info(), CacheInfo(hits=0, misses=3, maxsize=0, currsize=0))
+
+    def test_put(self):
+        patient = Patient(id='p', active=True)
+        self.store.post(patient)
+        self.assertEqual(patient.meta.versionId, '1')
+
+        patient.active = False
+        self.store.put(patient)
+        self.assertEqual(patient.meta.versionId, '2')
+
+        p = self.store.get('p')
+        self.assertEqual(p.active, False)
+        self.assertEqual(p.meta.versionId, '2')
+        self.assertEqual(p.meta.lastUpdated, patient.meta.lastUpdated)
+
+        # put() creates Resources that do not exist yet.
+        self.store.put(Patient(id='q'))
+        self.assertEqual(self.store.get('q').meta.versionId, '1')
+
+    def test_put_if_match(self):
+        patient = Patient(id='p', active=True)
+        self.store.post(patient)
+        self.store.put(patient, if_match='W/"1"')
+
+        # A writer that read version 1 loses; nothing is written.
+        stale = Patient(id='p', active=False)
+        self.assertRaises(VersionConflictError, self.store.put, stale, if_match=1)
+        self.assertRaises(VersionConflictError, self.store.delete, stale, if_match=1)
+        self.assertRaises(VersionConflictError, self.store.put, Patient(id='x'), if_match=1)
+
+        p = self.store.get('p')
+        self.assertEqual((p.meta.versionId, p.active), ('2', True))
+        self.assertEqual(len(self.store.history('Patient', 'p')), 2)
+
+    def test_delete_and_history(self):
+        self.store.post(Patient(id='p', active=True))
+        self.store.put(Patient(id='p', active=False))
+        self.store.delete(Patient(id='p'))
+
+        self.assertRaises(NoResultFound, self.store.get, 'p')
+        self.assertRaises(NoResultFound, self.store.delete, Patient(id='p'))
+        self.assertEqual(self.search('Patient', _id='p'), [])
+
+        self.assertEqual(self.store.vread('Patient', 'p', 1).active, True)
+        self.assertEqual(self.store.vread('Patient', 'p', '2').active, False)
+        self.assertRaises(ResourceGoneError, self.store.vread, 'Patient', 'p', 3)
+        self.assertRaises(NoResultFound, self.store.vread, 'Patient', 'p', 4)
+
+        # Versions continue after a deletion.
+        self.store.put(Patient(id='p'))
+        history = self.store.history('Patient', 'p')
+        self.assertEqual([str(p.meta.versionId) for p in history], ['4', '2', '1'])
+
+    def test_post_after_delete(self):
+        self.store.post(Patient(id='p'))
+        self.store.delete(Patient(id='p'))
+
+        # post() continues the history as well ...
+        patient = Patient(id='p', active=True)
+        self.store.post(patient)
+        self.assertEqual(patient.meta.versionId, '3')
+
+        # ... so later versions do not collide with the archived ones.
+        self.assertEqual(self.store.put(Patient(id='p', active=False)), 4)
+        history = self.store.history('Patient', 'p')
+        self.assertEqual([str(p.meta.versionId) for p in history], ['4', '3', '1'])
+
+        self.store.delete(Patient(id='p'))
+        self.store.post_many([Patient(id='p'), Patient(id='q')])
+        self.assertEqual(self.store.get('p').meta.versionId, '6')
+        self.assertEqual(self.store.get('q').meta.versionId, '1')
+
+    def test_write_attempts(self):
+        self.store.post(Patient(id='p'))
+
+        # Errors that are not caused by another writer are not retried ...
+        with unittest.mock.patch.object(self.store, '_archive', side_effect=IntegrityError('', {}, None)) as archive:
+            self.assertRaises(IntegrityError, self.store.put, Patient(id='p'))
+            self.assertEqual(archive.call_count, 1)
+
+        # ... and a writer that keeps losing gives up.
+        versions = itertools.count(2)
+        current = lambda session, type_, id_: next(versions)
+
+        with unittest.mock.patch.object(self.store, '_current_version', side_effect=current):
+            self.assertRaises(VersionConflictError, self.store.put, Patient(id='p'))
+
+        self.assertEqual(self.store.get('p').meta.versionId, '1')
+
+    def test_put_reindexes(self):
+        self.store.post(Patient(id='p', gender='male'))
+        self.store.put(Patient(id='p', gender='female'))
+
+        self.assertEqual(self.search('Patient', gender='male'), [])
+        self.assertEqual(self.search('Patient', gender='female'), ['p'])
+
+        self.store.delete(Patient(id='p'))
+        self.assertEqual(self.search('Patient', gender='female'), [])
+
+    def test_ids_per_type(self):
+        self.store.post(Patient(id='1', active=True))
+        self.store.post(Observation(id='1', status='final'))
+
+        self.assertEqual(self.store.get('Patient/1').active, True)
+        self.assertEqual(self.store.get('1', 'Observation').status, 'final')
+        self.assertRaises(MultipleResultsFound, self.store.get, '1')
+
+        resources = self.store.get_many(['Observation/1', 'Patient/1', 'Patient/2'])
+        self.assertEqual([r and r.__class__.__name__ for r in resources], ['Observation', 'Patient', None])
+
+        self.store.delete(Patient(id='1'))
+        self.assertEqual(str(self.store.get('1').id), '1')
+
+
+    def entry(self, method, url, resource=None, fullUrl=None, **kwargs):
+        request = Request(method=method, url=url, **kwargs)
+        return Entry(fullUrl=fullUrl, resource=resource, request=request)
+
+    def test_transaction(self):
+        self.store.post(Patient(id='old'))
+
+        bundle = Bundle(type='transaction', entry=[
+            self.entry('POST', 'Observation', fullUrl='urn:uuid:o', resource=Observation(
+                status='final', subject=Reference(reference='urn:uuid:p'),
+            )),
+            self.entry('POST', 'Patient', fullUrl='urn:uuid:p', resource=Patient(gender='female')),
+            self.entry('PUT', 'Patient/old', resource=Patient(gender='male'), ifMatch='W/"1"'),
+            self.entry('GET', 'Patient?gender=female'),
+        ])
+        response = self.store.process_bundle(bundle)
+
+        self.assertEqual(response.type, 'transaction-response')
+        statuses = [str(e.response.status) for e in response.entry]
+        self.assertEqual(statuses, ['201 Created', '201 Created', '200 OK', '200 OK'])
+        self.assertEqual(str(response.entry[2].response.etag), 'W/"2"')
+
+        # References to fullUrls are rewritten to the assigned ids.
+        location = str(response.entry[1].response.location)
+        patient_id = location.split('/')[1]
+        observation = self.store.get(str(response.entry[0].response.location).split('/')[1])
+        self.assertEqual(observation.subject.reference, 'Patient/' + patient_id)
+
+        searchset = response.entry[3].resource
+        self.assertEqual([str(r.id) for r in searchset], [patient_id])
+
+        # The Resources in the Bundle are updated as well.
+        self.assertEqual(str(bundle.entry[1].resource.id), patient_id)
+        self.assertEqual(bundle.entry[0].resource.subject.reference, 'Patient/' + patient_id)
+        self.assertEqual(bundle.entry[2].resource.meta.versionId, '2')
+
+    def test_transaction_rollback(self):
+        self.store.post(Patient(id='old'))
+
+        bundle = Bundle(type='transaction', entry=[
+            self.entry('POST', 'Patient', fullUrl='urn:uuid:x', resource=Patient(id='x')),
+            self.entry('POST', 'Observation', resource=Observation(
+                status='final', subject=Reference(reference='urn:uuid:x'),
+            )),
+            self.entry('DELETE', 'Patient/old', ifMatch='2'),
+        ])
+        before = bundle.toJSON()
+
+        self.assertRaises(VersionConflictError, self.store.process_bundle, bundle)
+        self.assertEqual(len(self.store.search('Patient')), 1)
+        self.assertEqual(str(self.store.get('old').meta.versionId), '1')
+
+        # The Bundle is left unchanged, so it can be sent again.
+        self.assertEqual(bundle.toJSON(), before)
+
+        bundle = Bundle(type='collection')
+        self.assertRaises(InvalidBundleError, self.store.process_bundle, bundle)
+
+    def test_conditional_create(self):
+        self.store.post(Patient(id='p', identifier=[Identifier(system='urn:mrn', value='1')]))
+
+        bundle = Bundle(type='transaction', entry=[
+            self.entry('POST', 'Patient', fullUrl='urn:uuid:p', resource=Patient(),
+                       ifNoneExist='identifier=urn:mrn|1'),
+            self.entry('POST', 'Observation', resource=Observation(
+                status='final', subject=Reference(reference='urn:uuid:p'),
+            )),
+        ])
+        response = self.store.process_bundle(bundle)
+
+        self.assertEqual(str(response.entry[0].response.status), '200 OK')
+        self.assertEqual(str(response.entry[0].response.location), 'Patient/p/_history/1')
+        self.assertEqual(bundle.entry[1].resource.subject.reference, 'Patient/p')
+
+    def test_batch(self):
+        self.store.post(Patient(id='p', active=True))
+
+        bundle = Bundle(type='batch', entry=[
+            self.entry('GET', 'Patient/p'),
+            self.entry('GET', 'Patient/x'),
+            self.entry('PUT', 'Patient/p', resource=Patient(active=False), ifMatch='1'),
+            self.entry('PUT', 'Patient/p', resource=Patient(), ifMatch='7'),
+            self.entry('PATCH', 'Patient/p'),
+        ])
+        response = self.store.process_bundle(bundle)
+
+        self.assertEqual(response.type, 'batch-response')
+        statuses = [str(e.response.status) for e in response.entry]
+        self.assertEqual(statuses, [
+            '200 OK', '404 Not Found', '200 OK', '412 Precondition Failed', '400 Bad Request',
+        ])
+        self.assertEqual(response.entry[0].resource.active, True)
+        self.assertEqual(response.entry[1].response.outcome.issue[0].severity, 'error')
+        self.assertEqual(self.store.get('p').active, False)
+
+    def test_batch_concurrent(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = FHIRStore('sqlite:///' + os.path.join(directory, 'batch.db'))
+            store.post_many(self.patients(20))
+
+            bundle = Bundle(type='batch', entry=[
+                self.entry('GET', 'Patient/p{}'.format(i)) for i in range(20)
+            ])
+            response = store.process_bundle(bundle, workers=4)
+
+            self.assertEqual([str(e.resource.id) for e in response.entry],
+                             ['p{}'.format(i) for i in range(20)])
+            Session.remove()
+
+    def test_migrate(self):
+        with tempfile.TemporaryDirectory() as directory:
+            URI = 'sqlite:///' + os.path.join(directory, 'old.db')
+
+            # The schema of earlier versions, with a surrogate key.
+            engine = sqlalchemy.create_engine(URI)
+            engine.execute(
+                'CREATE TABLE resource (_id INTEGER PRIMARY KEY, id VARCHAR(50) UNIQUE, '
+                'type VARCHAR(50), version INTEGER, codec VARCHAR(20), data BLOB, '
+                'xml TEXT, last_updated DATETIME)'
+            )
+            engine.execute(
+                'INSERT INTO resource (id, type, version, xml) VALUES (?, ?, ?, ?)',
+                'p', 'Patient', 2, Patient(id='p', active=True).toXML(),
+            )
+
+            self.assertRaises(fhir.persistance.OutdatedSchemaError, FHIRStore, URI)
+            self.assertEqual(fhir.persistance.migrate(URI), ['resource'])
+            self.assertEqual(fhir.persistance.migrate(URI), [])
+
+            store = FHIRStore(URI)
+            self.assertEqual(store.get('Patient/p').active, True)
+            self.assertEqual(store.put(Patient(id='p')), 3)
+            store.post(Observation(id='p', status='final'))
+
+            Session.remove()
+            store.engine.dispose()
+            engine.dispose()
+
+    def test_iter(self):
+        self.store.post_many(self.patients(12))
+        self.store.post(Observation(id='o', status='final'))
+        since = datetime.datetime.utcnow()
+        self.store.put(Patient(id='p4'))
+
+        ids = [str(p.id) for p in self.store.iter('Patient', batch_size=5)]
+        self.assertEqual(ids, sorted('p{}'.format(i) for i in range(12)))
+
+        resources = list(self.store.iter('Patient', since=since))
+        self.assertEqual([str(p.id) for p in resources], ['p4'])
+        self.assertEqual(resources[0].meta.versionId, '2')
+
+        self.assertEqual(len(list(self.store.iter('Patient', since='2000-01'))), 12)
+        self.assertEqual(list(self.store.iter('Encounter')), [])
+
+    def test_last_updated_index(self):
+        name = 'ix_resource_type_last_updated'
+
+        with tempfile.TemporaryDirectory() as directory:
+            URI = 'sqlite:///' + os.path.join(directory, 'index.db')
+            store = FHIRStore(URI)
+            inspector = sqlalchemy.inspect(store.engine)
+            self.assertIn(name, [i['name'] for i in inspector.get_indexes('resource')])
+
+            # Indexes are also added to tables created by earlier versions.
+            store.engine.execute('DROP INDEX ' + name)
+            store.engine.dispose()
+
+            store = FHIRStore(URI, partitioned=True)
+            inspector = sqlalchemy.inspect(store.engine)
+            self.assertIn(name, [i['name'] for i in inspector.get_indexes('resource')])
+            self.assertIn('ix_resource_patient_type_last_updated',
+                          [i['name'] for i in inspector.get_indexes('resource_patient')])
+
+            Session.remove()
+            store.engine.dispose()
+
+    def test_search_page(self):
+        self.store.post_many(self.patients(12))
+
+        pages, token = [], None
+
+        while True:
+            page, token = self.store.search_page('Patient', count=4, token=token, _id='p1,p3,p5,p7,p9,p11')
+            pages.append([str(p.id) for p in page])
+
+            if token is None:
+                break
+
+        self.assertEqual(pages, [['p1', 'p11', 'p3', 'p5'], ['p7', 'p9']])
+
+        page, token = self.store.search_page('Patient', count=12)
+        self.assertEqual((len(page), token), (12, None))
+
+        self.assertRaises(InvalidPageTokenError, self.store.search_page, 'Patient', token='garbage')
+        self.assertRaises(InvalidPageTokenError, self.store.search_page, 'Observation', token=fhir.persistance._page_token('Patient', 'p1'))
+
+    def test_changes(self):
+        self.store.post_many(self.patients(2))
+        self.store.put(Patient(id='p0', active=True))
+        self.store.delete(Patient(id='p1'))
+
+        changes = list(self.store.changes())
+        self.assertEqual([(c.action, c.id, c.version) for c in changes], [
+            ('create', 'p0', 1), ('create', 'p1', 1), ('update', 'p0', 2), ('delete', 'p1', 2),
+        ])
+        self.assertEqual(changes[2].last_updated, self.store.get('p0').meta.lastUpdated)
+
+        # Resume after the last change that was processed.
+        token = changes[-1].token
+        self.assertEqual(list(self.store.changes(token)), [])
+
+        self.store.post(Observation(id='o', status='final'))
+        self.store.put(Patient(id='p1'))
+
+        changes = list(self.store.changes(token))
+        self.assertEqual([(c.action, c.type, c.version) for c in changes], [
+            ('create', 'Observation', 1), ('create', 'Patient', 3),
+        ])
+        self.assertEqual([c.id for c in self.store.changes(token, types=['Patient'])], ['p1'])
+        self.assertEqual(list(self.store.changes(lag=3600)), [])
+        self.assertRaises(InvalidPageTokenError, list, self.store.changes('x'))
+
+    def graph(self):
+        """Post a small graph: Patient <- Encounter <- Observation -> MedicationRequest."""
+        self.store.post_many([
+            Patient(id='1'),
+            Patient(id='2'),
+            MedicationRequest(id='mr', status='active', intent='order'),
+            Encounter(id='e', status='finished', subject=Reference(reference='Patient/1')),
+            Observation(
+                id='o', status='final',
+                subject=Reference(reference='Patient/1'),
+                encounter=Reference(reference='Encounter/e'),
+                basedOn=[Reference(reference='MedicationRequest/mr'), Reference(reference='MedicationRequest/gone')],
+            ),
+            Observation(id='o2', status='final', subject=Reference(reference='Patient/2')),
+        ])
+
+    def keys(self, resources):
+        return sorted('{}/{}'.format(r.__class__.__name__, r.id) for r in resources)
+
+    def test_include(self):
+        self.graph()
+        observations = self.store.get_many(['Observation/o', 'Observation/o2'])
+
+        self.assertEqual(self.keys(self.store.include(observations)), [
+            'Encounter/e', 'MedicationRequest/mr', 'Patient/1', 'Patient/2',
+        ])
+        self.assertEqual(self.keys(self.store.include(observations, path='subject')), ['Patient/1', 'Patient/2'])
+
+        patient = self.store.get('Patient/1')
+        self.assertEqual(self.keys(self.store.revinclude([patient])), ['Encounter/e', 'Observation/o'])
+        self.assertEqual(self.keys(self.store.revinclude([patient], type='Encounter')), ['Encounter/e'])
+        self.assertEqual(self.keys(self.store.revinclude([patient], path='encounter')), [])
+
+    def test_referrers(self):
+        self.graph()
+
+        self.assertEqual(self.store.referrers('Encounter', 'e'), [
+            Link('Observation', 'o', 'encounter', 'Encounter', 'e'),
+        ])
+        self.assertEqual(self.store.dangling_references(), [
+            Link('Observation', 'o', 'basedOn', 'MedicationRequest', 'gone'),
+        ])
+
+        # Links follow updates and deletes.
+        self.store.put(Observation(id='o', status='final', subject=Reference(reference='Patient/2')))
+        self.assertEqual(self.store.referrers('Encounter', 'e'), [])
+        self.assertEqual(self.store.dangling_references(), [])
+
+        self.store.delete(Patient(id='2'))
+        self.assertEqual(len(self.store.dangling_references('Observation')), 2)
+        self.assertEqual(self.store.dangling_references('Encounter'), [])
+
+    def test_everything(self):
+        self.graph()
+
+        everything = self.store.everything('Patient', '1')
+        self.assertEqual(str(everything[0].id), '1')
+        self.assertEqual(self.keys(everything), [
+            'Encounter/e', 'MedicationRequest/mr', 'Observation/o', 'Patient/1',
+        ])
+
+        everything = self.store.everything('Patient', '1', max_depth=0)
+        self.assertEqual(self.keys(everything), ['Patient/1'])
+
+class TestPartitionedFHIRStore(unittest.TestCase):
+
+    def setUp(self):
+        self.store = FHIRStore('sqlite://', partitioned=True)
+
+    def test_partitions(self):
+        self.store.post_many([Patient(id='1', gender='male'), Observation(id='1', status='final')])
+        self.store.put(Patient(id='1', gender='female'))
+
+        session = Session()
+        table = fhir.persistance.partition('Patient')
+        self.assertEqual(table.__tablename__, 'resource_patient')
+        self.assertEqual(session.query(table).count(), 1)
+        self.assertEqual(session.query(PersistedResource).count(), 0)
+
+        self.assertEqual(self.store.get('Patient/1').gender, 'female')
+        self.assertEqual(self.store.vread('Patient', '1', 1).gender, 'male')
+        self.assertEqual([str(r.id) for r in self.store.search('Patient', gender='female')], ['1'])
+        self.assertEqual(self.store.get('1', 'Observation').status, 'final')
+
+        # Without the type, the partition is unknown.
+        self.assertRaises(ValueError, self.store.get, '1')
+        self.assertRaises(UnknownResourceTypeError, fhir.persistance.partition, 'Shoe')
+
+    def test_references(self):
+        self.store.post_many([
+            Patient(id='1'),
+            Observation(id='o', status='final', subject=Reference(reference='Patient/1')),
+            Observation(id='x', status='final', subject=Reference(reference='Patient/x')),
+        ])
+        patient = self.store.get('Patient/1')
+
+        self.assertEqual([str(r.id) for r in self.store.revinclude([patient])], ['o'])
+        self.assertEqual([str(r.id) for r in self.store.include(self.store.get_many(['Observation/o']))], ['1'])
+        self.assertEqual([l.source_id for l in self.store.dangling_references()], ['x'])
+
+    def test_absolute_references(self):
+        self.assertEqual(parse_url('Patient/1/_history/2'), ('Patient', '1'))
+        self.assertEqual(parse_url('http://other.org/fhir/Patient/1'), None)
+        self.assertEqual(parse_url('http://example.org/fhir/Patient/1', 'http://example.org/fhir/'), ('Patient', '1'))
+        self.assertEqual(parse_url('http://example.org/Patient/1', 'http://example.org/fhir'), None)
+
+        store = FHIRStore('sqlite://', base='http://example.org/fhir')
+        store.post_many([
+            Patient(id='1'),
+            Observation(id='local', status='final', subject=Reference(reference='http://example.org/fhir/Patient/1')),
+            Observation(id='other', status='final', subject=Reference(reference='http://other.org/fhir/Patient/1')),
+        ])
+
+        # References to other servers are neither local nor dangling.
+        patient = store.get('Patient/1')
+        self.assertEqual([str(r.id) for r in store.revinclude([patient])], ['local'])
+        self.assertEqual(store.dangling_references(), [])
+
+        observations = store.search('Observation', subject='Patient/1')
+        self.assertEqual([str(o.id) for o in observations], ['local'])
+        observations = store.search('Observation', subject='http://other.org/fhir/Patient/1')
+        self.assertEqual(observations, [])